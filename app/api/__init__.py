@@ -2,7 +2,9 @@
 
 from fastapi import APIRouter
 
-from app.api import streams, schedules, channels, jellyfin, livetv, collections
+from app.api import (
+    streams, schedules, channels, jellyfin, livetv, collections, transcode_profiles,
+)
 
 router = APIRouter()
 
@@ -16,3 +18,6 @@ router.include_router(schedules.router, prefix="/schedules", tags=["schedules"])
 router.include_router(jellyfin.router, prefix="/jellyfin", tags=["jellyfin"])
 router.include_router(livetv.router, prefix="/livetv", tags=["livetv"])
 router.include_router(collections.router, prefix="/collections", tags=["collections"])
+router.include_router(
+    transcode_profiles.router, prefix="/transcode-profiles", tags=["transcode-profiles"]
+)
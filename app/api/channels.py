@@ -11,12 +11,58 @@ from app.models.channel import Channel
 from app.models.channel_library import ChannelLibrary
 from app.models.channel_collection_source import ChannelCollectionSource
 from app.models.genre_filter import GenreFilter
+from app.models.schedule_entry import ScheduleEntry
+from app.models.transcode_profile import TranscodeProfile
+from app.services import timeline
+from app.services.shifted_channels import SCHEDULE_TYPE_SHIFTED
 from app.api.schemas import CreateChannelRequest, UpdateChannelRequest, RegisterLiveTVRequest
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
+async def _check_transcode_profile(profile_id, db: AsyncSession) -> None:
+    """Raise 400 if a transcode_profile_id does not refer to an existing profile."""
+    if profile_id is None:
+        return
+    if await db.get(TranscodeProfile, profile_id) is None:
+        raise HTTPException(
+            status_code=400, detail=f"Transcode profile {profile_id} not found"
+        )
+
+
+async def _check_shift(channel: Channel, db: AsyncSession) -> None:
+    """Raise 400 unless a "shifted" channel points at a usable parent."""
+    if channel.schedule_type != SCHEDULE_TYPE_SHIFTED:
+        return
+    if not channel.time_offset_minutes or channel.time_offset_minutes <= 0:
+        raise HTTPException(
+            status_code=400, detail="A shifted channel needs time_offset_minutes > 0"
+        )
+    parent = (
+        await db.get(Channel, channel.parent_channel_id)
+        if channel.parent_channel_id is not None else None
+    )
+    if parent is None or parent is channel:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Parent channel {channel.parent_channel_id} not found",
+        )
+    if parent.schedule_type == SCHEDULE_TYPE_SHIFTED:
+        raise HTTPException(
+            status_code=400, detail="The parent of a shifted channel cannot be shifted"
+        )
+    if channel.id is not None:
+        children = await db.execute(
+            select(Channel.id).where(Channel.parent_channel_id == channel.id).limit(1)
+        )
+        if children.first() is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="A channel with shifted siblings cannot be shifted itself",
+            )
+
+
 def _channel_to_dict(channel: Channel) -> dict:
     """Serialize a Channel ORM object to a dict."""
     return {
@@ -27,6 +73,13 @@ def _channel_to_dict(channel: Channel) -> dict:
         "enabled": channel.enabled,
         "channel_type": channel.channel_type,
         "schedule_type": channel.schedule_type,
+        "parent_channel_id": channel.parent_channel_id,
+        "time_offset_minutes": channel.time_offset_minutes,
+        "transcode_policy": channel.transcode_policy,
+        "transcode_offload": channel.transcode_offload,
+        "playout_mode": channel.playout_mode,
+        "transcode_profile_id": channel.transcode_profile_id,
+        "pretranscode": channel.pretranscode,
         "tuner_host_id": channel.tuner_host_id,
         "listing_provider_id": channel.listing_provider_id,
         "schedule_generated_through": channel.schedule_generated_through,
@@ -124,13 +177,22 @@ async def create_channel(data: CreateChannelRequest, db: AsyncSession = Depends(
         f"schedule_type={data.schedule_type}"
     )
 
+    await _check_transcode_profile(data.transcode_profile_id, db)
     channel = Channel(
         name=data.name,
         description=data.description,
         channel_number=data.channel_number,
         channel_type=data.channel_type,
         schedule_type=data.schedule_type,
+        parent_channel_id=data.parent_channel_id,
+        time_offset_minutes=data.time_offset_minutes,
+        transcode_policy=data.transcode_policy,
+        transcode_offload=data.transcode_offload,
+        playout_mode=data.playout_mode,
+        transcode_profile_id=data.transcode_profile_id,
+        pretranscode=data.pretranscode,
     )
+    await _check_shift(channel, db)
     db.add(channel)
     await db.flush()  # Assign ID without committing
 
@@ -162,6 +224,7 @@ async def create_channel(data: CreateChannelRequest, db: AsyncSession = Depends(
 
     await db.commit()
     await db.refresh(channel)
+    timeline.invalidate(channel.id)
     logger.info(f"create_channel: created channel '{channel.name}' (id={channel.id})")
 
     # Kick off initial schedule generation for auto-schedule channels
@@ -217,6 +280,22 @@ async def update_channel(
         channel.channel_type = data.channel_type
     if data.schedule_type is not None:
         channel.schedule_type = data.schedule_type
+    if "parent_channel_id" in data.model_fields_set:
+        channel.parent_channel_id = data.parent_channel_id
+    if data.time_offset_minutes is not None:
+        channel.time_offset_minutes = data.time_offset_minutes
+    await _check_shift(channel, db)
+    if data.transcode_policy is not None:
+        channel.transcode_policy = data.transcode_policy
+    if "transcode_offload" in data.model_fields_set:
+        channel.transcode_offload = data.transcode_offload
+    if data.playout_mode is not None:
+        channel.playout_mode = data.playout_mode
+    if data.pretranscode is not None:
+        channel.pretranscode = data.pretranscode
+    if "transcode_profile_id" in data.model_fields_set:
+        await _check_transcode_profile(data.transcode_profile_id, db)
+        channel.transcode_profile_id = data.transcode_profile_id
 
     if data.libraries is not None:
         await db.execute(
@@ -257,6 +336,7 @@ async def update_channel(
 
     await db.commit()
     await db.refresh(channel)
+    timeline.invalidate()           # may re-point shifted siblings
     logger.info(f"update_channel: updated channel '{channel.name}' (id={channel_id})")
     return {"id": channel.id, "message": "Channel updated successfully"}
 
@@ -266,10 +346,12 @@ async def update_channel(
 @router.delete("/{channel_id}")
 async def delete_channel(channel_id: int, db: AsyncSession = Depends(get_db)):
     """
-    Delete a channel.
+    Delete a channel together with its time-shifted siblings.
 
-    Cascades to channel_libraries, genre_filters, and schedule_entries
-    via database FK constraints.
+    SQLite does not enforce the ON DELETE CASCADE foreign keys without
+    PRAGMA foreign_keys, so the siblings and the rows that belong to any of
+    the deleted channels (libraries, genre filters, collection sources,
+    schedule entries) are deleted explicitly, in the same transaction.
     """
     logger.debug(f"delete_channel called: channel_id={channel_id}")
     result = await db.execute(select(Channel).where(Channel.id == channel_id))
@@ -280,8 +362,21 @@ async def delete_channel(channel_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Channel not found")
 
     name = channel.name
-    await db.delete(channel)
+    result = await db.execute(
+        select(Channel.id).where(
+            Channel.parent_channel_id == channel_id,
+            Channel.schedule_type == SCHEDULE_TYPE_SHIFTED,
+        )
+    )
+    siblings = list(result.scalars().all())
+    ids = [channel_id, *siblings]
+    for model in (ScheduleEntry, ChannelLibrary, GenreFilter, ChannelCollectionSource):
+        await db.execute(delete(model).where(model.channel_id.in_(ids)))
+    await db.execute(delete(Channel).where(Channel.id.in_(ids)))
     await db.commit()
+    timeline.invalidate()           # shifted siblings were deleted with it
+    if siblings:
+        logger.info(f"delete_channel: also deleted shifted siblings {siblings}")
     logger.info(f"delete_channel: deleted channel '{name}' (id={channel_id})")
     return {"message": "Channel deleted successfully"}
 
@@ -311,6 +406,12 @@ async def trigger_schedule_generation(
         logger.warning(f"trigger_schedule_generation: channel {channel_id} not found")
         raise HTTPException(status_code=404, detail="Channel not found")
 
+    if channel.schedule_type == SCHEDULE_TYPE_SHIFTED:
+        raise HTTPException(
+            status_code=400,
+            detail="Shifted channels play their parent's schedule; generate that instead",
+        )
+
     if reset:
         from sqlalchemy import delete as sa_delete
         from app.models.schedule_entry import ScheduleEntry
@@ -319,6 +420,7 @@ async def trigger_schedule_generation(
         )
         channel.schedule_generated_through = None
         await db.commit()
+        timeline.invalidate(channel_id)
         logger.info(
             f"trigger_schedule_generation: reset — deleted all entries for channel {channel_id}"
         )
@@ -1,136 +1,62 @@
-"""Live TV API endpoints — M3U playlist and XMLTV EPG generation.
+"""Live TV API endpoints — M3U playlist, XMLTV EPG, and stream routes.
 
 IMPORTANT: Literal routes (/m3u/all, /xmltv/all) are registered BEFORE
 parameterised routes (/m3u/{channel_id}, /xmltv/{channel_id}) so that
 FastAPI does not match "all" as an integer channel_id.
 """
 
-import json
 import os
-from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import FileResponse
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
 from app.core.logging_config import get_logger
 from app.models.channel import Channel
 from app.models.schedule_entry import ScheduleEntry
+from app.services import epg_cache
+from app.services.epg_cache import Document, m3u_line, public_base_url
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 # ── helpers ──────────────────────────────────────────────────────────────────
 
-def _base_url() -> str:
-    if settings.JELLYSTREAM_PUBLIC_URL:
-        return settings.JELLYSTREAM_PUBLIC_URL.rstrip("/")
-    host = settings.HOST.rstrip("/")
-    if not host.startswith("http"):
-        host = f"http://{host}"
-    return f"{host}:{settings.PORT}"
-
-
 def _m3u_line(channel: Channel) -> str:
-    ch_num = channel.channel_number or f"100.{channel.id}"
-    stream_url = f"{_base_url()}/api/livetv/stream/{channel.id}"
-    lines = (
-        f'#EXTINF:-1 tvg-id="{channel.id}" tvg-name="{channel.name}" '
-        f'tvg-chno="{ch_num}" group-title="JellyStream",'
-        f'{ch_num} {channel.name}\n'
-        f'{stream_url}\n'
-    )
-    return lines
-
-
-def _xmltv_channel(channel: Channel) -> str:
-    return (
-        f'  <channel id="{channel.id}">\n'
-        f'    <display-name>{channel.name}</display-name>\n'
-        f'  </channel>\n'
-    )
-
-
-def _xmltv_programme(entry: ScheduleEntry) -> str:
-    start = entry.start_time.strftime("%Y%m%d%H%M%S +0000")
-    stop = entry.end_time.strftime("%Y%m%d%H%M%S +0000")
-
-    if entry.series_name:
-        # Episode: show series name as title, episode title as sub-title
-        main_title = _xml_escape(entry.series_name)
-        sub_title = _xml_escape(entry.title)
-    else:
-        # Movie: just use the title, no sub-title
-        main_title = _xml_escape(entry.title)
-        sub_title = None
-
-    lines = (
-        f'  <programme channel="{entry.channel_id}" start="{start}" stop="{stop}">\n'
-        f'    <title>{main_title}</title>\n'
-    )
-
-    if sub_title:
-        lines += f'    <sub-title>{sub_title}</sub-title>\n'
-
-    if entry.description:
-        lines += f'    <desc lang="en">{_xml_escape(entry.description)}</desc>\n'
-
-    # Thumbnail icon served via JellyStream's thumbnail endpoint
-    if entry.thumbnail_path:
-        thumb_url = f"{_base_url()}/api/livetv/thumbnail/{entry.id}"
-        lines += f'    <icon src="{thumb_url}"/>\n'
+    return m3u_line(channel, public_base_url())
 
-    if entry.air_date:
-        # XMLTV <date> wants YYYYMMDD; strip any "-" separators
-        lines += f'    <date>{entry.air_date.replace("-", "")}</date>\n'
 
-    if entry.season_number and entry.episode_number:
-        # XMLTV uses 0-based season/episode numbers
-        lines += (
-            f'    <episode-num system="xmltv_ns">'
-            f'{entry.season_number - 1}.{entry.episode_number - 1}.'
-            f'</episode-num>\n'
-        )
-
-    # item_type as primary category, then genres
-    lines += f'    <category>{_xml_escape(entry.item_type)}</category>\n'
-    if entry.genres:
-        try:
-            genre_list = json.loads(entry.genres)
-            for g in genre_list:
-                lines += f'    <category>{_xml_escape(g)}</category>\n'
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-    if entry.content_rating:
-        lines += (
-            f'    <rating system="MPAA">'
-            f'<value>{_xml_escape(entry.content_rating)}</value>'
-            f'</rating>\n'
-        )
-
-    lines += '  </programme>\n'
-    return lines
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for token in accept_encoding.split(","):
+        coding, _, params = token.strip().lower().partition(";")
+        if coding.strip() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
 
 
-def _xml_escape(text: str) -> str:
-    """Minimal XML character escaping."""
-    return (
-        text
-        .replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-    )
-
-
-def _xmltv_header() -> str:
-    return (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
-        '<tv generator-info-name="JellyStream">\n'
+def _document_response(request: Request, doc: Document, media_type: str) -> Response:
+    """
+    Serve a cached document: 304 if the client already has this version,
+    else the body, gzip-compressed when the client accepts it.  A document
+    served for the first time is streamed as it is produced and carries no
+    ETag yet; clients must revalidate every time (no-cache).
+    """
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if doc.complete:
+        headers["ETag"] = doc.etag
+        if doc.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+    compressed = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+        if doc.complete:
+            return Response(content=doc.gzipped, media_type=media_type, headers=headers)
+    return StreamingResponse(
+        doc.stream(compressed), media_type=media_type, headers=headers
     )
 
 
@@ -138,81 +64,22 @@ def _xmltv_header() -> str:
 # MUST be registered before /m3u/{channel_id}
 
 @router.get("/m3u/all")
-async def get_all_m3u(db: AsyncSession = Depends(get_db)):
-    """Generate M3U playlist for all enabled channels."""
+async def get_all_m3u(request: Request):
+    """M3U playlist for all enabled channels (cached, see epg_cache)."""
     logger.debug("get_all_m3u called")
-
-    result = await db.execute(
-        select(Channel)
-        .where(Channel.enabled == True)
-        .order_by(Channel.channel_number, Channel.id)
-    )
-    channels = result.scalars().all()
-
-    m3u = "#EXTM3U\n"
-    for ch in channels:
-        m3u += _m3u_line(ch)
-
-    logger.info(f"get_all_m3u: returned {len(channels)} channels")
-    return Response(content=m3u, media_type="application/x-mpegURL")
+    doc = await epg_cache.m3u_all()
+    return _document_response(request, doc, "application/x-mpegURL")
 
 
 # ─── GET /api/livetv/xmltv/all ───────────────────────────────────────────────
 # MUST be registered before /xmltv/{channel_id}
 
 @router.get("/xmltv/all")
-async def get_all_xmltv(db: AsyncSession = Depends(get_db)):
-    """Generate XMLTV EPG for all enabled channels (EPG window: -3h to +7d)."""
+async def get_all_xmltv(request: Request):
+    """XMLTV EPG for all enabled channels (EPG window: -3h to +7d, cached)."""
     logger.debug("get_all_xmltv called")
-
-    now = datetime.now(timezone.utc).replace(tzinfo=None)
-    window_start = now - timedelta(hours=3)
-    window_end = now + timedelta(days=7)
-
-    result = await db.execute(
-        select(Channel)
-        .where(Channel.enabled == True)
-        .order_by(Channel.channel_number, Channel.id)
-    )
-    channels = result.scalars().all()
-
-    xmltv = _xmltv_header()
-
-    # Channel definitions
-    for ch in channels:
-        xmltv += _xmltv_channel(ch)
-
-    # Programme entries
-    for ch in channels:
-        entries_result = await db.execute(
-            select(ScheduleEntry)
-            .where(
-                ScheduleEntry.channel_id == ch.id,
-                ScheduleEntry.end_time > window_start,
-                ScheduleEntry.start_time < window_end,
-            )
-            .order_by(ScheduleEntry.start_time)
-        )
-        entries = entries_result.scalars().all()
-        for entry in entries:
-            xmltv += _xmltv_programme(entry)
-
-    xmltv += "</tv>\n"
-
-    total_entries = sum(1 for line in xmltv.splitlines() if "<programme " in line)
-    logger.info(
-        f"get_all_xmltv: {len(channels)} channels, "
-        f"~{total_entries} programme entries in window"
-    )
-    return Response(
-        content=xmltv,
-        media_type="application/xml",
-        headers={
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0",
-        },
-    )
+    doc = await epg_cache.xmltv_all()
+    return _document_response(request, doc, "application/xml")
 
 
 # ─── GET /api/livetv/m3u/{channel_id} ────────────────────────────────────────
@@ -238,43 +105,16 @@ async def get_channel_m3u(channel_id: int, db: AsyncSession = Depends(get_db)):
 # ─── GET /api/livetv/xmltv/{channel_id} ──────────────────────────────────────
 
 @router.get("/xmltv/{channel_id}")
-async def get_channel_xmltv(channel_id: int, db: AsyncSession = Depends(get_db)):
-    """Generate XMLTV EPG for a single channel (EPG window: -3h to +7d)."""
+async def get_channel_xmltv(channel_id: int, request: Request):
+    """XMLTV EPG for a single channel (EPG window: -3h to +7d, cached)."""
     logger.debug(f"get_channel_xmltv called: channel_id={channel_id}")
 
-    result = await db.execute(select(Channel).where(Channel.id == channel_id))
-    channel = result.scalar_one_or_none()
-
-    if not channel:
+    doc = await epg_cache.xmltv_for_channel(channel_id)
+    if doc is None:
         logger.warning(f"get_channel_xmltv: channel {channel_id} not found")
         raise HTTPException(status_code=404, detail="Channel not found")
 
-    now = datetime.now(timezone.utc).replace(tzinfo=None)
-    window_start = now - timedelta(hours=3)
-    window_end = now + timedelta(days=7)
-
-    entries_result = await db.execute(
-        select(ScheduleEntry)
-        .where(
-            ScheduleEntry.channel_id == channel_id,
-            ScheduleEntry.end_time > window_start,
-            ScheduleEntry.start_time < window_end,
-        )
-        .order_by(ScheduleEntry.start_time)
-    )
-    entries = entries_result.scalars().all()
-
-    xmltv = _xmltv_header()
-    xmltv += _xmltv_channel(channel)
-    for entry in entries:
-        xmltv += _xmltv_programme(entry)
-    xmltv += "</tv>\n"
-
-    logger.info(
-        f"get_channel_xmltv: channel '{channel.name}', "
-        f"{len(entries)} entries in EPG window"
-    )
-    return Response(content=xmltv, media_type="application/xml")
+    return _document_response(request, doc, "application/xml")
 
 
 # ─── GET /api/livetv/thumbnail/{entry_id} ────────────────────────────────────
@@ -301,8 +141,8 @@ async def get_entry_thumbnail(entry_id: int, db: AsyncSession = Depends(get_db))
 @router.head("/stream/{channel_id}")
 async def stream_channel_head(channel_id: int, db: AsyncSession = Depends(get_db)):
     """Probe endpoint — confirms stream availability without starting ffmpeg."""
-    from app.services.stream_proxy import get_current_entry
-    entry = await get_current_entry(channel_id, db)
+    from app.services.stream_proxy import _MEDIA_TYPE, get_airing_entry
+    entry = await get_airing_entry(channel_id, db)
     if not entry:
         raise HTTPException(status_code=404, detail="No content scheduled at this time")
     return Response(
@@ -314,17 +154,28 @@ async def stream_channel_head(channel_id: int, db: AsyncSession = Depends(get_db
 # ─── GET /api/livetv/stream/{channel_id} ─────────────────────────────────────
 
 @router.get("/stream/{channel_id}")
-async def stream_channel(channel_id: int, db: AsyncSession = Depends(get_db)):
+async def stream_channel(
+    channel_id: int,
+    request: Request,
+    rewind: Optional[int] = Query(None, ge=1),
+    restart: bool = False,
+):
     """
     Proxy the current scheduled item for a channel through ffmpeg.
 
     Seeks to the correct offset so the viewer joins the stream mid-programme,
-    matching what real broadcast TV does.
+    matching what real broadcast TV does.  `?rewind=N` plays from N seconds
+    ago and `?restart=true` from the start of the current programme, out of
+    the channel's time-shift buffer (TIMESHIFT_MINUTES).
+
+    Takes no request-scoped session: the response can run for hours, so
+    lookups use short-lived sessions that are closed before streaming.
     """
     logger.debug(f"stream_channel called: channel_id={channel_id}")
 
-    result = await db.execute(select(Channel).where(Channel.id == channel_id))
-    channel = result.scalar_one_or_none()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Channel).where(Channel.id == channel_id))
+        channel = result.scalar_one_or_none()
 
     if not channel:
         logger.warning(f"stream_channel: channel {channel_id} not found")
@@ -337,7 +188,12 @@ async def stream_channel(channel_id: int, db: AsyncSession = Depends(get_db)):
     try:
         from app.services.stream_proxy import stream_channel as proxy_stream
         logger.info(f"stream_channel: delegating to stream_proxy for channel '{channel.name}'")
-        return await proxy_stream(channel_id, db)
+        client = (
+            f"{request.client.host}:{request.client.port}" if request.client else None
+        )
+        return await proxy_stream(
+            channel_id, client=client, rewind_seconds=rewind, restart=restart
+        )
     except ImportError:
         logger.error("stream_channel: stream_proxy service not yet available")
         raise HTTPException(status_code=503, detail="Stream proxy service not available")
@@ -346,3 +202,205 @@ async def stream_channel(channel_id: int, db: AsyncSession = Depends(get_db)):
     except Exception as e:
         logger.error(f"stream_channel: unexpected error for channel {channel_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ─── GET /api/livetv/transitions ─────────────────────────────────────────────
+
+@router.get("/transitions")
+async def stream_transitions():
+    """Per-channel output gap at programme changes on the MPEG-TS stream."""
+    from app.services.stream_proxy import transition_stats
+    return transition_stats()
+
+
+# ─── GET /api/livetv/sessions ────────────────────────────────────────────────
+
+@router.get("/sessions")
+async def stream_sessions():
+    """Running channel encodes with live ffmpeg telemetry and their viewers."""
+    from app.services.sessions import session_snapshot
+    return session_snapshot()
+
+
+# ─── GET /api/livetv/slots ───────────────────────────────────────────────────
+
+@router.get("/slots")
+async def encode_slots():
+    """Encode budget and the channel encodes currently holding a slot."""
+    from app.services.transcode_slots import slot_status
+    return slot_status()
+
+
+# ─── GET /api/livetv/pretranscode ────────────────────────────────────────────
+
+@router.get("/pretranscode")
+async def pretranscode_cache():
+    """Usage of the ahead-of-time transcode cache."""
+    from app.services.pretranscode import cache_status
+    return await cache_status()
+
+
+# ─── GET /api/livetv/filler ──────────────────────────────────────────────────
+
+@router.get("/filler")
+async def filler_catalog():
+    """Pre-encoded filler clips available per transcode profile."""
+    from app.services.filler import catalog_status
+    return catalog_status()
+
+
+# ─── GET /api/livetv/source-cache ────────────────────────────────────────────
+
+@router.get("/source-cache")
+async def source_cache_status():
+    """Usage of the read-through cache for Jellyfin HTTP sources."""
+    from app.services.source_cache import cache_status
+    return await cache_status()
+
+
+# ─── GET /api/livetv/epg-cache ───────────────────────────────────────────────
+
+@router.get("/epg-cache")
+async def epg_cache_status():
+    """Rendered XMLTV/M3U documents currently cached."""
+    return epg_cache.status()
+
+
+# ─── GET /api/livetv/source/{media_item_id} ──────────────────────────────────
+# Loopback endpoint ffmpeg reads Jellyfin HTTP sources through when
+# SOURCE_CACHE_MAX_GB is set.  Only URLs built by _resolve_source (which carry
+# the per-process token) are served.
+
+@router.get("/source/{media_item_id}", include_in_schema=False)
+async def cached_source(media_item_id: str, request: Request, token: str = ""):
+    """Serve (a Range of) a Jellyfin item out of the local chunk cache."""
+    from app.services import source_cache
+
+    if not source_cache.check_token(token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        size = await source_cache.item_size(media_item_id)
+    except source_cache.UpstreamError as exc:
+        logger.warning(f"cached_source: item={media_item_id}: {exc}")
+        raise HTTPException(status_code=exc.status, detail=str(exc))
+
+    try:
+        byte_range = source_cache.parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    logger.debug(f"cached_source: item={media_item_id} bytes {start}-{end}/{size}")
+    return StreamingResponse(
+        source_cache.read_range(media_item_id, start, end),
+        status_code=206 if byte_range else 200,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+# ─── GET /api/livetv/hls/{channel_id}/index.m3u8 ─────────────────────────────
+# HLS output mode: one encode per channel writes a rolling segment window to
+# disk and every client fetches the same files.
+
+@router.get("/hls/{channel_id}/index.m3u8")
+async def hls_playlist(channel_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Serve the channel's rolling HLS playlist, starting the encode if needed.
+
+    The first request waits (up to HLS_START_TIMEOUT seconds) for ffmpeg to
+    write the first segment.  Clients that reconnect get the live playlist
+    straight away without a new encode being started.  With HLS_ABR_LADDER
+    set this is the master playlist listing the renditions.
+    """
+    logger.debug(f"hls_playlist called: channel_id={channel_id}")
+    return await _serve_hls_playlist(channel_id, db, "hls_playlist")
+
+
+@router.get("/hls/{channel_id}/master.m3u8")
+async def hls_master_playlist(channel_id: int, db: AsyncSession = Depends(get_db)):
+    """Serve the adaptive-bitrate master playlist (404 unless HLS_ABR_LADDER is set)."""
+    logger.debug(f"hls_master_playlist called: channel_id={channel_id}")
+    from app.services.stream_proxy import parse_abr_ladder
+
+    if not parse_abr_ladder(settings.HLS_ABR_LADDER):
+        raise HTTPException(status_code=404, detail="Adaptive bitrate is not enabled")
+    return await _serve_hls_playlist(channel_id, db, "hls_master_playlist")
+
+
+def _playlist_response(path: str) -> Response:
+    # Read into memory rather than FileResponse: ffmpeg replaces playlists
+    # every segment, so their size can change between stat() and send.
+    with open(path, "rb") as f:
+        playlist = f.read()
+    return Response(
+        content=playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def _serve_hls_playlist(channel_id: int, db: AsyncSession, caller: str):
+    """Start (or join) the channel's HLS encode and return its top-level playlist."""
+    result = await db.execute(select(Channel).where(Channel.id == channel_id))
+    channel = result.scalar_one_or_none()
+
+    if not channel:
+        logger.warning(f"{caller}: channel {channel_id} not found")
+        raise HTTPException(status_code=404, detail="Channel not found")
+
+    if not channel.enabled:
+        logger.warning(f"{caller}: channel {channel_id} is disabled")
+        raise HTTPException(status_code=403, detail="Channel is disabled")
+
+    from app.services.hls import get_hls_channel, open_hls_channel
+    from app.services.stream_proxy import get_airing_entry
+    from app.services.transcode_slots import OUTPUT_HLS, admit_encode
+
+    if get_hls_channel(channel_id) is None:
+        entry = await get_airing_entry(channel_id, db)
+        if not entry:
+            raise HTTPException(status_code=404, detail="No content scheduled at this time")
+        if get_hls_channel(channel_id) is None:
+            admit_encode(channel_id, OUTPUT_HLS)
+
+    hls = open_hls_channel(channel_id)
+    if not await hls.wait_for_playlist(settings.HLS_START_TIMEOUT):
+        logger.error(f"{caller}: channel {channel_id} produced no playlist in time")
+        raise HTTPException(status_code=503, detail="HLS stream did not start in time")
+
+    return _playlist_response(hls.playlist_path)
+
+
+# ─── GET /api/livetv/hls/{channel_id}/{segment} ──────────────────────────────
+
+@router.get("/hls/{channel_id}/{segment}")
+async def hls_segment(channel_id: int, segment: str):
+    """
+    Serve one .ts segment from the channel's HLS window as a static file, or
+    (ABR mode) one rendition's media playlist.
+    """
+    from app.services.hls import SEGMENT_NAME_RE, VARIANT_PLAYLIST_RE, get_hls_channel
+
+    is_playlist = VARIANT_PLAYLIST_RE.match(segment) is not None
+    if not is_playlist and not SEGMENT_NAME_RE.match(segment):
+        raise HTTPException(status_code=404, detail="Segment not found")
+
+    hls = get_hls_channel(channel_id)
+    if hls is None:
+        raise HTTPException(status_code=404, detail="Channel is not streaming HLS")
+    hls.touch()
+
+    path = os.path.join(hls.directory, segment)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Segment not found")
+    if is_playlist:
+        return _playlist_response(path)
+    # Segments are immutable once listed, so clients and proxies may cache them
+    return FileResponse(
+        path,
+        media_type="video/mp2t",
+        headers={"Cache-Control": "public, max-age=60"},
+    )
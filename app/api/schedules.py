@@ -1,7 +1,6 @@
 """Schedule API endpoints (ScheduleEntry model)."""
 
 from datetime import datetime, timedelta, timezone
-from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -9,6 +8,8 @@ from sqlalchemy import select
 from app.core.database import get_db
 from app.core.logging_config import get_logger
 from app.models.schedule_entry import ScheduleEntry
+from app.services import timeline
+from app.services.shifted_channels import schedule_source, shifted_entries
 from app.api.schemas import CreateScheduleEntryRequest, UpdateScheduleEntryRequest
 
 logger = get_logger(__name__)
@@ -58,16 +59,9 @@ async def get_channel_schedule(
     window_start = now - timedelta(hours=hours_back)
     window_end = now + timedelta(hours=hours_forward)
 
-    result = await db.execute(
-        select(ScheduleEntry)
-        .where(
-            ScheduleEntry.channel_id == channel_id,
-            ScheduleEntry.end_time > window_start,
-            ScheduleEntry.start_time < window_end,
-        )
-        .order_by(ScheduleEntry.start_time)
-    )
-    entries = result.scalars().all()
+    # Shifted channels have no rows of their own; list the parent's, moved
+    source = await schedule_source(channel_id, db)
+    entries = await shifted_entries(source, window_start, window_end, db)
 
     logger.info(
         f"get_channel_schedule: channel_id={channel_id}, "
@@ -89,17 +83,8 @@ async def get_now_playing(channel_id: int, db: AsyncSession = Depends(get_db)):
     logger.debug(f"get_now_playing called: channel_id={channel_id}")
     now = datetime.now(timezone.utc).replace(tzinfo=None)
 
-    result = await db.execute(
-        select(ScheduleEntry)
-        .where(
-            ScheduleEntry.channel_id == channel_id,
-            ScheduleEntry.start_time <= now,
-            ScheduleEntry.end_time > now,
-        )
-        .order_by(ScheduleEntry.start_time)
-        .limit(1)
-    )
-    entry = result.scalar_one_or_none()
+    from app.services.stream_proxy import get_current_entry
+    entry = await get_current_entry(channel_id, db)
 
     if not entry:
         logger.warning(f"get_now_playing: nothing playing on channel {channel_id} at {now.isoformat()}")
@@ -158,6 +143,12 @@ async def create_schedule_entry(
 
     end_dt = start_dt + timedelta(seconds=data.duration)
 
+    if (await schedule_source(data.channel_id, db)).shifted:
+        raise HTTPException(
+            status_code=400,
+            detail="Shifted channels play their parent's schedule; add the entry there",
+        )
+
     entry = ScheduleEntry(
         channel_id=data.channel_id,
         title=data.title,
@@ -175,6 +166,7 @@ async def create_schedule_entry(
     db.add(entry)
     await db.commit()
     await db.refresh(entry)
+    timeline.invalidate(entry.channel_id)
 
     logger.info(
         f"create_schedule_entry: created entry '{entry.title}' "
@@ -238,6 +230,7 @@ async def update_schedule_entry(
 
     await db.commit()
     await db.refresh(entry)
+    timeline.invalidate(entry.channel_id)
 
     logger.info(f"update_schedule_entry: updated entry '{entry.title}' (id={entry_id})")
     return {"id": entry.id, "message": "Schedule entry updated successfully"}
@@ -256,9 +249,10 @@ async def delete_schedule_entry(entry_id: int, db: AsyncSession = Depends(get_db
         logger.warning(f"delete_schedule_entry: entry {entry_id} not found")
         raise HTTPException(status_code=404, detail="Schedule entry not found")
 
-    title = entry.title
+    title, channel_id = entry.title, entry.channel_id
     await db.delete(entry)
     await db.commit()
+    timeline.invalidate(channel_id)
 
     logger.info(f"delete_schedule_entry: deleted entry '{title}' (id={entry_id})")
     return {"message": "Schedule entry deleted successfully"}
@@ -1,7 +1,7 @@
 """Pydantic request/response schemas for JellyStream API."""
 
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # ─── Channel Schemas ──────────────────────────────────────────────────────────
@@ -31,8 +31,15 @@ class CreateChannelRequest(BaseModel):
     name: str
     description: Optional[str] = None
     channel_number: Optional[str] = None
-    channel_type: str = "video"        # "video" | "music" (music planned)
-    schedule_type: str = "genre_auto"  # "manual" | "genre_auto"
+    channel_type: str = "video"        # "video" | "music"
+    schedule_type: str = "genre_auto"  # "manual" | "genre_auto" | "shifted"
+    parent_channel_id: Optional[int] = None  # required for "shifted"
+    time_offset_minutes: int = Field(0, ge=0)  # delay behind the parent ("shifted")
+    transcode_policy: str = "auto"     # "auto" | "transcode"
+    transcode_offload: Optional[str] = None  # "local" | "jellyfin" | "auto"; None = global
+    playout_mode: str = "per_entry"    # "per_entry" | "concat"
+    transcode_profile_id: Optional[int] = None  # None = default profile
+    pretranscode: bool = False         # encode upcoming programmes ahead of time
     libraries: List[LibraryConfig] = []
     genre_filters: Optional[List[GenreFilterConfig]] = None
     collection_sources: Optional[List[CollectionSourceConfig]] = None
@@ -46,6 +53,13 @@ class UpdateChannelRequest(BaseModel):
     enabled: Optional[bool] = None
     channel_type: Optional[str] = None
     schedule_type: Optional[str] = None
+    parent_channel_id: Optional[int] = None
+    time_offset_minutes: Optional[int] = Field(None, ge=0)
+    transcode_policy: Optional[str] = None
+    transcode_offload: Optional[str] = None      # explicit null = global setting
+    playout_mode: Optional[str] = None
+    transcode_profile_id: Optional[int] = None   # explicit null clears it
+    pretranscode: Optional[bool] = None
     libraries: Optional[List[LibraryConfig]] = None
     genre_filters: Optional[List[GenreFilterConfig]] = None
     collection_sources: Optional[List[CollectionSourceConfig]] = None
@@ -110,6 +124,34 @@ class UpdateCollectionRequest(BaseModel):
     items: Optional[List[CollectionItemInput]] = None   # if present, replaces all items
 
 
+# ─── Transcode Profile Schemas ────────────────────────────────────────────────
+
+class CreateTranscodeProfileRequest(BaseModel):
+    """Request body for POST /api/transcode-profiles/"""
+    name: str
+    description: Optional[str] = None
+    max_height: int = Field(1080, ge=144, le=4320)
+    video_preset: str = "veryfast"         # libx264 preset
+    video_crf: Optional[int] = Field(20, ge=0, le=51)  # None = bitrate mode
+    video_bitrate_kbps: int = Field(8000, gt=0)
+    audio_bitrate_kbps: int = Field(192, gt=0)
+    audio_channels: int = Field(2, ge=1, le=8)
+    threads: int = Field(0, ge=0)          # 0 = ffmpeg default
+
+
+class UpdateTranscodeProfileRequest(BaseModel):
+    """Request body for PUT /api/transcode-profiles/{id}"""
+    name: Optional[str] = None
+    description: Optional[str] = None
+    max_height: Optional[int] = Field(None, ge=144, le=4320)
+    video_preset: Optional[str] = None
+    video_crf: Optional[int] = Field(None, ge=0, le=51)   # explicit null = bitrate mode
+    video_bitrate_kbps: Optional[int] = Field(None, gt=0)
+    audio_bitrate_kbps: Optional[int] = Field(None, gt=0)
+    audio_channels: Optional[int] = Field(None, ge=1, le=8)
+    threads: Optional[int] = Field(None, ge=0)
+
+
 # ─── Live TV Registration Schemas ─────────────────────────────────────────────
 
 class RegisterLiveTVRequest(BaseModel):
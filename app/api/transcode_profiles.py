@@ -0,0 +1,126 @@
+"""Transcode profile API — CRUD for per-channel encoder settings."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.logging_config import get_logger
+from app.models.channel import Channel
+from app.models.transcode_profile import TranscodeProfile
+from app.api.schemas import CreateTranscodeProfileRequest, UpdateTranscodeProfileRequest
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+def _profile_to_dict(profile: TranscodeProfile, channel_count: int = 0) -> dict:
+    return {
+        "id": profile.id,
+        "name": profile.name,
+        "description": profile.description,
+        "max_height": profile.max_height,
+        "video_preset": profile.video_preset,
+        "video_crf": profile.video_crf,
+        "video_bitrate_kbps": profile.video_bitrate_kbps,
+        "audio_bitrate_kbps": profile.audio_bitrate_kbps,
+        "audio_channels": profile.audio_channels,
+        "threads": profile.threads,
+        "channel_count": channel_count,
+        "created_at": profile.created_at.isoformat() if profile.created_at else None,
+        "updated_at": profile.updated_at.isoformat() if profile.updated_at else None,
+    }
+
+
+async def _get_profile(profile_id: int, db: AsyncSession) -> TranscodeProfile:
+    profile = await db.get(TranscodeProfile, profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Transcode profile not found")
+    return profile
+
+
+async def _channel_count(profile_id: int, db: AsyncSession) -> int:
+    result = await db.execute(
+        select(func.count()).where(Channel.transcode_profile_id == profile_id)
+    )
+    return result.scalar() or 0
+
+
+# ─── Transcode Profile CRUD ───────────────────────────────────────────────────
+
+@router.get("/")
+async def list_transcode_profiles(db: AsyncSession = Depends(get_db)):
+    """List all transcode profiles with the number of channels using each."""
+    logger.debug("list_transcode_profiles called")
+    result = await db.execute(select(TranscodeProfile).order_by(TranscodeProfile.name))
+    out = [
+        _profile_to_dict(profile, await _channel_count(profile.id, db))
+        for profile in result.scalars().all()
+    ]
+    logger.info(f"list_transcode_profiles: returned {len(out)} profiles")
+    return out
+
+
+@router.get("/{profile_id}")
+async def get_transcode_profile(profile_id: int, db: AsyncSession = Depends(get_db)):
+    """Get one transcode profile."""
+    logger.debug(f"get_transcode_profile: profile_id={profile_id}")
+    profile = await _get_profile(profile_id, db)
+    return _profile_to_dict(profile, await _channel_count(profile_id, db))
+
+
+@router.post("/")
+async def create_transcode_profile(
+    data: CreateTranscodeProfileRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Create a transcode profile."""
+    logger.debug(f"create_transcode_profile: name={data.name!r}")
+    profile = TranscodeProfile(**data.model_dump())
+    db.add(profile)
+    await db.commit()
+    await db.refresh(profile)
+    logger.info(
+        f"create_transcode_profile: created profile '{profile.name}' (id={profile.id})"
+    )
+    return {"id": profile.id, "message": "Transcode profile created successfully"}
+
+
+@router.put("/{profile_id}")
+async def update_transcode_profile(
+    profile_id: int,
+    data: UpdateTranscodeProfileRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Update a transcode profile.  Omitted fields are left unchanged; an
+    explicit null video_crf switches the profile to constant-bitrate mode.
+
+    Channels pick the new settings up at their next programme change.
+    """
+    logger.debug(f"update_transcode_profile: profile_id={profile_id}")
+    profile = await _get_profile(profile_id, db)
+    for field, value in data.model_dump(exclude_unset=True).items():
+        if value is None and field != "video_crf":
+            continue
+        setattr(profile, field, value)
+    await db.commit()
+    logger.info(f"update_transcode_profile: updated profile id={profile_id}")
+    return {"id": profile_id, "message": "Transcode profile updated"}
+
+
+@router.delete("/{profile_id}")
+async def delete_transcode_profile(profile_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete a transcode profile; channels using it fall back to the default."""
+    logger.debug(f"delete_transcode_profile: profile_id={profile_id}")
+    profile = await _get_profile(profile_id, db)
+    # SQLite does not enforce ON DELETE SET NULL without PRAGMA foreign_keys
+    await db.execute(
+        update(Channel)
+        .where(Channel.transcode_profile_id == profile_id)
+        .values(transcode_profile_id=None)
+    )
+    await db.delete(profile)
+    await db.commit()
+    logger.info(f"delete_transcode_profile: deleted profile id={profile_id}")
+    return {"message": "Transcode profile deleted"}
@@ -44,6 +44,88 @@ class Settings(BaseSettings):
     # first audio track if the preferred language is not present.
     PREFERRED_AUDIO_LANGUAGE: str = "eng"
 
+    # Per-viewer send buffer, in 64 KB ffmpeg chunks, for the shared channel
+    # broadcast.  A viewer that falls this far behind real time is
+    # disconnected so it cannot stall the encode for everyone else.
+    # 256 chunks ≈ 16 MB ≈ 16 s of 8 Mbps video.
+    BROADCAST_CLIENT_BUFFER_CHUNKS: int = 256
+
+    # A viewer whose connection accepts no data for this many seconds (a
+    # blocked write, or nothing read while data is waiting) is treated as
+    # gone.  Bounds how long an abandoned encode keeps running.
+    STREAM_WRITE_TIMEOUT: int = 15
+
+    # Sources that already match the output profile (H.264 ≤1080p, AAC) are
+    # stream-copied instead of re-encoded when a channel's transcode_policy
+    # is "auto".  Set True to force a full transcode on every channel.
+    FORCE_TRANSCODE: bool = False
+
+    # Where transcodes run for channels without their own transcode_offload:
+    # "local" (libx264 here), "jellyfin" (Jellyfin transcodes the item to the
+    # channel's profile and we only remux its stream) or "auto" (Jellyfin
+    # while the 1-min load per CPU is at or above TRANSCODE_OFFLOAD_LOAD).
+    TRANSCODE_OFFLOAD: str = "local"
+    TRANSCODE_OFFLOAD_LOAD: float = 0.8
+
+    # Gapless programme changes: start the next entry's ffmpeg this many
+    # seconds before the current one ends and buffer its first keyframe, so
+    # the switch is a buffer handoff.  0 disables the look-ahead.
+    STREAM_PRESTART_SECONDS: int = 5
+
+    # Build a keyframe index for each scheduled file in the background so
+    # tune-in can seek straight to the right keyframe (byte offset for
+    # MPEG-TS/PS sources).  Reads each file once; HTTP-only items are only
+    # indexed when they are MPEG-TS/PS.
+    KEYFRAME_INDEX: bool = True
+
+    # Transcode admission control.  Each channel being streamed (MPEG-TS or
+    # HLS) holds one encode slot however many viewers share it; a tune-in
+    # that would start a new encode over budget gets 503 + Retry-After.
+    # 0 disables a limit.
+    MAX_CONCURRENT_ENCODES: int = 0
+    MAX_LOAD_PER_CPU: float = 0.0   # 1-min load average ÷ CPU count
+    ENCODE_RETRY_AFTER: int = 30    # seconds, sent as Retry-After
+
+    # Channels with playout_mode "concat" run one continuous ffmpeg fed by a
+    # chain of small ffconcat files kept here (one sub-directory per channel).
+    PLAYOUT_CHAIN_DIR: str = "./data/playout"
+
+    # HLS output mode (/api/livetv/hls/{channel_id}/index.m3u8).
+    # Segments and playlists are written under HLS_DIR/<channel_id>/ — point
+    # this at a tmpfs such as /dev/shm/jellystream-hls to keep them off disk.
+    HLS_DIR: str = "./data/hls"
+    HLS_SEGMENT_SECONDS: int = 4
+    HLS_LIST_SIZE: int = 6          # segments kept in the rolling playlist
+    HLS_IDLE_TIMEOUT: int = 60      # stop the encode after this long unrequested
+    HLS_START_TIMEOUT: int = 20     # max wait for the first segment on tune-in
+    # Adaptive-bitrate ladder for HLS as height:video_kbps rungs, e.g.
+    # "1080:6000,720:3000,480:1200".  One decode is split into every rendition
+    # and a master.m3u8 lets clients pick; empty = single-rendition HLS.
+    HLS_ABR_LADDER: str = ""
+
+    # Ahead-of-time transcode cache.  Channels with `pretranscode` enabled
+    # have the next PRETRANSCODE_HOURS of programmes encoded in the background
+    # (lowest CPU priority, paused above PRETRANSCODE_MAX_LOAD per core) into
+    # PRETRANSCODE_DIR, bounded to PRETRANSCODE_MAX_GB with LRU eviction.
+    # Cached programmes air as a stream copy.  0 hours disables the worker.
+    PRETRANSCODE_HOURS: int = 0
+    PRETRANSCODE_DIR: str = "./data/pretranscode"
+    PRETRANSCODE_MAX_GB: float = 20.0
+    PRETRANSCODE_MAX_LOAD: float = 0.5
+
+    # Time-shift buffer: keep the last TIMESHIFT_MINUTES of every running
+    # MPEG-TS broadcast on disk under TIMESHIFT_DIR, so viewers can rewind
+    # (?rewind=N) or restart the current programme.  0 disables.
+    TIMESHIFT_MINUTES: int = 0
+    TIMESHIFT_DIR: str = "./data/timeshift"
+
+    # Read-through cache for Jellyfin HTTP sources.  Items without a local
+    # file are read by ffmpeg through /api/livetv/source/, which serves Range
+    # requests from 4 MiB chunks cached under SOURCE_CACHE_DIR (LRU, bounded
+    # to SOURCE_CACHE_MAX_GB) and reads ahead.  0 GB disables it.
+    SOURCE_CACHE_MAX_GB: float = 0.0
+    SOURCE_CACHE_DIR: str = "./data/source_cache"
+
     # Media path mapping for direct file access.
     # Maps the path prefix Jellyfin reports to the path where the same
     # files are accessible on THIS machine.
@@ -51,9 +133,23 @@ class Settings(BaseSettings):
     # Example: "/media:/mnt/nas/media" or leave blank if same machine.
     MEDIA_PATH_MAP: str = ""
 
+    # Music channels: add the track's album art (or a black frame) as a 1 fps
+    # still-picture video stream, for clients that won't play audio-only.
+    MUSIC_STILL_VIDEO: bool = True
+
     # Paths
     COMMERCIALS_PATH: str = "./data/commercials"
+    # Filler: clips in COMMERCIALS_PATH are encoded once per channel profile
+    # into FILLER_DIR and stream-copied into schedule gaps instead of dead air.
+    FILLER_ENABLED: bool = False
+    FILLER_DIR: str = "./data/filler"
     LOGOS_PATH: str = "./data/logos"
+    # Static EPG: keep xmltv.xml, xmltv.xml.gz and channels.m3u in
+    # STATIC_EPG_DIR up to date (rewritten on every channel/schedule change,
+    # debounced, and hourly) for a static web server to serve.
+    STATIC_EPG_ENABLED: bool = False
+    STATIC_EPG_DIR: str = "./data/epg"
+    STATIC_EPG_DEBOUNCE_SECONDS: float = 5.0
 
     # Scheduler
     SCHEDULER_ENABLED: bool = True
@@ -49,6 +49,7 @@ async def init_db():
     # before create_all is called. Order matters for FK references.
     import app.models.stream          # legacy — kept for backward compat
     import app.models.schedule        # legacy — kept for backward compat
+    import app.models.transcode_profile
     import app.models.channel
     import app.models.channel_library
     import app.models.genre_filter
@@ -56,6 +57,8 @@ async def init_db():
     import app.models.collection
     import app.models.collection_item
     import app.models.channel_collection_source
+    import app.models.media_info
+    import app.models.filler_clip
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -69,6 +72,15 @@ async def init_db():
         "ALTER TABLE schedule_entries ADD COLUMN air_date VARCHAR(20)",
         "ALTER TABLE channels ADD COLUMN channel_type VARCHAR(20) DEFAULT 'video'",
         "ALTER TABLE genre_filters ADD COLUMN filter_type VARCHAR(10) DEFAULT 'include'",
+        "ALTER TABLE channels ADD COLUMN transcode_policy VARCHAR(20) DEFAULT 'auto'",
+        "ALTER TABLE channels ADD COLUMN playout_mode VARCHAR(20) DEFAULT 'per_entry'",
+        "ALTER TABLE channels ADD COLUMN transcode_profile_id INTEGER",
+        "ALTER TABLE media_info ADD COLUMN format_name VARCHAR(64)",
+        "ALTER TABLE media_info ADD COLUMN keyframes BLOB",
+        "ALTER TABLE channels ADD COLUMN pretranscode BOOLEAN DEFAULT 0",
+        "ALTER TABLE channels ADD COLUMN parent_channel_id INTEGER",
+        "ALTER TABLE channels ADD COLUMN time_offset_minutes INTEGER DEFAULT 0",
+        "ALTER TABLE channels ADD COLUMN transcode_offload VARCHAR(20)",
     ]
     for stmt in _migrations:
         try:
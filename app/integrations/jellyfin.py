@@ -3,6 +3,7 @@
 import aiohttp
 import uuid
 from typing import List, Dict, Any, Optional
+from urllib.parse import urlencode
 
 from app.core.logging_config import get_logger
 
@@ -224,10 +225,54 @@ class JellyfinClient:
                 logger.debug(f"get_item_info: returned item '{item.get('Name')}' (id={item_id})")
                 return item
 
-    async def get_stream_url(self, item_id: str) -> str:
-        """Get streaming URL for an item."""
-        url = f"{self.base_url}/Videos/{item_id}/stream?api_key={self.api_key}"
-        logger.debug(f"get_stream_url: item_id={item_id}")
+    async def get_stream_url(
+        self,
+        item_id: str,
+        start_seconds: int = 0,
+        max_height: Optional[int] = None,
+        video_bitrate_kbps: Optional[int] = None,
+        audio_bitrate_kbps: Optional[int] = None,
+        audio_channels: Optional[int] = None,
+        audio_stream_index: Optional[int] = None,
+        transcode: bool = False,
+    ) -> str:
+        """
+        Get streaming URL for an item.
+
+        By default this is the original file.  With transcode=True Jellyfin
+        encodes the item itself into an H.264/AAC MPEG-TS stream starting at
+        start_seconds, capped at the given height and bitrates.  Each URL
+        carries its own PlaySessionId so Jellyfin tracks (and stops) every
+        transcode separately.
+        """
+        if not transcode:
+            url = f"{self.base_url}/Videos/{item_id}/stream?api_key={self.api_key}"
+            logger.debug(f"get_stream_url: item_id={item_id}")
+            return url
+
+        params = {
+            "api_key": self.api_key,
+            "MediaSourceId": item_id,
+            "DeviceId": self.device_id,
+            "PlaySessionId": uuid.uuid4().hex,
+            "VideoCodec": "h264",
+            "AudioCodec": "aac",
+            "StartTimeTicks": start_seconds * 10_000_000,   # 100 ns units
+        }
+        if max_height:
+            params["MaxHeight"] = max_height
+        if video_bitrate_kbps:
+            params["VideoBitRate"] = video_bitrate_kbps * 1000
+        if audio_bitrate_kbps:
+            params["AudioBitRate"] = audio_bitrate_kbps * 1000
+        if audio_channels:
+            params["MaxAudioChannels"] = audio_channels
+        if audio_stream_index is not None:
+            params["AudioStreamIndex"] = audio_stream_index
+        url = f"{self.base_url}/Videos/{item_id}/stream.ts?{urlencode(params)}"
+        logger.debug(
+            f"get_stream_url: item_id={item_id} — Jellyfin transcode from {start_seconds}s"
+        )
         return url
 
     # Collections / Browse Methods
@@ -63,6 +63,8 @@ async def shutdown_event():
     logger.info("Shutting down JellyStream...")
     from app.services.scheduler import stop_scheduler
     stop_scheduler()
+    from app.services import source_cache
+    await source_cache.close()
     logger.info("JellyStream shutdown complete")
 
 
@@ -1,6 +1,6 @@
 """Channel model — represents a virtual TV channel."""
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
 from sqlalchemy.sql import func
 
 from app.core.database import Base
@@ -23,12 +23,44 @@ class Channel(Base):
     enabled = Column(Boolean, default=True)
 
     # "video" — sources from movies/tvshows libraries (default)
-    # "music" — sources from music libraries (planned, not yet active)
+    # "music" — audio tracks from music libraries, streamed with a still
+    #           picture (album art) instead of a video encode
     channel_type = Column(String(20), default="video", nullable=False)
 
     # "manual"     — user manually adds schedule entries
     # "genre_auto" — auto-generated from library + genre filters
+    # "shifted"    — no entries of its own; plays parent_channel_id's schedule
+    #                time_offset_minutes later (e.g. "Movies +1")
     schedule_type = Column(String(20), default="genre_auto", nullable=False)
+    parent_channel_id = Column(
+        Integer, ForeignKey("channels.id", ondelete="CASCADE"), nullable=True
+    )
+    time_offset_minutes = Column(Integer, default=0, nullable=False)
+
+    # "auto"      — stream-copy sources that already fit the output profile
+    #               (H.264 ≤1080p, AAC stereo), transcode everything else
+    # "transcode" — always re-encode (e.g. for sources with broken timestamps)
+    transcode_policy = Column(String(20), default="auto", nullable=False)
+
+    # Where transcodes run: "local", "jellyfin" (Jellyfin encodes, we only
+    # remux) or "auto" (Jellyfin while the local load is high); NULL uses
+    # the global TRANSCODE_OFFLOAD setting
+    transcode_offload = Column(String(20), nullable=True)
+
+    # "per_entry" — one ffmpeg per programme (timestamps restart each time)
+    # "concat"    — one long-lived ffmpeg fed by a chained ffconcat playlist,
+    #               so timestamps stay monotonic across programmes
+    playout_mode = Column(String(20), default="per_entry", nullable=False)
+
+    # Encoder settings (resolution cap, preset, rate control, audio, threads);
+    # NULL uses the built-in default profile
+    transcode_profile_id = Column(
+        Integer, ForeignKey("transcode_profiles.id", ondelete="SET NULL"), nullable=True
+    )
+
+    # Encode upcoming programmes ahead of time into the pre-transcode cache
+    # (PRETRANSCODE_HOURS) so they air as a stream copy
+    pretranscode = Column(Boolean, default=False, nullable=False)
 
     # Jellyfin Live TV registration IDs (set after registering with Jellyfin)
     tuner_host_id = Column(String(255), nullable=True)
@@ -0,0 +1,39 @@
+"""FillerClip model — a commercial/ident pre-encoded for a transcode profile."""
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class FillerClip(Base):
+    """
+    One clip from COMMERCIALS_PATH, encoded once into one output profile.
+
+    The encoded file lives under FILLER_DIR and is stream-copied into
+    schedule gaps, so it must match the channel's profile exactly; a clip
+    therefore has one row per profile it has been encoded for.  Rows whose
+    source_size / source_mtime no longer match the clip on disk are
+    re-encoded.
+    """
+
+    __tablename__ = "filler_clips"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # The clip in COMMERCIALS_PATH and the file it was encoded from
+    source_path = Column(Text, nullable=False)
+    source_size = Column(BigInteger, nullable=False)
+    source_mtime = Column(Float, nullable=False)
+
+    # Hash of the EncodeProfile the clip was encoded with
+    profile_key = Column(String(40), nullable=False)
+
+    path = Column(Text, nullable=False)                  # encoded MPEG-TS file
+    duration = Column(Float, nullable=False)             # seconds
+
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_filler_profile", "profile_key"),
+    )
@@ -0,0 +1,57 @@
+"""MediaInfo model — cached ffprobe results for a media file."""
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, Index, Integer, LargeBinary, String, Text,
+)
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class MediaInfo(Base):
+    """
+    Stream layout of one media file, as reported by ffprobe.
+
+    Local files are keyed by file_path and are only trusted while file_size
+    and file_mtime still match the file on disk.  Items only reachable over
+    Jellyfin HTTP have no file_path and are keyed by media_item_id instead.
+
+    Rows are filled in the background after schedule generation so that
+    tuning in (and every programme transition) is a lookup rather than an
+    ffprobe subprocess.
+    """
+
+    __tablename__ = "media_info"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Identity
+    file_path = Column(Text, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    file_mtime = Column(Float, nullable=True)
+    media_item_id = Column(String(255), nullable=True)
+
+    # Video (first non-cover-art video stream)
+    video_codec = Column(String(32), nullable=True)      # e.g. "h264", "hevc"
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    pix_fmt = Column(String(32), nullable=True)          # e.g. "yuv420p"
+    video_bitrate = Column(Integer, nullable=True)       # kbps, when known
+    overall_bitrate = Column(Integer, nullable=True)     # kbps, container level
+
+    # Tracks — JSON arrays of {"index", "codec", "channels", "language"}
+    audio_tracks = Column(Text, nullable=True)
+    subtitle_tracks = Column(Text, nullable=True)
+
+    duration = Column(Float, nullable=True)              # seconds
+    format_name = Column(String(64), nullable=True)      # e.g. "mpegts", "matroska,webm"
+    probed_at = Column(DateTime, server_default=func.now())
+
+    # Video keyframe index — see media_info.encode_keyframes for the layout.
+    # Built by the background prober; NULL until then.
+    keyframes = Column(LargeBinary, nullable=True)
+
+    __table_args__ = (
+        Index("ix_media_info_path", "file_path"),
+        Index("ix_media_info_item", "media_item_id"),
+    )
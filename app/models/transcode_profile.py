@@ -0,0 +1,40 @@
+"""TranscodeProfile model — encoder settings a channel can be assigned."""
+
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class TranscodeProfile(Base):
+    """
+    A named set of ffmpeg output settings.
+
+    Channels reference a profile through Channel.transcode_profile_id;
+    channels without one use the built-in default (1080p, CRF 20, veryfast,
+    8 Mbps cap, 192k stereo AAC).  The profile is also the output profile for
+    stream-copy decisions: a source is only passed through when it already
+    fits the profile's resolution and bitrate caps.
+    """
+
+    __tablename__ = "transcode_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+
+    # Video (libx264)
+    max_height = Column(Integer, default=1080, nullable=False)        # e.g. 720, 1080
+    video_preset = Column(String(20), default="veryfast", nullable=False)
+    video_crf = Column(Integer, nullable=True)                         # None → constant bitrate
+    video_bitrate_kbps = Column(Integer, default=8000, nullable=False) # maxrate (CRF) or target
+
+    # Audio (AAC)
+    audio_bitrate_kbps = Column(Integer, default=192, nullable=False)
+    audio_channels = Column(Integer, default=2, nullable=False)
+
+    # Encoder threads per ffmpeg; 0 lets ffmpeg decide (one per core)
+    threads = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,268 @@
+"""Per-channel broadcaster — one encode shared by every viewer of a channel.
+
+The first viewer to tune in starts a producer task that pulls MPEG-TS chunks
+from a source iterator (the stream proxy's continuous ffmpeg generator) and
+copies each chunk into a bounded queue per connected client.  Later viewers
+simply attach another queue to the running producer, so five viewers on one
+channel cost one ffmpeg process instead of five.
+
+When the last viewer disconnects the producer task is cancelled, which in turn
+kills the underlying ffmpeg process.  Time-shift viewers, who read the
+channel's on-disk buffer instead of a queue, keep the producer alive with
+hold()/release().
+
+A client whose queue fills up (it cannot keep up with real time) is
+disconnected rather than allowed to stall the producer for everyone else.
+
+Vanished clients are detected actively rather than on the next failed write:
+BroadcastResponse ends a viewer's response on ASGI http.disconnect or when a
+single write blocks longer than STREAM_WRITE_TIMEOUT, and a reaper evicts
+any client that has stopped reading for that long.  An encode left with no
+readers is therefore killed within about STREAM_WRITE_TIMEOUT seconds.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+import anyio
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Send
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services.sessions import ViewerSession, close_viewer
+
+logger = get_logger(__name__)
+
+# Sentinel placed on a client queue to tell its reader the stream has ended.
+_END = None
+
+# How often the reaper looks for stalled clients (seconds)
+_REAPER_INTERVAL = 5
+
+SourceFactory = Callable[[], AsyncIterator[bytes]]
+
+
+class ChannelBroadcaster:
+    """Fan out one channel's MPEG-TS output to any number of client queues."""
+
+    def __init__(self, channel_id: int, source_factory: SourceFactory):
+        self.channel_id = channel_id
+        self._source_factory = source_factory
+        self._clients: Set[asyncio.Queue] = set()
+        self._last_read: Dict[asyncio.Queue, float] = {}
+        self._holds = 0                 # time-shift viewers (no queue)
+        self._task: Optional[asyncio.Task] = None
+        self.started_at = time.monotonic()
+
+    @property
+    def viewer_count(self) -> int:
+        return len(self._clients) + self._holds
+
+    @property
+    def idle(self) -> bool:
+        """True when nobody is watching, live or time-shifted."""
+        return not self._clients and not self._holds
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Attach a new client queue, starting the producer if needed."""
+        queue: asyncio.Queue = asyncio.Queue(
+            maxsize=settings.BROADCAST_CLIENT_BUFFER_CHUNKS
+        )
+        self._clients.add(queue)
+        self._last_read[queue] = time.monotonic()
+        logger.info(
+            f"ChannelBroadcaster: channel={self.channel_id} viewer joined "
+            f"({self.viewer_count} watching)"
+        )
+        if not self.running:
+            logger.info(f"ChannelBroadcaster: channel={self.channel_id} starting encode")
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def hold(self) -> None:
+        """Keep the running encode alive for a viewer that reads elsewhere."""
+        self._holds += 1
+
+    def release(self) -> None:
+        """Drop a hold(), stopping the producer if nobody is left."""
+        self._holds = max(0, self._holds - 1)
+        if self.idle:
+            self.stop()
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Detach a client queue, stopping the producer if it was the last one."""
+        if queue not in self._clients:
+            return
+        self._clients.discard(queue)
+        self._last_read.pop(queue, None)
+        logger.info(
+            f"ChannelBroadcaster: channel={self.channel_id} viewer left "
+            f"({self.viewer_count} watching)"
+        )
+        if self.idle:
+            self.stop()
+
+    def stop(self) -> None:
+        """Cancel the producer task (kills ffmpeg via the generator's finally)."""
+        # Unregister first so a viewer arriving while ffmpeg shuts down gets a
+        # fresh broadcaster instead of attaching to this dying one.
+        if _broadcasters.get(self.channel_id) is self:
+            del _broadcasters[self.channel_id]
+        if self.running:
+            logger.info(f"ChannelBroadcaster: channel={self.channel_id} stopping encode")
+            self._task.cancel()
+
+    async def iter_client(self, queue: asyncio.Queue) -> AsyncIterator[bytes]:
+        """Yield chunks for one client until the stream ends or it disconnects."""
+        try:
+            while True:
+                chunk = await queue.get()
+                self._last_read[queue] = time.monotonic()
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            self.unsubscribe(queue)
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    def _end_client(self, queue: asyncio.Queue) -> None:
+        """Drop any buffered data for a client and wake its reader with _END."""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_END)
+
+    def _evict(self, queue: asyncio.Queue, reason: str) -> None:
+        logger.warning(
+            f"ChannelBroadcaster: channel={self.channel_id} client {reason}, "
+            f"disconnecting it"
+        )
+        self._clients.discard(queue)
+        self._last_read.pop(queue, None)
+        self._end_client(queue)
+
+    async def _reap(self) -> None:
+        """
+        Evict clients that have data waiting but have not read any for
+        STREAM_WRITE_TIMEOUT seconds, and stop an encode nobody reads.
+        """
+        while True:
+            await asyncio.sleep(_REAPER_INTERVAL)
+            now = time.monotonic()
+            for queue in list(self._clients):
+                idle = now - self._last_read.get(queue, now)
+                if not queue.empty() and idle > settings.STREAM_WRITE_TIMEOUT:
+                    self._evict(queue, f"stopped reading {idle:.0f}s ago")
+            if self.idle:
+                logger.info(
+                    f"ChannelBroadcaster: channel={self.channel_id} no readers left"
+                )
+                self.stop()
+                return
+
+    async def _run(self) -> None:
+        source = self._source_factory()
+        reaper = asyncio.create_task(self._reap())
+        try:
+            async for chunk in source:
+                for queue in list(self._clients):
+                    try:
+                        queue.put_nowait(chunk)
+                    except asyncio.QueueFull:
+                        self._evict(queue, f"fell {queue.maxsize} chunks behind")
+                if self.idle:
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as exc:
+            logger.error(
+                f"ChannelBroadcaster: channel={self.channel_id} producer failed: {exc}",
+                exc_info=True,
+            )
+        finally:
+            reaper.cancel()
+            await source.aclose()
+            for queue in list(self._clients):
+                self._end_client(queue)
+            self._clients.clear()
+            self._last_read.clear()
+            if _broadcasters.get(self.channel_id) is self:
+                del _broadcasters[self.channel_id]
+            logger.info(f"ChannelBroadcaster: channel={self.channel_id} encode stopped")
+
+
+class BroadcastResponse(StreamingResponse):
+    """
+    StreamingResponse for one broadcast viewer.
+
+    Starlette already stops streaming when the client sends http.disconnect;
+    this adds a write-stall timeout (a send() blocked for longer than
+    STREAM_WRITE_TIMEOUT ends the response) and closes the body iterator as
+    soon as streaming stops, so the viewer is unsubscribed at once instead
+    of whenever the generator is garbage-collected.  When given a
+    ViewerSession it counts the bytes sent and closes the session at the end.
+    """
+
+    def __init__(self, *args, viewer: Optional[ViewerSession] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.viewer = viewer
+
+    async def listen_for_disconnect(self, receive: Receive) -> None:
+        await super().listen_for_disconnect(receive)
+        logger.debug("BroadcastResponse: client sent http.disconnect")
+
+    async def stream_response(self, send: Send) -> None:
+        timeout = settings.STREAM_WRITE_TIMEOUT
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            async for chunk in self.body_iterator:
+                try:
+                    await asyncio.wait_for(
+                        send({"type": "http.response.body", "body": chunk, "more_body": True}),
+                        timeout=timeout,
+                    )
+                except asyncio.TimeoutError:
+                    # Returning without completing the response makes the
+                    # server drop the connection.
+                    logger.warning(
+                        f"BroadcastResponse: write blocked for {timeout}s, "
+                        f"dropping client"
+                    )
+                    return
+                if self.viewer is not None:
+                    self.viewer.bytes_sent += len(chunk)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if self.viewer is not None:
+                close_viewer(self.viewer)
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+# Process-wide registry: one broadcaster per channel with at least one viewer.
+_broadcasters: Dict[int, ChannelBroadcaster] = {}
+
+
+def get_broadcaster(channel_id: int, source_factory: SourceFactory) -> ChannelBroadcaster:
+    """Return the live broadcaster for a channel, creating it if necessary."""
+    broadcaster = _broadcasters.get(channel_id)
+    if broadcaster is None:
+        broadcaster = ChannelBroadcaster(channel_id, source_factory)
+        _broadcasters[channel_id] = broadcaster
+    return broadcaster
+
+
+def active_broadcasters() -> Dict[int, ChannelBroadcaster]:
+    """Snapshot of channels that currently have a running encode."""
+    return dict(_broadcasters)
@@ -0,0 +1,276 @@
+"""Continuous playout — one long-lived ffmpeg per channel.
+
+In the default per-entry mode every programme gets its own ffmpeg process,
+so PTS/PCR restart at every programme change and clients have to resync.
+Channels with playout_mode "concat" instead run a single ffmpeg whose input
+is a chain of small ffconcat files under PLAYOUT_CHAIN_DIR/<channel_id>/:
+
+    chain_000000.ffconcat   current entry (inpoint = join offset)
+                            → chain_000001.ffconcat
+    chain_000001.ffconcat   next entry → chain_000002.ffconcat
+    ...
+
+The concat demuxer only opens the next chain file when the current entry
+finishes, so a writer task appends one link ahead as each entry goes on
+air.  Timestamps stay monotonic for as long as the chain continues.
+
+The chain is deliberately broken — ffmpeg exits and a fresh process starts
+through the normal _wait_for_playable path — when the schedule has a gap,
+when the next source cannot be resolved, and every _MAX_CHAIN_LINKS
+programmes (each link nests one more demuxer inside ffmpeg).
+
+Concat mode always transcodes and maps each file's first audio track:
+stream layouts and codecs differ between files, and the concat demuxer
+takes its stream list from the first one.  It therefore plans without the
+pre-transcode cache or Jellyfin offload, which would only be encoded again
+(or never read) here.
+"""
+
+import asyncio
+import os
+import shutil
+from asyncio.subprocess import PIPE
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import get_logger
+from app.models.schedule_entry import ScheduleEntry
+from app.services.ffmpeg_monitor import watch_ffmpeg
+from app.services.sessions import EncodeSession
+from app.services.stream_proxy import (
+    DEFAULT_PROFILE,
+    EncodeProfile,
+    record_source_failure,
+    record_source_success,
+    _audio_codec_args,
+    _build_output_args,
+    _get_encode_profile,
+    _get_next_entry,
+    _kill,
+    _resolve_source,
+    _video_codec_args,
+    _wait_for_playable,
+)
+
+logger = get_logger(__name__)
+
+# Chain files are numbered so a link is never rewritten after ffmpeg read it
+_CHAIN_NAME = "chain_{:06d}.ffconcat"
+
+# Restart ffmpeg after this many programmes to bound the demuxer nesting
+_MAX_CHAIN_LINKS = 48
+
+# How often the writer re-checks for the next entry when it is not scheduled yet
+_WRITER_POLL_INTERVAL = 5
+
+
+def _quote(path: str) -> str:
+    """Quote a path or URL for an ffconcat `file` directive."""
+    return "'" + path.replace("'", "'\\''") + "'"
+
+
+def _chain_text(
+    source: str, inpoint: int, outpoint: float, next_chain: Optional[str]
+) -> str:
+    """
+    One link of the chain: the entry's source trimmed to its schedule slot,
+    followed by the next chain file (if the chain continues).
+
+    Nested ffconcat files are opened with default demuxer options, so the
+    link carries `option safe 0` for absolute paths and URLs.
+    """
+    lines = ["ffconcat version 1.0", f"file {_quote(source)}"]
+    if inpoint > 0:
+        lines.append(f"inpoint {inpoint}")
+    lines.append(f"outpoint {outpoint:.3f}")
+    if next_chain:
+        lines += [f"file {_quote(next_chain)}", "option safe 0"]
+    return "\n".join(lines) + "\n"
+
+
+def _build_concat_cmd(
+    chain_path: str, profile: EncodeProfile = DEFAULT_PROFILE
+) -> list:
+    return [
+        "ffmpeg",
+        "-nostats", "-progress", "pipe:2",  # key=value progress on stderr
+        # ── Input — chained ffconcat playlist ───────────────────────────────
+        "-re",                         # pace the whole chain to wall clock
+        "-f", "concat",
+        "-safe", "0",                  # absolute paths and Jellyfin URLs
+        "-protocol_whitelist", "file,http,https,tcp,tls,crypto",
+        "-i", chain_path,
+        # ── Stream mapping ────────────────────────────────────────────────────
+        "-map", "0:v:0",
+        "-map", "0:a:0",               # per-file language selection n/a here
+        # ── Video / audio — always re-encoded so parameters never change ─────
+        *_video_codec_args(profile=profile),
+        *_audio_codec_args(profile=profile),
+        # ── Output ───────────────────────────────────────────────────────────
+        *_build_output_args(None),
+    ]
+
+
+class _Chain:
+    """The ffconcat chain files for one ffmpeg run."""
+
+    def __init__(
+        self, channel_id: int, directory: str, encode: Optional[EncodeSession] = None
+    ):
+        self.channel_id = channel_id
+        self.directory = directory
+        self.encode = encode
+
+    def path(self, link: int) -> str:
+        return os.path.abspath(os.path.join(self.directory, _CHAIN_NAME.format(link)))
+
+    def write(
+        self, link: int, entry: ScheduleEntry, source: str, inpoint: int = 0
+    ) -> str:
+        """Write one link atomically and return its path."""
+        next_chain = self.path(link + 1) if link + 1 < _MAX_CHAIN_LINKS else None
+        slot = (entry.end_time - entry.start_time).total_seconds()
+        path = self.path(link)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_chain_text(source, inpoint, slot, next_chain))
+        os.replace(tmp, path)
+        # Links more than one behind have been read by ffmpeg already
+        if link >= 2:
+            try:
+                os.remove(self.path(link - 2))
+            except FileNotFoundError:
+                pass
+        return path
+
+    async def extend(self, entry: ScheduleEntry) -> None:
+        """
+        Keep one link ahead of what is on air.
+
+        Each time an entry goes on air the link for the entry after it is
+        written.  Returns (leaving the chain to end) at a schedule gap, on a
+        resolve failure, or when _MAX_CHAIN_LINKS is reached.
+        """
+        link = 0
+        while link + 1 < _MAX_CHAIN_LINKS:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            await asyncio.sleep(max(0.0, (entry.start_time - now).total_seconds()))
+            if link > 0 and self.encode is not None:
+                self.encode.set_entry(entry, 0, "transcode", None)
+
+            next_entry = await self._find_next(entry)
+            if next_entry is None:
+                logger.info(
+                    f"_Chain: channel={self.channel_id} nothing follows "
+                    f"'{entry.title}' back-to-back, chain ends there"
+                )
+                return
+            try:
+                source = await _resolve_source(next_entry, self.channel_id)
+            except Exception as exc:
+                logger.error(
+                    f"_Chain: channel={self.channel_id} could not resolve "
+                    f"'{next_entry.title}': {exc}, chain ends before it"
+                )
+                return
+
+            link += 1
+            self.write(link, next_entry, source)
+            logger.debug(
+                f"_Chain: channel={self.channel_id} link {link} → "
+                f"'{next_entry.title}' (id={next_entry.id})"
+            )
+            entry = next_entry
+
+    async def _find_next(self, entry: ScheduleEntry) -> Optional[ScheduleEntry]:
+        """Poll for the entry after `entry` until it appears or `entry` ends."""
+        while True:
+            async with AsyncSessionLocal() as db:
+                next_entry = await _get_next_entry(self.channel_id, entry, db)
+            if next_entry is not None:
+                return next_entry
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if entry.end_time <= now:
+                return None
+            await asyncio.sleep(_WRITER_POLL_INTERVAL)
+
+
+async def concat_stream_generator(
+    channel_id: int,
+    chunk_size: int = 65536,
+    encode: Optional[EncodeSession] = None,
+):
+    """
+    Yield MPEG-TS chunks from one continuous ffmpeg run per chain.
+
+    Drop-in alternative to _continuous_stream_generator for channels whose
+    playout_mode is "concat".  When the chain ends (see module docstring)
+    ffmpeg exits and a new run starts from whatever is on air.
+    """
+    directory = os.path.join(settings.PLAYOUT_CHAIN_DIR, str(channel_id))
+    try:
+        while True:
+            # ffmpeg here always transcodes playout.source itself
+            playout = await _wait_for_playable(
+                channel_id, "concat_stream_generator",
+                use_cache=False, allow_offload=False,
+            )
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+
+            chain = _Chain(channel_id, directory, encode)
+            first = chain.write(
+                0, playout.entry, playout.source, inpoint=playout.offset_seconds
+            )
+            async with AsyncSessionLocal() as db:
+                profile = await _get_encode_profile(channel_id, db)
+            writer = asyncio.create_task(chain.extend(playout.entry))
+            logger.debug(
+                f"concat_stream_generator: channel={channel_id} starting ffmpeg at "
+                f"'{playout.entry.title}' offset={playout.offset_seconds}s"
+            )
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *_build_concat_cmd(first, profile), stdout=PIPE, stderr=PIPE
+                )
+            except FileNotFoundError:
+                writer.cancel()
+                logger.error("concat_stream_generator: ffmpeg not found")
+                return  # Cannot recover — end the stream
+            monitor = watch_ffmpeg(process, f"channel={channel_id} (concat)", encode)
+            if encode is not None:
+                encode.set_entry(
+                    playout.entry, playout.offset_seconds, "transcode", process.pid
+                )
+
+            first = True
+            try:
+                while True:
+                    chunk = await process.stdout.read(chunk_size)
+                    if not chunk:
+                        break
+                    if first:
+                        record_source_success(playout.entry)
+                    first = False
+                    yield chunk
+            finally:
+                writer.cancel()
+                await _kill(process)
+                logger.info(
+                    f"concat_stream_generator: channel={channel_id} chain ended, "
+                    f"restarting from the current entry"
+                )
+
+            if first:
+                # ffmpeg produced nothing — classify why and back off accordingly
+                error = await monitor.wait()
+                await asyncio.sleep(record_source_failure(
+                    channel_id, playout.entry, error, "concat_stream_generator"
+                ))
+            else:
+                # Tiny pause to avoid a tight spin if ffmpeg exits instantly (bad source)
+                await asyncio.sleep(0.2)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
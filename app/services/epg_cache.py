@@ -0,0 +1,309 @@
+"""Rendered EPG and playlist cache.
+
+Jellyfin polls the XMLTV guide and M3U playlist on a timer, and between two
+polls the schedule rarely changes.  Instead of rebuilding them per request,
+the rendered documents are kept together with a gzip copy and an ETag
+(see Document):
+
+- a document is keyed by timeline.version() (bumped by every change to
+  channels or schedule entries), the EPG window and the public base URL, so
+  a poll after no change costs no query at all;
+- when the key moved, only the channels whose schedule version changed have
+  their programmes re-rendered (in one query); the rest reuse their cached
+  fragment;
+- a document is never joined into one string: it is streamed from its
+  fragments, and hashed and compressed as it goes on first delivery;
+- the EPG window starts on the hour, so the cached guide stays valid for up
+  to an hour before it slides;
+- anything older than _MAX_AGE is rendered again regardless, in case the
+  database was changed behind the app's back.
+"""
+
+import asyncio
+import hashlib
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import get_logger
+from app.models.channel import Channel
+from app.services import timeline, xmltv
+from app.services.shifted_channels import ScheduleSource
+
+logger = get_logger(__name__)
+
+# EPG window around the current hour
+EPG_HISTORY = timedelta(hours=3)
+EPG_FUTURE = timedelta(days=7)
+
+# Render again at least this often (seconds) even without invalidation
+_MAX_AGE = 900.0
+
+# Documents are streamed in pieces of this many characters
+_CHUNK_CHARS = 64 * 1024
+
+
+def public_base_url() -> str:
+    """Network-accessible base URL used in stream, thumbnail and icon links."""
+    if settings.JELLYSTREAM_PUBLIC_URL:
+        return settings.JELLYSTREAM_PUBLIC_URL.rstrip("/")
+    host = settings.HOST.rstrip("/")
+    if not host.startswith("http"):
+        host = f"http://{host}"
+    return f"{host}:{settings.PORT}"
+
+
+def m3u_line(channel: Channel, base_url: str) -> str:
+    ch_num = channel.channel_number or f"100.{channel.id}"
+    stream_url = f"{base_url}/api/livetv/stream/{channel.id}"
+    return (
+        f'#EXTINF:-1 tvg-id="{channel.id}" tvg-name="{channel.name}" '
+        f'tvg-chno="{ch_num}" group-title="JellyStream",'
+        f'{ch_num} {channel.name}\n'
+        f'{stream_url}\n'
+    )
+
+
+def epg_window(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """The EPG window (-3h to +7d) measured from the start of the current hour."""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    return hour - EPG_HISTORY, hour + EPG_FUTURE
+
+
+class Document:
+    """
+    A rendered document, kept as the list of strings it is made of (cached
+    fragments are shared, never copied into one big string).
+
+    Its ETag and gzip copy are worked out while it is first streamed in
+    full, so a cache miss is sent as it is produced and later requests get
+    the ETag, 304s and the pre-compressed body.
+    """
+
+    def __init__(self, parts: Sequence[str]):
+        self.parts = parts
+        self.etag: Optional[str] = None
+        self.gzipped: Optional[bytes] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.etag is not None
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True if an If-None-Match header value names this document."""
+        if not if_none_match or self.etag is None:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def chunks(self) -> Iterator[bytes]:
+        """The body, encoded, in pieces of at most _CHUNK_CHARS characters."""
+        for part in self.parts:
+            for i in range(0, len(part), _CHUNK_CHARS):
+                yield part[i:i + _CHUNK_CHARS].encode("utf-8")
+
+    def stream(self, compressed: bool = False) -> Iterator[bytes]:
+        """
+        Yield the body, gzip-compressed if asked.  The first full pass
+        hashes and compresses it as it goes; a pass cut short (client gone)
+        leaves the document incomplete for the next one to finish.
+        """
+        if self.complete:
+            if compressed:
+                for i in range(0, len(self.gzipped), _CHUNK_CHARS):
+                    yield self.gzipped[i:i + _CHUNK_CHARS]
+            else:
+                yield from self.chunks()
+            return
+
+        digest = hashlib.sha1()
+        # wbits=31: gzip framing; zlib writes mtime 0, so identical bodies
+        # compress to identical bytes
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        gzipped = []
+        for chunk in self.chunks():
+            digest.update(chunk)
+            packed = compressor.compress(chunk)
+            gzipped.append(packed)
+            if not compressed:
+                yield chunk
+            elif packed:
+                yield packed
+        tail = compressor.flush()
+        gzipped.append(tail)
+        if compressed:
+            yield tail
+        self.gzipped = b"".join(gzipped)
+        self.etag = f'"{digest.hexdigest()[:20]}"'
+
+    def finish(self) -> "Document":
+        """Work out the ETag and gzip copy now (for small documents)."""
+        for _ in self.stream():
+            pass
+        return self
+
+
+@dataclass
+class _Fragment:
+    key: tuple
+    text: str
+    rendered_at: float
+
+
+# listed channel id → its rendered <programme> elements
+_fragments: Dict[int, _Fragment] = {}
+# document name → (key, rendered_at, document)
+_documents: Dict[str, Tuple[tuple, float, Document]] = {}
+# One render at a time; concurrent polls wait and share the result
+_lock = asyncio.Lock()
+
+
+def _cached(name: str, key: tuple) -> Optional[Document]:
+    hit = _documents.get(name)
+    if hit and hit[0] == key and time.monotonic() - hit[1] < _MAX_AGE:
+        return hit[2]
+    return None
+
+
+def _store(name: str, key: tuple, doc: Document) -> Document:
+    _documents[name] = (key, time.monotonic(), doc)
+    return doc
+
+
+async def _render_xmltv(
+    channels: Sequence[Channel],
+    window: Tuple[datetime, datetime],
+    base_url: str,
+    db: AsyncSession,
+) -> Document:
+    """The guide for `channels`, re-rendering only fragments that went stale."""
+    now = time.monotonic()
+    keys: Dict[int, tuple] = {}
+    for ch in channels:
+        source = ScheduleSource.for_channel(ch)
+        # The channel's programmes are its schedule channel's rows, shifted
+        keys[ch.id] = (
+            timeline.version(source.schedule_channel_id),
+            source.schedule_channel_id,
+            source.offset,
+            window,
+            base_url,
+        )
+    stale = [
+        ch for ch in channels
+        if (f := _fragments.get(ch.id)) is None
+        or f.key != keys[ch.id]
+        or now - f.rendered_at >= _MAX_AGE
+    ]
+
+    if stale:
+        parts: Dict[int, List[str]] = {ch.id: [] for ch in stale}
+        async for channel_id, text in xmltv.iter_programmes(
+            stale, window[0], window[1], db, base_url
+        ):
+            parts[channel_id].append(text)
+        for ch in stale:
+            _fragments[ch.id] = _Fragment(keys[ch.id], "".join(parts[ch.id]), now)
+        logger.info(
+            f"_render_xmltv: re-rendered {len(stale)} of {len(channels)} channels"
+        )
+
+    return Document([
+        xmltv.xmltv_header(),
+        "".join(xmltv.xmltv_channel(ch) for ch in channels),
+        *(_fragments[ch.id].text for ch in channels),
+        "</tv>\n",
+    ])
+
+
+async def _enabled_channels(db: AsyncSession) -> List[Channel]:
+    result = await db.execute(
+        select(Channel)
+        .where(Channel.enabled == True)
+        .order_by(Channel.channel_number, Channel.id)
+    )
+    return list(result.scalars().all())
+
+
+async def xmltv_all() -> Document:
+    """The XMLTV guide for every enabled channel."""
+    base_url = public_base_url()
+    window = epg_window()
+    key = (timeline.version(), window, base_url)
+    doc = _cached("xmltv:all", key)
+    if doc is not None:
+        return doc
+    async with _lock:
+        doc = _cached("xmltv:all", key)
+        if doc is not None:
+            return doc
+        async with AsyncSessionLocal() as db:
+            channels = await _enabled_channels(db)
+            doc = await _render_xmltv(channels, window, base_url, db)
+        # Fragments of deleted or disabled channels are no longer needed
+        listed = {ch.id for ch in channels}
+        for channel_id in [c for c in _fragments if c not in listed]:
+            del _fragments[channel_id]
+        return _store("xmltv:all", key, doc)
+
+
+async def xmltv_for_channel(channel_id: int) -> Optional[Document]:
+    """The XMLTV guide for one channel; None if it does not exist."""
+    base_url = public_base_url()
+    window = epg_window()
+    name = f"xmltv:{channel_id}"
+    key = (timeline.version(), window, base_url)
+    doc = _cached(name, key)
+    if doc is not None:
+        return doc
+    async with _lock:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Channel).where(Channel.id == channel_id))
+            channel = result.scalar_one_or_none()
+            if channel is None:
+                _documents.pop(name, None)
+                return None
+            doc = await _render_xmltv([channel], window, base_url, db)
+        return _store(name, key, doc)
+
+
+async def m3u_all() -> Document:
+    """The M3U playlist of every enabled channel."""
+    base_url = public_base_url()
+    key = (timeline.version(), base_url)
+    doc = _cached("m3u:all", key)
+    if doc is not None:
+        return doc
+    async with AsyncSessionLocal() as db:
+        channels = await _enabled_channels(db)
+    lines = ["#EXTM3U\n", *(m3u_line(ch, base_url) for ch in channels)]
+    return _store("m3u:all", key, Document(lines).finish())
+
+
+def status() -> dict:
+    """Cache summary for /api/livetv/epg-cache."""
+    now = time.monotonic()
+    return {
+        "schedule_version": timeline.version(),
+        "fragments": len(_fragments),
+        "documents": {
+            name: {
+                "etag": doc.etag,
+                "chars": sum(len(part) for part in doc.parts),
+                "gzip_bytes": len(doc.gzipped) if doc.complete else None,
+                "age_seconds": round(now - rendered_at, 1),
+            }
+            for name, (_, rendered_at, doc) in _documents.items()
+        },
+    }
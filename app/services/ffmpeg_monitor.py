@@ -0,0 +1,211 @@
+"""ffmpeg stderr monitoring.
+
+Every ffmpeg the stream proxy starts runs with `-nostats -progress pipe:2`,
+so its stderr carries blocks of key=value progress lines, e.g.
+
+    fps=25.00
+    bitrate=5012.3kbits/s
+    out_time_us=12480000
+    speed=1.01x
+    progress=continue
+
+interleaved with warnings and errors.  An FfmpegMonitor drains that pipe
+for the lifetime of the process (an unread pipe fills up and blocks ffmpeg,
+stalling the stream), feeds the progress values into the channel's
+EncodeSession, and classifies the error lines ffmpeg prints when it gives up
+on an input.  On a fatal error the process is killed straight away so the
+caller can react without waiting for ffmpeg's own network timeouts.
+
+Some messages ("Invalid data found when processing input", "Input/output
+error") mean the input cannot be opened when they appear at startup, but
+are also printed for a single corrupt packet or a dropped read that ffmpeg
+recovers from.  Those only count as fatal before any output was written or
+on an "Error opening input" line; later they are logged and ffmpeg's exit
+code decides.
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from app.core.logging_config import get_logger
+from app.services.sessions import EncodeSession
+
+logger = get_logger(__name__)
+
+_PROGRESS_LINE_RE = re.compile(r"^([a-z_]+)=(.*)$")
+
+
+@dataclass(frozen=True)
+class FfmpegError:
+    """A fatal input error reported by ffmpeg."""
+
+    kind: str           # see _FATAL_PATTERNS
+    transient: bool     # worth retrying the same source shortly
+    line: str
+
+
+# (pattern, kind, transient) — first match wins.  Only messages ffmpeg prints
+# when it abandons an input are listed; per-frame decode errors are not.
+_FATAL_PATTERNS = [
+    (re.compile(r"No such file or directory"), "source_missing", False),
+    (re.compile(r"Server returned 4\d\d|HTTP error 4\d\d"), "http_client_error", False),
+    (re.compile(r"Server returned 5\d\d|HTTP error 5\d\d"), "http_server_error", True),
+    (re.compile(r"moov atom not found"), "source_invalid", False),
+    (
+        re.compile(
+            r"Connection refused|Connection timed out|Connection reset|"
+            r"Network is unreachable|Operation timed out"
+        ),
+        "network",
+        True,
+    ),
+    (
+        re.compile(r"Protocol not found|Decoder \(codec .*\) not found|Unknown encoder"),
+        "unsupported",
+        False,
+    ),
+]
+
+# Fatal only while opening the input: once output has started ffmpeg also
+# prints these for a corrupt packet or a dropped read it recovers from
+_STARTUP_PATTERNS = [
+    (re.compile(r"Invalid data found when processing input"), "source_invalid", False),
+    (re.compile(r"Input/output error"), "network", True),
+]
+_OPENING_INPUT_RE = re.compile(r"Error opening input")
+
+# Keep references so running monitor tasks are not garbage-collected
+_monitors: Set[asyncio.Task] = set()
+
+
+def classify_error(line: str, output_started: bool = False) -> Optional[FfmpegError]:
+    """Return the FfmpegError an stderr line signals, or None if it is benign."""
+    patterns = _FATAL_PATTERNS
+    if not output_started or _OPENING_INPUT_RE.search(line):
+        patterns = patterns + _STARTUP_PATTERNS
+    for pattern, kind, transient in patterns:
+        if pattern.search(line):
+            return FfmpegError(kind=kind, transient=transient, line=line)
+    return None
+
+
+def _wrote_output(key: str, value: str) -> bool:
+    """True for a progress value showing ffmpeg has written output."""
+    if key not in ("out_time_us", "total_size"):
+        return False
+    try:
+        return int(value) > 0
+    except ValueError:
+        return False                    # N/A until the first packet
+
+
+def _parse_number(value: str, suffix: str) -> Optional[float]:
+    """`1.01x` / `5012.3kbits/s` → float; `N/A` (not known yet) → None."""
+    try:
+        if suffix and value.endswith(suffix):
+            value = value[: -len(suffix)]
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _apply_progress(encode: EncodeSession, key: str, value: str) -> None:
+    if key == "speed":
+        encode.speed = _parse_number(value, "x")
+    elif key == "fps":
+        encode.fps = _parse_number(value, "")
+    elif key == "bitrate":
+        encode.bitrate_kbps = _parse_number(value, "kbits/s")
+    elif key == "out_time_us":
+        try:
+            encode.out_time_seconds = int(value) / 1_000_000
+        except ValueError:
+            pass
+    elif key == "progress":
+        encode.progress_at = time.monotonic()
+
+
+class FfmpegMonitor:
+    """Background stderr reader for one ffmpeg process."""
+
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        label: str,
+        encode: Optional[EncodeSession] = None,
+    ):
+        self.process = process
+        self.label = label
+        self.encode = encode
+        self.error: Optional[FfmpegError] = None
+        # Set from the progress lines once ffmpeg has written output
+        self.output_started = False
+        self.task = asyncio.create_task(self._drain(process.stderr))
+        _monitors.add(self.task)
+        self.task.add_done_callback(_monitors.discard)
+
+    async def wait(self, timeout: float = 2.0) -> Optional[FfmpegError]:
+        """
+        Give the reader up to `timeout` seconds to reach EOF (call after the
+        process has exited) and return the fatal error it saw, if any.
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(self.task), timeout)
+        except (asyncio.TimeoutError, Exception):
+            pass
+        return self.error
+
+    async def _drain(self, stream: asyncio.StreamReader) -> None:
+        pid = self.process.pid
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            match = _PROGRESS_LINE_RE.match(line)
+            if match is not None:
+                if not self.output_started and _wrote_output(*match.groups()):
+                    self.output_started = True
+                # A pre-started process reports into the session only once it
+                # is the one on air (EncodeSession.pid is switched at handoff).
+                if self.encode is not None and self.encode.pid == pid:
+                    _apply_progress(self.encode, *match.groups())
+                continue
+
+            error = (
+                classify_error(line, self.output_started) if self.error is None else None
+            )
+            if error is None:
+                if self.output_started and classify_error(line) is not None:
+                    logger.info(
+                        f"ffmpeg[{pid}] {self.label}: input error after output "
+                        f"started, left to ffmpeg: {line}"
+                    )
+                else:
+                    logger.debug(f"ffmpeg[{pid}] {self.label}: {line}")
+                continue
+            self.error = error
+            if self.encode is not None and self.encode.pid == pid:
+                self.encode.last_error = error.kind
+            logger.warning(
+                f"ffmpeg[{pid}] {self.label}: fatal {error.kind} error: {line}"
+            )
+            # Don't wait for ffmpeg's own reconnect/timeout logic
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+
+def watch_ffmpeg(
+    process: asyncio.subprocess.Process,
+    label: str,
+    encode: Optional[EncodeSession] = None,
+) -> FfmpegMonitor:
+    """Start draining a process's stderr in the background."""
+    return FfmpegMonitor(process, label, encode)
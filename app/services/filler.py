@@ -0,0 +1,315 @@
+"""Filler engine — pre-encoded commercials and idents for schedule gaps.
+
+Clips dropped into COMMERCIALS_PATH are encoded once per output profile in
+use (the default profile plus every enabled channel's transcode profile)
+into MPEG-TS files under FILLER_DIR, and catalogued with their durations in
+the filler_clips table.  Encoding runs in the background at the lowest CPU
+priority, a clip at a time.
+
+When a channel has nothing scheduled right now, _wait_for_playable asks
+pick_filler() for a clip that fits the time left until the next programme
+and plays it by stream copy, so filling a gap costs no CPU and the stream
+never goes silent.  Clips are packed one after another until the gap is
+shorter than every clip; the last stretch is then covered by the shortest
+clip, which delays the next programme's join by at most its length.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import os
+import random
+import shutil
+from asyncio.subprocess import DEVNULL, PIPE
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import get_logger
+from app.models.channel import Channel
+from app.models.filler_clip import FillerClip
+from app.models.schedule_entry import ScheduleEntry
+from app.models.transcode_profile import TranscodeProfile
+from app.services.ffmpeg_monitor import watch_ffmpeg
+from app.services.media_info import get_media_probe
+from app.services.stream_proxy import (
+    DEFAULT_PROFILE,
+    EncodeProfile,
+    _audio_codec_args,
+    _video_codec_args,
+)
+
+logger = get_logger(__name__)
+
+_CLIP_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".ts", ".m2ts", ".webm", ".mpg"}
+
+# Gaps shorter than this are not worth a clip (the next programme is joined
+# a moment late instead)
+_MIN_GAP_SECONDS = 1.0
+
+# Entry.item_type of the transient entries that carry filler through playout
+FILLER_ITEM_TYPE = "Filler"
+
+# In-process view of the catalog: profile key → clips (refreshed by the job)
+_clips: Dict[str, List[FillerClip]] = {}
+
+# ffmpeg currently encoding (so shutdown can stop it)
+_current: Optional[asyncio.subprocess.Process] = None
+
+
+def profile_key(profile: EncodeProfile) -> str:
+    return hashlib.sha1(repr(dataclasses.astuple(profile)).encode("utf-8")).hexdigest()
+
+
+def _scan_sources() -> List[str]:
+    """Video files in COMMERCIALS_PATH (recursively), sorted for stable output."""
+    found = []
+    for root, _, names in os.walk(settings.COMMERCIALS_PATH):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in _CLIP_EXTENSIONS:
+                found.append(os.path.abspath(os.path.join(root, name)))
+    return sorted(found)
+
+
+def _build_filler_cmd(
+    source: str, output: str, profile: EncodeProfile, has_audio: bool
+) -> list:
+    # Clips without sound get a silent track so every clip has the same layout
+    silence = (
+        [] if has_audio
+        else ["-f", "lavfi", "-i", "anullsrc=channel_layout=stereo:sample_rate=48000"]
+    )
+    nice = ["nice", "-n", "19"] if shutil.which("nice") else []
+    return [
+        *nice,
+        "ffmpeg",
+        "-nostats", "-progress", "pipe:2",
+        "-y",
+        "-i", source,
+        *silence,
+        "-map", "0:v:0",
+        "-map", "0:a:0" if has_audio else "1:a:0",
+        *(["-shortest"] if not has_audio else []),
+        *_video_codec_args(False, profile),
+        "-force_key_frames", "expr:eq(n,0)",   # starts on a keyframe for a clean cut
+        *_audio_codec_args(False, profile),
+        "-f", "mpegts",
+        "-loglevel", "warning",
+        output,
+    ]
+
+
+# ── encoding ─────────────────────────────────────────────────────────────────
+
+async def _profiles_in_use() -> Dict[str, EncodeProfile]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(TranscodeProfile)
+            .join(Channel, Channel.transcode_profile_id == TranscodeProfile.id)
+            .where(Channel.enabled == True)
+            .distinct()
+        )
+        profiles = [DEFAULT_PROFILE] + [
+            EncodeProfile.from_model(p) for p in result.scalars().all()
+        ]
+    return {profile_key(p): p for p in profiles}
+
+
+async def _encode(source: str, profile: EncodeProfile, key: str) -> Optional[FillerClip]:
+    """Encode one clip for one profile; the catalog row, or None on failure."""
+    global _current
+    probe = await get_media_probe(source)
+    if probe is None:
+        logger.warning(f"_encode: cannot probe filler clip {source!r}")
+        return None
+    has_audio = any(s.get("codec_type") == "audio" for s in probe.get("streams", []))
+    digest = hashlib.sha1(f"{source}|{key}".encode("utf-8")).hexdigest()
+    path = os.path.abspath(os.path.join(settings.FILLER_DIR, digest + ".ts"))
+    partial = path + ".part"
+    cmd = _build_filler_cmd(source, partial, profile, has_audio)
+    try:
+        _current = await asyncio.create_subprocess_exec(
+            *cmd, stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE
+        )
+    except FileNotFoundError:
+        logger.error("_encode: ffmpeg not found")
+        return None
+    monitor = watch_ffmpeg(_current, f"filler '{os.path.basename(source)}'")
+    try:
+        returncode = await _current.wait()
+    finally:
+        _current = None
+    if returncode != 0:
+        error = await monitor.wait()
+        logger.warning(
+            f"_encode: filler clip {source!r} failed "
+            f"({error.kind if error else f'exit {returncode}'})"
+        )
+        try:
+            os.remove(partial)
+        except FileNotFoundError:
+            pass
+        return None
+    os.replace(partial, path)
+    encoded = await get_media_probe(path)
+    duration = (encoded or {}).get("format", {}).get("duration")
+    if not duration:
+        logger.warning(f"_encode: encoded filler {path!r} has no duration")
+        return None
+    st = os.stat(source)
+    return FillerClip(
+        source_path=source,
+        source_size=st.st_size,
+        source_mtime=st.st_mtime,
+        profile_key=key,
+        path=path,
+        duration=float(duration),
+    )
+
+
+async def _load_catalog() -> None:
+    global _clips
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(FillerClip))
+        clips: Dict[str, List[FillerClip]] = {}
+        for clip in result.scalars().all():
+            if os.path.isfile(clip.path):
+                clips.setdefault(clip.profile_key, []).append(clip)
+    _clips = clips
+
+
+async def filler_job() -> None:
+    """
+    Bring the filler catalog in line with COMMERCIALS_PATH.
+
+    Encodes clips that are new or changed for every profile in use and drops
+    rows (and files) for clips that were removed and for profiles that are
+    no longer in use.  Scheduled periodically by
+    the scheduler when FILLER_ENABLED is set.
+    """
+    if not settings.FILLER_ENABLED:
+        return
+    os.makedirs(settings.FILLER_DIR, exist_ok=True)
+    sources = _scan_sources()
+    profiles = await _profiles_in_use()
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(FillerClip))
+        rows = result.scalars().all()
+        current: Set[tuple] = set()
+        for row in rows:
+            try:
+                st = os.stat(row.source_path)
+                fresh = (
+                    (st.st_size, st.st_mtime) == (row.source_size, row.source_mtime)
+                    and os.path.isfile(row.path)
+                )
+            except FileNotFoundError:
+                fresh = False
+            # Encodes for a profile no enabled channel uses any more go too
+            fresh = fresh and row.profile_key in profiles
+            if fresh:
+                current.add((row.source_path, row.profile_key))
+                continue
+            try:
+                os.remove(row.path)
+            except FileNotFoundError:
+                pass
+            await db.execute(delete(FillerClip).where(FillerClip.id == row.id))
+        await db.commit()
+
+        encoded = 0
+        for key, profile in profiles.items():
+            for source in sources:
+                if (source, key) in current:
+                    continue
+                logger.info(
+                    f"filler_job: encoding '{os.path.basename(source)}' "
+                    f"for profile {key[:8]}"
+                )
+                clip = await _encode(source, profile, key)
+                if clip is not None:
+                    db.add(clip)
+                    await db.commit()
+                    encoded += 1
+    await _load_catalog()
+    if encoded:
+        logger.info(f"filler_job: {encoded} clips encoded")
+
+
+def stop_filler() -> None:
+    """Kill the encode in progress (called on shutdown)."""
+    if _current is not None:
+        try:
+            _current.kill()
+        except ProcessLookupError:
+            pass
+
+
+# ── playout ──────────────────────────────────────────────────────────────────
+
+def pick_filler(
+    profile: EncodeProfile, seconds: float, exclude: Optional[Set[int]] = None
+) -> Optional[FillerClip]:
+    """
+    A random clip encoded for `profile` that fits in `seconds`, else the
+    shortest one; None if there are none or the gap is too short to bother.
+    Clips whose ids are in `exclude` (failed recently) are not picked.
+    """
+    if seconds < _MIN_GAP_SECONDS:
+        return None
+    exclude = exclude or set()
+    clips = [c for c in _clips.get(profile_key(profile), []) if c.id not in exclude]
+    if not clips:
+        return None
+    fitting = [c for c in clips if c.duration <= seconds]
+    if fitting:
+        return random.choice(fitting)
+    return min(clips, key=lambda c: c.duration)
+
+
+def filler_entry_id(clip_id: int) -> int:
+    """
+    The id a clip's transient entry carries: stable per clip, and negative so
+    it never collides with a stored entry (failure tracking is keyed by it).
+    """
+    return -clip_id
+
+
+def filler_clip_id(entry_id: Optional[int]) -> Optional[int]:
+    """The clip id behind a filler entry id, or None for a stored entry."""
+    return -entry_id if entry_id is not None and entry_id < 0 else None
+
+
+def filler_entry(channel_id: int, clip: FillerClip, now: datetime) -> ScheduleEntry:
+    """A transient entry carrying a clip through the playout path (never stored)."""
+    return ScheduleEntry(
+        id=filler_entry_id(clip.id),
+        channel_id=channel_id,
+        title=os.path.splitext(os.path.basename(clip.source_path))[0],
+        media_item_id="",
+        library_id="",
+        item_type=FILLER_ITEM_TYPE,
+        start_time=now,
+        end_time=now + timedelta(seconds=clip.duration),
+        duration=int(clip.duration),
+        file_path=clip.path,
+    )
+
+
+def catalog_status() -> dict:
+    """Filler catalog summary for /api/livetv/filler."""
+    return {
+        "enabled": settings.FILLER_ENABLED,
+        "profiles": {
+            key: {
+                "clips": len(clips),
+                "total_seconds": round(sum(c.duration for c in clips), 1),
+            }
+            for key, clips in _clips.items()
+        },
+        "encoding": _current is not None,
+    }
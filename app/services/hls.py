@@ -0,0 +1,228 @@
+"""HLS output mode — per-channel rolling segment window on disk.
+
+Instead of piping MPEG-TS to each client, an HlsChannel runs ffmpeg with HLS
+output into HLS_DIR/<channel_id>/: a rolling index.m3u8 plus the last few .ts
+segments.  Any number of clients then fetch the same files, so the encode
+cost is per channel, and a client that reconnects just re-reads the playlist
+without starting a new encode.
+
+With HLS_ABR_LADDER set, the encode produces several renditions from one
+decode instead: master.m3u8 lists one stream_<n>.m3u8 media playlist per
+rendition (segments seg_<n>_NNNNNN.ts), and players switch between them by
+bandwidth.
+
+Clients keep the channel alive simply by fetching its playlist or segments.
+Once nobody has requested anything for HLS_IDLE_TIMEOUT seconds the encode
+is stopped and the channel's directory removed.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import time
+from asyncio.subprocess import DEVNULL, PIPE
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services.ffmpeg_monitor import watch_ffmpeg
+from app.services.sessions import OUTPUT_HLS, close_encode, open_encode
+from app.services.stream_proxy import (
+    HLS_MASTER_PLAYLIST_NAME,
+    HLS_PLAYLIST_NAME,
+    _wait_for_playable,
+    parse_abr_ladder,
+    record_source_failure,
+    record_source_success,
+)
+
+logger = get_logger(__name__)
+
+# Only files ffmpeg itself writes may be served from an HLS directory.
+SEGMENT_NAME_RE = re.compile(r"^seg_(\d+_)?\d{6}\.ts$")
+VARIANT_PLAYLIST_RE = re.compile(r"^stream_\d+\.m3u8$")
+
+# How often the idle watchdog checks for abandoned channels (seconds)
+_WATCHDOG_INTERVAL = 5
+
+
+class HlsChannel:
+    """One channel's HLS encode and its on-disk segment window."""
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.directory = os.path.join(settings.HLS_DIR, str(channel_id))
+        # Fixed for the life of the encode so the layout never changes under clients
+        self.abr = bool(parse_abr_ladder(settings.HLS_ABR_LADDER))
+        self.last_access = time.monotonic()
+        self.started_at = self.last_access
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[asyncio.Task] = None
+
+    @property
+    def playlist_path(self) -> str:
+        """The top-level playlist: master.m3u8 in ABR mode, else index.m3u8."""
+        name = HLS_MASTER_PLAYLIST_NAME if self.abr else HLS_PLAYLIST_NAME
+        return os.path.join(self.directory, name)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def touch(self) -> None:
+        """Record client activity so the idle watchdog keeps the encode alive."""
+        self.last_access = time.monotonic()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        # Start from an empty directory — append_list would otherwise continue
+        # a stale playlist left behind by a previous session.
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self.touch()
+        self.started_at = self.last_access
+        logger.info(f"HlsChannel: channel={self.channel_id} starting encode")
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = asyncio.create_task(self._watch_idle())
+
+    def stop(self) -> None:
+        if _channels.get(self.channel_id) is self:
+            del _channels[self.channel_id]
+        for task in (self._task, self._watchdog):
+            if task is not None and not task.done():
+                task.cancel()
+
+    async def wait_for_playlist(self, timeout: float) -> bool:
+        """Wait until ffmpeg has written the first playlist (first segment ready)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if os.path.isfile(self.playlist_path):
+                return True
+            if not self.running:
+                return False
+            await asyncio.sleep(0.25)
+        return os.path.isfile(self.playlist_path)
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        process = None
+        encode = open_encode(self.channel_id, OUTPUT_HLS)
+        try:
+            while True:
+                playout = await _wait_for_playable(self.channel_id, "HlsChannel")
+                entry = playout.entry
+                cmd = playout.ffmpeg_cmd(hls_dir=self.directory, abr=self.abr)
+                logger.debug(
+                    f"HlsChannel: channel={self.channel_id} starting ffmpeg for "
+                    f"{playout.describe()}{' as ABR ladder' if self.abr else ''}"
+                )
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        *cmd, stdout=DEVNULL, stderr=PIPE
+                    )
+                except FileNotFoundError:
+                    logger.error("HlsChannel: ffmpeg not found")
+                    return
+                monitor = watch_ffmpeg(
+                    process, f"channel={self.channel_id} (hls)", encode
+                )
+                encode.set_entry(
+                    entry,
+                    playout.offset_seconds,
+                    "abr transcode" if self.abr else playout.mode,
+                    process.pid,
+                )
+                started_at = time.time()
+                returncode = await process.wait()
+                process = None
+                produced = monitor.output_started or await asyncio.to_thread(
+                    self._wrote_segment_since, started_at
+                )
+                if not produced:
+                    # ffmpeg produced nothing — classify why and back off accordingly
+                    error = await monitor.wait()
+                    await asyncio.sleep(record_source_failure(
+                        self.channel_id, entry, error, "HlsChannel"
+                    ))
+                    continue
+                record_source_success(entry)
+                if returncode != 0:
+                    # A drop mid-programme: _wait_for_playable re-plans from
+                    # the current offset, like the MPEG-TS path
+                    logger.warning(
+                        f"HlsChannel: channel={self.channel_id} '{entry.title}' "
+                        f"ffmpeg exited with {returncode} mid-programme, resuming"
+                    )
+                else:
+                    logger.info(
+                        f"HlsChannel: channel={self.channel_id} '{entry.title}' "
+                        f"finished, advancing to next entry"
+                    )
+                # Avoid a tight spin if ffmpeg exits instantly (bad source)
+                await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            close_encode(encode)
+            if process is not None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            # A new session may already have claimed the directory if a client
+            # arrived while this one was shutting down — leave it alone then.
+            if _channels.get(self.channel_id) in (None, self):
+                shutil.rmtree(self.directory, ignore_errors=True)
+            logger.info(f"HlsChannel: channel={self.channel_id} encode stopped")
+
+    def _wrote_segment_since(self, started_at: float) -> bool:
+        """True if a segment was written at or after `started_at` (wall clock)."""
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return False
+        return any(
+            SEGMENT_NAME_RE.match(e.name) and e.stat().st_mtime >= started_at
+            for e in entries
+        )
+
+    async def _watch_idle(self) -> None:
+        while self.running:
+            await asyncio.sleep(_WATCHDOG_INTERVAL)
+            idle = time.monotonic() - self.last_access
+            if idle > settings.HLS_IDLE_TIMEOUT:
+                logger.info(
+                    f"HlsChannel: channel={self.channel_id} idle for {idle:.0f}s, "
+                    f"stopping"
+                )
+                self.stop()
+                return
+
+
+# Process-wide registry of channels with an HLS encode running.
+_channels: Dict[int, HlsChannel] = {}
+
+
+def get_hls_channel(channel_id: int) -> Optional[HlsChannel]:
+    """Return the running HLS channel, or None if nobody is watching it."""
+    return _channels.get(channel_id)
+
+
+def active_hls_channels() -> Dict[int, HlsChannel]:
+    """Snapshot of channels whose HLS encode is currently running."""
+    return {cid: ch for cid, ch in _channels.items() if ch.running}
+
+
+def open_hls_channel(channel_id: int) -> HlsChannel:
+    """Return the channel's HLS session, starting the encode if needed."""
+    channel = _channels.get(channel_id)
+    if channel is None or not channel.running:
+        channel = HlsChannel(channel_id)
+        _channels[channel_id] = channel
+        channel.start()
+    channel.touch()
+    return channel
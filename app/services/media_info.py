@@ -0,0 +1,566 @@
+"""Media-info catalog — ffprobe once per file, then look it up.
+
+Starting a stream needs to know a file's codecs, resolution and audio track
+languages.  Running ffprobe for that on every tune-in and every programme
+transition costs up to 10 s each time, so results are kept in the media_info
+table (and an in-process dict in front of it):
+
+- Local files are keyed by path and revalidated against size + mtime, so a
+  replaced file is re-probed automatically.
+- Jellyfin HTTP-only items are keyed by media_item_id.
+
+After schedule generation, schedule_background_probe() fills the catalog for
+every newly scheduled item so that by the time an entry airs its lookup is
+a dict hit.
+
+The background prober also builds a keyframe index per file (one ffprobe
+pass over the video packets), which the stream proxy uses to seek straight
+to the right keyframe on tune-in.  HTTP-only items are indexed only when
+their container can be seeked by byte offset — indexing means reading the
+whole file, which is only worth it where ffmpeg's own seek is slow.
+"""
+
+import array
+import asyncio
+import bisect
+import json
+import os
+import sys
+import zlib
+from asyncio.subprocess import PIPE
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import get_logger
+from app.models.media_info import MediaInfo
+
+logger = get_logger(__name__)
+
+# In-process cache in front of the media_info table (most recently used last)
+_MEMORY_CACHE_MAX = 5000
+_memory: "OrderedDict[tuple, dict]" = OrderedDict()
+
+# Background prober: at most this many ffprobe processes at once
+_BACKGROUND_CONCURRENCY = 2
+_background_tasks: Set[asyncio.Task] = set()
+
+# Keyframe indexes read the whole file, so they get a much longer timeout
+_KEYFRAME_PROBE_TIMEOUT = 600.0
+_KEYFRAME_CACHE_MAX = 500
+_keyframe_memory: "OrderedDict[tuple, Optional[KeyframeIndex]]" = OrderedDict()
+
+# Containers without a seek index of their own, where a byte offset is a valid
+# place to start reading (ffprobe format_name components)
+BYTE_SEEK_FORMATS = {"mpegts", "mpeg"}
+
+
+async def run_ffprobe(source: str) -> Optional[dict]:
+    """
+    Run ffprobe once and return its JSON (``streams`` and ``format``).
+
+    Returns None if ffprobe fails or times out — callers then fall back to
+    the first audio track and a full transcode.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe",
+            "-v", "quiet",
+            "-print_format", "json",
+            "-show_streams",
+            "-show_format",
+            source,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10.0)
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            logger.warning(f"run_ffprobe: ffprobe timed out for {source!r}")
+            return None
+        return json.loads(stdout)
+    except Exception as exc:
+        logger.warning(f"run_ffprobe: ffprobe failed: {exc}")
+        return None
+
+
+def byte_seekable(probe: Optional[dict]) -> bool:
+    """True if the probed container can be entered at a keyframe's byte offset."""
+    name = ((probe or {}).get("format") or {}).get("format_name") or ""
+    return any(part in BYTE_SEEK_FORMATS for part in name.split(","))
+
+
+# ── keyframe index ───────────────────────────────────────────────────────────
+
+@dataclass
+class KeyframeIndex:
+    """Video keyframes of one file, in presentation order."""
+
+    times: List[float]        # seconds from the start of the file
+    positions: List[int]      # byte offset of the keyframe packet, -1 if unknown
+
+    def at_or_before(self, offset: float) -> int:
+        """Index of the last keyframe at or before offset (0 if none)."""
+        return max(0, bisect.bisect_right(self.times, offset) - 1)
+
+    def nearest(self, offset: float) -> int:
+        """Index of the keyframe closest to offset."""
+        i = self.at_or_before(offset)
+        if i + 1 < len(self.times) and (
+            self.times[i + 1] - offset < offset - self.times[i]
+        ):
+            return i + 1
+        return i
+
+
+def encode_keyframes(index: KeyframeIndex) -> bytes:
+    """
+    Pack an index for the media_info.keyframes column: zlib-compressed
+    little-endian int64s — the count, then millisecond times and byte
+    positions, each delta-encoded (regular GOPs compress to almost nothing).
+    """
+    times = [round(t * 1000) for t in index.times]
+    values = [len(times)]
+    for series in (times, index.positions):
+        previous = 0
+        for value in series:
+            values.append(value - previous)
+            previous = value
+    packed = array.array("q", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return zlib.compress(packed.tobytes())
+
+
+def decode_keyframes(blob: bytes) -> KeyframeIndex:
+    packed = array.array("q")
+    packed.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    count = packed[0]
+    series = []
+    for start in (1, 1 + count):
+        total, values = 0, []
+        for delta in packed[start:start + count]:
+            total += delta
+            values.append(total)
+        series.append(values)
+    return KeyframeIndex(times=[ms / 1000 for ms in series[0]], positions=series[1])
+
+
+def _parse_keyframes(output: str) -> Optional[KeyframeIndex]:
+    """
+    Parse `ffprobe -of compact` packet and format lines into an index with
+    times relative to the container start time (what `-ss` counts from).
+    """
+    start_time = 0.0
+    points = []
+    for line in output.splitlines():
+        section, _, rest = line.partition("|")
+        fields = dict(
+            item.split("=", 1) for item in rest.split("|") if "=" in item
+        )
+        try:
+            if section == "format":
+                start_time = float(fields.get("start_time", 0))
+            elif section == "packet" and fields.get("flags", "").startswith("K"):
+                pos = fields.get("pos", "N/A")
+                points.append(
+                    (float(fields["pts_time"]), int(pos) if pos.isdigit() else -1)
+                )
+        except (KeyError, ValueError):
+            continue                 # N/A timestamps — not usable as a seek point
+    if not points:
+        return None
+    points.sort()
+    return KeyframeIndex(
+        times=[max(0.0, t - start_time) for t, _ in points],
+        positions=[pos for _, pos in points],
+    )
+
+
+async def run_keyframe_probe(source: str) -> Optional[KeyframeIndex]:
+    """Read every video packet header of a source and return its keyframes."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,pos,flags:format=start_time",
+            "-of", "compact=p=1",
+            source,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(
+                proc.communicate(), timeout=_KEYFRAME_PROBE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+            logger.warning(f"run_keyframe_probe: ffprobe timed out for {source!r}")
+            return None
+        return _parse_keyframes(stdout.decode("utf-8", errors="replace"))
+    except Exception as exc:
+        logger.warning(f"run_keyframe_probe: ffprobe failed: {exc}")
+        return None
+
+
+# ── probe <-> row conversion ─────────────────────────────────────────────────
+
+def bitrate_kbps(value) -> Optional[int]:
+    """An ffprobe bit_rate (bits/s, often a string) in kbps; None if absent."""
+    try:
+        return int(value) // 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def _language(stream: dict) -> Optional[str]:
+    tags = stream.get("tags") or {}
+    return tags.get("language") or tags.get("LANGUAGE") or None
+
+
+def _row_values(probe: dict) -> dict:
+    """Summarise an ffprobe result into MediaInfo column values."""
+    streams = probe.get("streams", [])
+    fmt = probe.get("format") or {}
+
+    video = next(
+        (
+            st for st in streams
+            if st.get("codec_type") == "video"
+            and not (st.get("disposition") or {}).get("attached_pic")
+        ),
+        {},
+    )
+    audio = [
+        {
+            "index": st.get("index"),
+            "codec": st.get("codec_name"),
+            "channels": st.get("channels"),
+            "language": _language(st),
+        }
+        for st in streams if st.get("codec_type") == "audio"
+    ]
+    subtitles = [
+        {
+            "index": st.get("index"),
+            "codec": st.get("codec_name"),
+            "language": _language(st),
+        }
+        for st in streams if st.get("codec_type") == "subtitle"
+    ]
+    try:
+        duration = float(fmt.get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+
+    return {
+        "video_codec": video.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "pix_fmt": video.get("pix_fmt"),
+        "video_bitrate": bitrate_kbps(video.get("bit_rate")),
+        "overall_bitrate": bitrate_kbps(fmt.get("bit_rate")),
+        "audio_tracks": json.dumps(audio),
+        "subtitle_tracks": json.dumps(subtitles),
+        "duration": duration,
+        "format_name": fmt.get("format_name"),
+    }
+
+
+def _probe_from_row(row: MediaInfo) -> dict:
+    """
+    Rebuild a minimal ffprobe-shaped dict from a catalog row, so stream
+    planning code works the same whether data came from ffprobe or the DB.
+    """
+    streams: List[dict] = []
+    if row.video_codec:
+        streams.append({
+            "index": 0,
+            "codec_type": "video",
+            "codec_name": row.video_codec,
+            "width": row.width,
+            "height": row.height,
+            "pix_fmt": row.pix_fmt,
+            "bit_rate": row.video_bitrate * 1000 if row.video_bitrate else None,
+        })
+    for track in json.loads(row.audio_tracks or "[]"):
+        streams.append({
+            "index": track["index"],
+            "codec_type": "audio",
+            "codec_name": track.get("codec"),
+            "channels": track.get("channels"),
+            "tags": {"language": track["language"]} if track.get("language") else {},
+        })
+    for track in json.loads(row.subtitle_tracks or "[]"):
+        streams.append({
+            "index": track["index"],
+            "codec_type": "subtitle",
+            "codec_name": track.get("codec"),
+            "tags": {"language": track["language"]} if track.get("language") else {},
+        })
+    return {
+        "streams": streams,
+        "format": {
+            "bit_rate": row.overall_bitrate * 1000 if row.overall_bitrate else None,
+            "duration": row.duration,
+            "format_name": row.format_name,
+        },
+    }
+
+
+# ── lookup ───────────────────────────────────────────────────────────────────
+
+def _identity(source: str, media_item_id: Optional[str]) -> Optional[tuple]:
+    """
+    Cache key for a source: ("file", path, size, mtime) for local files,
+    ("item", media_item_id) for HTTP sources, None if neither applies.
+    """
+    if os.path.isfile(source):
+        st = os.stat(source)
+        return ("file", source, st.st_size, st.st_mtime)
+    if media_item_id:
+        return ("item", media_item_id)
+    return None
+
+
+def _remember(key: tuple, probe: dict) -> None:
+    _memory[key] = probe
+    _memory.move_to_end(key)
+    while len(_memory) > _MEMORY_CACHE_MAX:
+        _memory.popitem(last=False)
+
+
+def _row_query(key: tuple):
+    """SELECT for the current catalog row of a key (stale file rows excluded)."""
+    if key[0] == "file":
+        _, path, size, mtime = key
+        return select(MediaInfo).where(
+            MediaInfo.file_path == path,
+            MediaInfo.file_size == size,
+            MediaInfo.file_mtime == mtime,
+        )
+    return select(MediaInfo).where(
+        MediaInfo.file_path.is_(None),
+        MediaInfo.media_item_id == key[1],
+    )
+
+
+async def _load(key: tuple) -> Optional[dict]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_row_query(key))
+        row = result.scalars().first()
+        return _probe_from_row(row) if row else None
+
+
+async def _store(key: tuple, media_item_id: Optional[str], probe: dict) -> None:
+    """Insert or replace the catalog row for a key."""
+    async with AsyncSessionLocal() as db:
+        if key[0] == "file":
+            _, path, size, mtime = key
+            result = await db.execute(select(MediaInfo).where(MediaInfo.file_path == path))
+        else:
+            path, size, mtime = None, None, None
+            result = await db.execute(
+                select(MediaInfo).where(
+                    MediaInfo.file_path.is_(None),
+                    MediaInfo.media_item_id == key[1],
+                )
+            )
+        row = result.scalars().first()
+        if row is None:
+            row = MediaInfo()
+            db.add(row)
+        row.file_path = path
+        row.file_size = size
+        row.file_mtime = mtime
+        row.media_item_id = media_item_id
+        for column, value in _row_values(probe).items():
+            setattr(row, column, value)
+        row.keyframes = None        # belongs to the previous version of the file
+        await db.commit()
+    _keyframe_memory.pop(key, None)
+
+
+async def get_media_probe(source: str, media_item_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Return ffprobe-shaped stream info for a source.
+
+    Checks the in-process cache, then the media_info table, and only runs
+    ffprobe (storing the result) when the file is unknown or has changed.
+    """
+    try:
+        key = _identity(source, media_item_id)
+    except OSError as exc:
+        logger.warning(f"get_media_probe: cannot stat {source!r}: {exc}")
+        key = None
+
+    if key is None:
+        return await run_ffprobe(source)
+
+    probe = _memory.get(key)
+    if probe is not None:
+        _memory.move_to_end(key)
+        return probe
+
+    try:
+        probe = await _load(key)
+    except Exception as exc:
+        logger.warning(f"get_media_probe: catalog lookup failed: {exc}")
+    if probe is not None:
+        logger.debug(f"get_media_probe: catalog hit for {key[:2]}")
+        _remember(key, probe)
+        return probe
+
+    logger.debug(f"get_media_probe: catalog miss for {key[:2]}, running ffprobe")
+    probe = await run_ffprobe(source)
+    if probe is not None:
+        _remember(key, probe)
+        try:
+            await _store(key, media_item_id, probe)
+        except Exception as exc:
+            logger.warning(f"get_media_probe: could not store catalog row: {exc}")
+    return probe
+
+
+def _remember_keyframes(key: tuple, index: Optional[KeyframeIndex]) -> None:
+    _keyframe_memory[key] = index
+    _keyframe_memory.move_to_end(key)
+    while len(_keyframe_memory) > _KEYFRAME_CACHE_MAX:
+        _keyframe_memory.popitem(last=False)
+
+
+async def get_keyframe_index(
+    source: str, media_item_id: Optional[str] = None
+) -> Optional[KeyframeIndex]:
+    """
+    Return the stored keyframe index for a source, or None if it has not
+    been built.  Never runs ffprobe — this is on the tune-in path.
+    """
+    try:
+        key = _identity(source, media_item_id)
+    except OSError:
+        return None
+    if key is None:
+        return None
+    if key in _keyframe_memory:
+        _keyframe_memory.move_to_end(key)
+        return _keyframe_memory[key]
+
+    index = None
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(_row_query(key))
+            row = result.scalars().first()
+        if row is not None and row.keyframes:
+            index = decode_keyframes(row.keyframes)
+    except Exception as exc:
+        logger.warning(f"get_keyframe_index: catalog lookup failed: {exc}")
+        return None
+    # Only cache hits: a missing index may still be built in the background
+    if index is not None:
+        _remember_keyframes(key, index)
+    return index
+
+
+async def _ensure_keyframe_index(
+    source: str, media_item_id: Optional[str], probe: Optional[dict]
+) -> bool:
+    """Build and store the keyframe index for a catalogued source if missing."""
+    key = _identity(source, media_item_id)
+    if key is None or (key[0] == "item" and not byte_seekable(probe)):
+        return False
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_row_query(key))
+        row = result.scalars().first()
+        if row is None or row.keyframes is not None:
+            return False
+
+    index = await run_keyframe_probe(source)
+    if index is None:
+        return False
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_row_query(key))
+        row = result.scalars().first()
+        if row is None:
+            return False            # file changed while it was being indexed
+        row.keyframes = encode_keyframes(index)
+        await db.commit()
+    _remember_keyframes(key, index)
+    logger.debug(
+        f"_ensure_keyframe_index: {len(index.times)} keyframes indexed for {key[:2]}"
+    )
+    return True
+
+
+# ── background prober ────────────────────────────────────────────────────────
+
+async def probe_items(items: Iterable[Tuple[Optional[str], str]]) -> int:
+    """
+    Make sure every (file_path, media_item_id) pair is in the catalog.
+
+    Local files are probed directly; items without an accessible local file
+    are probed through their Jellyfin stream URL.  With KEYFRAME_INDEX on, a
+    keyframe index is built for each item that lacks one.  Returns the
+    number of items that needed a stream-info ffprobe run.
+    """
+    from app.services.stream_proxy import _get_client
+
+    unique = list(dict.fromkeys(items))
+    semaphore = asyncio.Semaphore(_BACKGROUND_CONCURRENCY)
+    client = None
+    probed = 0
+
+    async def _one(file_path: Optional[str], media_item_id: str) -> None:
+        nonlocal client, probed
+        async with semaphore:
+            if file_path and os.path.isfile(file_path):
+                source = file_path
+            else:
+                client = client or _get_client()
+                source = await client.get_stream_url(media_item_id)
+            key = _identity(source, media_item_id)
+            if key is None:
+                return
+            probe = _memory.get(key) or await _load(key)
+            if probe is None:
+                probe = await get_media_probe(source, media_item_id)
+                probed += 1
+            if settings.KEYFRAME_INDEX and probe is not None:
+                await _ensure_keyframe_index(source, media_item_id, probe)
+
+    results = await asyncio.gather(
+        *(_one(path, item_id) for path, item_id in unique),
+        return_exceptions=True,
+    )
+    failures = sum(1 for r in results if isinstance(r, Exception))
+    logger.info(
+        f"probe_items: {len(unique)} items checked, {probed} probed, "
+        f"{failures} failed"
+    )
+    return probed
+
+
+def schedule_background_probe(items: Iterable[Tuple[Optional[str], str]]) -> None:
+    """Fire-and-forget probe_items() so the caller does not wait on ffprobe."""
+    items = list(items)
+    if not items:
+        return
+    task = asyncio.create_task(probe_items(items))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
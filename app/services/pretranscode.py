@@ -0,0 +1,329 @@
+"""Ahead-of-time transcode cache for upcoming programmes.
+
+The schedule is known days ahead, yet every encode normally happens in real
+time while viewers wait.  For channels with `pretranscode` enabled, a
+background job walks the next PRETRANSCODE_HOURS of their schedule and
+encodes each programme that would otherwise be transcoded live into one
+MPEG-TS file under PRETRANSCODE_DIR — already in the channel's output
+profile, with a keyframe every _KEYFRAME_INTERVAL seconds.
+
+When such a programme airs, _plan_playout finds the file and stream-copies
+it instead of transcoding, so tune-in is a file open and the live CPU cost
+is a remux.  The files are entered into the media-info catalog (stream info
+and keyframe index) as they are written, so joining mid-programme is a byte
+seek.
+
+The job runs ffmpeg at the lowest CPU priority, one file at a time, and
+pauses while the machine is busier than PRETRANSCODE_MAX_LOAD per core.  The
+cache is bounded by PRETRANSCODE_MAX_GB; least recently used files (by
+mtime, refreshed on every hit) are evicted first.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import os
+import shutil
+from asyncio.subprocess import DEVNULL, PIPE
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import get_logger
+from app.models.channel import Channel
+from app.models.schedule_entry import ScheduleEntry
+from app.services.ffmpeg_monitor import watch_ffmpeg
+from app.services.media_info import _ensure_keyframe_index, get_media_probe
+from app.services.stream_proxy import (
+    EncodeProfile,
+    _audio_codec_args,
+    _audio_map,
+    _plan_playout,
+    _video_codec_args,
+)
+from app.services.transcode_slots import load_per_cpu
+
+logger = get_logger(__name__)
+
+_CACHE_SUFFIX = ".ts"
+_PARTIAL_SUFFIX = ".ts.part"
+
+# Forced keyframe spacing (seconds) — bounds how far a copied join can be off
+_KEYFRAME_INTERVAL = 2
+
+# ffmpeg currently encoding (so shutdown can stop it)
+_current: Optional[asyncio.subprocess.Process] = None
+
+
+def _cache_key(
+    media_item_id: str,
+    source: str,
+    profile: EncodeProfile,
+    audio_stream_index: Optional[int],
+) -> str:
+    """
+    Name of the cached file for an item as a given channel would play it.
+
+    Local sources include size and mtime, so replacing the file on disk
+    makes the old cache entry unreachable (it then ages out of the LRU).
+    """
+    parts = [media_item_id, str(audio_stream_index), repr(dataclasses.astuple(profile))]
+    if os.path.isfile(source):
+        st = os.stat(source)
+        parts += [str(st.st_size), str(st.st_mtime)]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str, suffix: str = _CACHE_SUFFIX) -> str:
+    return os.path.abspath(os.path.join(settings.PRETRANSCODE_DIR, key + suffix))
+
+
+async def cached_copy(
+    media_item_id: str,
+    source: str,
+    profile: EncodeProfile,
+    audio_stream_index: Optional[int],
+) -> Optional[str]:
+    """Return the pre-transcoded file for a playout, or None if not cached."""
+    # Stats and touches files: kept off the event loop on the tune-in path
+    return await asyncio.to_thread(
+        _find_cached, media_item_id, source, profile, audio_stream_index
+    )
+
+
+def _find_cached(
+    media_item_id: str,
+    source: str,
+    profile: EncodeProfile,
+    audio_stream_index: Optional[int],
+) -> Optional[str]:
+    try:
+        path = _cache_path(_cache_key(media_item_id, source, profile, audio_stream_index))
+        if not os.path.isfile(path):
+            return None
+        os.utime(path)                 # mark as recently used for LRU eviction
+        return path
+    except OSError:
+        return None
+
+
+def _build_pretranscode_cmd(
+    source: str,
+    output: str,
+    audio_stream_index: Optional[int],
+    profile: EncodeProfile,
+) -> list:
+    # Lowest CPU priority so live encodes always win
+    nice = ["nice", "-n", "19"] if shutil.which("nice") else []
+    return [
+        *nice,
+        "ffmpeg",
+        "-nostats", "-progress", "pipe:2",
+        "-y",
+        "-i", source,                  # whole file, as fast as the CPU allows
+        "-map", "0:v:0",
+        "-map", _audio_map(audio_stream_index),
+        *_video_codec_args(False, profile),
+        "-force_key_frames", f"expr:gte(t,n_forced*{_KEYFRAME_INTERVAL})",
+        *_audio_codec_args(False, profile),
+        "-f", "mpegts",
+        "-loglevel", "warning",
+        output,
+    ]
+
+
+# ── cache bookkeeping ────────────────────────────────────────────────────────
+
+def _cache_files() -> List[os.DirEntry]:
+    try:
+        return [
+            e for e in os.scandir(settings.PRETRANSCODE_DIR)
+            if e.is_file() and e.name.endswith(_CACHE_SUFFIX)
+        ]
+    except FileNotFoundError:
+        return []
+
+
+def _budget_bytes() -> int:
+    return int(settings.PRETRANSCODE_MAX_GB * 1024 ** 3)
+
+
+def _evict(needed: int, keep: Set[str]) -> bool:
+    """
+    Delete least recently used files until `needed` more bytes fit in the
+    budget.  Files in `keep` (wanted for the upcoming window) are spared.
+    Returns False if the space cannot be freed.
+    """
+    files = _cache_files()
+    used = sum(e.stat().st_size for e in files)
+    budget = _budget_bytes()
+    for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+        if used + needed <= budget:
+            break
+        if entry.path in keep:
+            continue
+        size = entry.stat().st_size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        used -= size
+        logger.info(f"_evict: removed {entry.name} ({size // 2**20} MiB)")
+    return used + needed <= budget
+
+
+def _usage() -> Tuple[int, int]:
+    files = _cache_files()
+    return len(files), sum(e.stat().st_size for e in files)
+
+
+async def cache_status() -> dict:
+    """Cache usage for /api/livetv/pretranscode."""
+    count, used = await asyncio.to_thread(_usage)
+    return {
+        "enabled": settings.PRETRANSCODE_HOURS > 0,
+        "window_hours": settings.PRETRANSCODE_HOURS,
+        "files": count,
+        "used_bytes": used,
+        "max_bytes": _budget_bytes(),
+        "encoding": _current is not None,
+    }
+
+
+# ── worker ───────────────────────────────────────────────────────────────────
+
+async def _upcoming(now: datetime) -> List[tuple]:
+    """(channel_id, entry) for every entry starting within the window, soonest first."""
+    horizon = now + timedelta(hours=settings.PRETRANSCODE_HOURS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Channel.id, ScheduleEntry)
+            .join(ScheduleEntry, ScheduleEntry.channel_id == Channel.id)
+            .where(
+                Channel.enabled == True,
+                Channel.pretranscode == True,
+                ScheduleEntry.start_time > now,
+                ScheduleEntry.start_time < horizon,
+            )
+            .order_by(ScheduleEntry.start_time)
+        )
+        return [(channel_id, entry) for channel_id, entry in result.all()]
+
+
+async def _transcode(source: str, path: str, playout) -> bool:
+    """Encode one programme into the cache; True on success."""
+    global _current
+    partial = path[: -len(_CACHE_SUFFIX)] + _PARTIAL_SUFFIX
+    cmd = _build_pretranscode_cmd(
+        source, partial, playout.audio_stream_index, playout.profile
+    )
+    try:
+        _current = await asyncio.create_subprocess_exec(
+            *cmd, stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE
+        )
+    except FileNotFoundError:
+        logger.error("_transcode: ffmpeg not found")
+        return False
+    monitor = watch_ffmpeg(_current, f"pretranscode '{playout.entry.title}'")
+    try:
+        returncode = await _current.wait()
+    finally:
+        _current = None
+    if returncode != 0:
+        error = await monitor.wait()
+        logger.warning(
+            f"_transcode: '{playout.entry.title}' failed "
+            f"({error.kind if error else f'exit {returncode}'})"
+        )
+        await asyncio.to_thread(_discard, partial)
+        return False
+    await asyncio.to_thread(os.replace, partial, path)
+    # Catalog the result so playback gets stream info and a keyframe index
+    probe = await get_media_probe(path)
+    await _ensure_keyframe_index(path, None, probe)
+    return True
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def pretranscode_job() -> None:
+    """
+    Encode upcoming programmes of pretranscode channels into the cache.
+
+    Scheduled every few minutes by the scheduler; each run works through the
+    window soonest-first and stops early when the machine gets busy, the
+    cache is full, or the window is done.
+    """
+    if settings.PRETRANSCODE_HOURS <= 0:
+        return
+    await asyncio.to_thread(os.makedirs, settings.PRETRANSCODE_DIR, exist_ok=True)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    upcoming = await _upcoming(now)
+    if not upcoming:
+        return
+
+    # Plan every entry first: what the live path would do and where its copy lives
+    plans = []
+    async with AsyncSessionLocal() as db:
+        for channel_id, entry in upcoming:
+            try:
+                playout = await _plan_playout(
+                    entry, channel_id, db, 0, use_cache=False, allow_offload=False
+                )
+            except Exception as exc:
+                logger.warning(
+                    f"pretranscode_job: cannot plan '{entry.title}' (id={entry.id}): {exc}"
+                )
+                continue
+            if playout.music or (playout.copy_video and playout.copy_audio):
+                continue                 # already cheap: stream copy or audio only
+            key = await asyncio.to_thread(
+                _cache_key, entry.media_item_id, playout.source, playout.profile,
+                playout.audio_stream_index,
+            )
+            plans.append((playout, _cache_path(key)))
+
+    wanted = {path for _, path in plans}
+    done = 0
+    for playout, path in plans:
+        if await asyncio.to_thread(os.path.isfile, path):
+            continue
+        load = load_per_cpu()
+        if load is not None and load >= settings.PRETRANSCODE_MAX_LOAD:
+            logger.info(
+                f"pretranscode_job: load {load:.2f}/core, pausing until the next run"
+            )
+            break
+        # Estimate the output from the profile's bitrate ceiling
+        entry = playout.entry
+        seconds = (entry.end_time - entry.start_time).total_seconds()
+        kbps = playout.profile.video_bitrate_kbps + playout.profile.audio_bitrate_kbps
+        # Scans and deletes files: done in a worker thread
+        if not await asyncio.to_thread(_evict, int(seconds * kbps * 125), wanted):
+            logger.info("pretranscode_job: cache full, stopping")
+            break
+        logger.info(
+            f"pretranscode_job: encoding '{entry.title}' (id={entry.id}), "
+            f"airs {entry.start_time:%Y-%m-%d %H:%M}"
+        )
+        if await _transcode(playout.source, path, playout):
+            done += 1
+    if done:
+        logger.info(f"pretranscode_job: {done} programmes cached")
+
+
+def stop_pretranscode() -> None:
+    """Kill the encode in progress (called on shutdown)."""
+    if _current is not None:
+        try:
+            _current.kill()
+        except ProcessLookupError:
+            pass
@@ -2,7 +2,8 @@
 
 Fills a channel's schedule by fetching genre-matching items from Jellyfin
 and arranging them into sequential time slots starting from where the
-current schedule ends (or from now if no schedule exists).
+current schedule ends (or from now if no schedule exists).  Video channels
+are filled with movies and episodes, music channels with audio tracks.
 """
 
 import json
@@ -24,6 +25,8 @@ from app.models.channel_collection_source import ChannelCollectionSource
 from app.models.collection_item import CollectionItem
 from app.models.genre_filter import GenreFilter
 from app.models.schedule_entry import ScheduleEntry
+from app.services import timeline
+from app.services.media_info import schedule_background_probe
 
 logger = get_logger(__name__)
 
@@ -31,6 +34,12 @@ logger = get_logger(__name__)
 _MIN_TICKS = 300_000_000
 _TICKS_PER_SECOND = 10_000_000
 
+_CHANNEL_TYPE_MUSIC = "music"
+_FIELDS = (
+    "RunTimeTicks,Genres,SeriesName,ParentIndexNumber,IndexNumber,Path,MediaSources,"
+    "Album,AlbumArtist,Artists"
+)
+
 
 def _extract_path(item: dict) -> Optional[str]:
     """
@@ -113,7 +122,8 @@ def _find_thumbnail(file_path: str) -> Optional[str]:
     1. <basename>.jpg              — episode-specific thumbnail
     2. <basename>-thumb.jpg        — alternative episode thumbnail
     3. <same dir>/folder.jpg       — movie folder OR flat TV series (no Season subdir)
-    4. <parent dir>/folder.jpg     — TV series folder when episode is in a Season X/ subdir
+    4. <same dir>/cover.jpg        — album art next to a music track
+    5. <parent dir>/folder.jpg     — TV series folder when episode is in a Season X/ subdir
 
     Returns the absolute path if found, else None.
     """
@@ -124,6 +134,7 @@ def _find_thumbnail(file_path: str) -> Optional[str]:
         base + ".jpg",
         base + "-thumb.jpg",
         os.path.join(same_dir, "folder.jpg"),
+        os.path.join(same_dir, "cover.jpg"),
         os.path.join(parent_dir, "folder.jpg"),
     ):
         if os.path.isfile(candidate):
@@ -176,10 +187,11 @@ async def _resolve_collection_to_items(
     _depth: int = 0,
 ) -> List[dict]:
     """
-    Resolve a collection to a flat list of playable (Movie/Episode) item dicts.
+    Resolve a collection to a flat list of playable (Movie/Episode/Audio) item dicts.
 
-    - Movie / Episode rows → converted directly via _collection_item_to_dict()
+    - Movie / Episode / Audio rows → converted directly via _collection_item_to_dict()
     - Series / Season rows → Jellyfin admin /Items query to expand to episodes
+    - MusicAlbum rows      → the same query, expanded to tracks
     - Collection rows     → recursive resolve (up to depth 3)
     """
     if _depth > 3:
@@ -201,17 +213,19 @@ async def _resolve_collection_to_items(
     async with aiohttp.ClientSession() as session:
         user_id = await client.ensure_user_id()
         for ci in collection_items:
-            if ci.item_type in ("Movie", "Episode"):
+            if ci.item_type in ("Movie", "Episode", "Audio"):
                 # Always include — batch-fetch missing durations below
                 resolved.append(_collection_item_to_dict(ci))
 
-            elif ci.item_type in ("Series", "Season"):
-                # Expand to episodes via Jellyfin admin endpoint
+            elif ci.item_type in ("Series", "Season", "MusicAlbum"):
+                # Expand to episodes (or tracks) via Jellyfin admin endpoint
                 params = {
                     "ParentId": ci.media_item_id,
                     "Recursive": "true",
-                    "IncludeItemTypes": "Episode",
-                    "Fields": "RunTimeTicks,Genres,SeriesName,ParentIndexNumber,IndexNumber,Path,MediaSources",
+                    "IncludeItemTypes": (
+                        "Audio" if ci.item_type == "MusicAlbum" else "Episode"
+                    ),
+                    "Fields": _FIELDS,
                     "UserId": user_id,
                     "SortBy": "SortName",
                     "SortOrder": "Ascending",
@@ -366,7 +380,7 @@ async def _fetch_genre_items(
     client: JellyfinClient,
     library_id: str,
     genres: List[str],
-    content_type: str,  # "movie" | "episode" | "both"
+    content_type: str,  # "movie" | "episode" | "both" | "audio"
 ) -> List[dict]:
     """
     Fetch items from a Jellyfin library filtered by genre.
@@ -380,6 +394,7 @@ async def _fetch_genre_items(
         "movie": "Movie",
         "episode": "Episode",
         "both": "Movie,Episode",
+        "audio": "Audio",
     }
     include_types = type_map.get(content_type, "Movie,Episode")
 
@@ -402,7 +417,7 @@ async def _fetch_genre_items(
                 "ParentId": library_id,
                 "Recursive": "true",
                 "IncludeItemTypes": include_types,
-                "Fields": "RunTimeTicks,Genres,SeriesName,ParentIndexNumber,IndexNumber,Path,MediaSources",
+                "Fields": _FIELDS,
                 "Limit": page_size,
                 "StartIndex": start_index,
                 "SortBy": "SortName",
@@ -491,6 +506,9 @@ async def generate_channel_schedule(
             f"will exclude genres: {sorted(exclude_genres)}"
         )
 
+    # Music channels play audio tracks whatever content_type the filters name
+    music = channel.channel_type == _CHANNEL_TYPE_MUSIC
+
     # ── Build item pool ───────────────────────────────────────────────────────
     client = _get_client()
     item_pool: List[dict] = []
@@ -501,7 +519,8 @@ async def generate_channel_schedule(
             # Group include filters by content_type to minimise API calls
             by_type: dict = {}
             for gf in include_filters:
-                by_type.setdefault(gf.content_type, []).append(gf.genre)
+                content_type = "audio" if music else gf.content_type
+                by_type.setdefault(content_type, []).append(gf.genre)
 
             for content_type, genres in by_type.items():
                 try:
@@ -521,9 +540,11 @@ async def generate_channel_schedule(
                         seen_ids.add(item["Id"])
                         item_pool.append(item)
         else:
-            # No include filters — fetch everything (movies + episodes)
+            # No include filters — fetch everything (movies + episodes, or tracks)
             try:
-                fetched = await _fetch_genre_items(client, lib.library_id, [], "both")
+                fetched = await _fetch_genre_items(
+                    client, lib.library_id, [], "audio" if music else "both"
+                )
             except Exception as exc:
                 logger.error(
                     f"generate_channel_schedule: fetch failed for "
@@ -554,6 +575,12 @@ async def generate_channel_schedule(
             exc_info=True,
         )
 
+    # ── Keep only items this channel type can play (collections may mix) ─────
+    item_pool = [
+        item for item in item_pool
+        if (item.get("Type") == "Audio") == music
+    ]
+
     # ── Apply exclude genre filter (library items only — collection pool is
     #    already filtered, but exclude again to be safe) ─────────────────────
     if exclude_genres and item_pool:
@@ -643,12 +670,25 @@ async def generate_channel_schedule(
             nfo = _parse_nfo(local_path) if local_path else {}
             thumb = _find_thumbnail(local_path) if local_path else None
 
+        if item.get("Type") == "Audio":
+            # Tracks: the artist stands in for the series, the album for the
+            # description; disc/track numbers are not episodes
+            artists = item.get("Artists") or []
+            series_name = item.get("AlbumArtist") or (artists[0] if artists else None)
+            season_number = episode_number = None
+            if not nfo.get("description") and item.get("Album"):
+                nfo = {**nfo, "description": item["Album"]}
+        else:
+            series_name = item.get("SeriesName")
+            season_number = item.get("ParentIndexNumber")
+            episode_number = item.get("IndexNumber")
+
         entry = ScheduleEntry(
             channel_id=channel_id,
             title=item.get("Name", "Unknown"),
-            series_name=item.get("SeriesName"),
-            season_number=item.get("ParentIndexNumber"),
-            episode_number=item.get("IndexNumber"),
+            series_name=series_name,
+            season_number=season_number,
+            episode_number=episode_number,
             media_item_id=item["Id"],
             library_id=item.get("ParentId", ""),
             item_type=item.get("Type", "Movie"),
@@ -675,6 +715,11 @@ async def generate_channel_schedule(
         channel.schedule_generated_through = new_entries[-1].end_time
 
     await db.commit()
+    timeline.invalidate(channel_id)
+
+    # Probe the newly scheduled files in the background so that tuning in
+    # later is a media_info lookup instead of an ffprobe round-trip.
+    schedule_background_probe((e.file_path, e.media_item_id) for e in new_entries)
 
     logger.info(
         f"generate_channel_schedule: channel {channel_id} — "
@@ -1,7 +1,10 @@
 """APScheduler integration — background schedule maintenance.
 
 Runs a daily job at 2:00 AM UTC that extends the schedule for any
-genre_auto channel whose schedule is running low (< 48 hours remaining).
+genre_auto channel whose schedule is running low (< 48 hours remaining),
+and, when PRETRANSCODE_HOURS is set, the pre-transcode cache worker every
+few minutes.  With STATIC_EPG_ENABLED the static EPG files are rewritten
+hourly.
 """
 
 from datetime import datetime, timedelta, timezone
@@ -21,6 +24,10 @@ _LOW_WATERMARK_HOURS = 48
 # How many days to generate when extending
 _EXTEND_DAYS = 7
 
+# How often the pre-transcode worker looks for upcoming programmes
+_PRETRANSCODE_INTERVAL_MINUTES = 10
+_FILLER_INTERVAL_MINUTES = 30
+
 
 async def daily_schedule_job() -> None:
     """
@@ -109,6 +116,48 @@ def start_scheduler() -> None:
         misfire_grace_time=3600,  # allow up to 1h late execution after restart
     )
 
+    from app.core.config import settings
+    if settings.PRETRANSCODE_HOURS > 0:
+        from app.services.pretranscode import pretranscode_job
+        scheduler.add_job(
+            pretranscode_job,
+            trigger="interval",
+            minutes=_PRETRANSCODE_INTERVAL_MINUTES,
+            next_run_time=datetime.now(timezone.utc) + timedelta(minutes=1),
+            id="pretranscode_job",
+            replace_existing=True,
+            max_instances=1,          # a long encode simply delays the next run
+            coalesce=True,
+        )
+
+    if settings.FILLER_ENABLED:
+        from app.services.filler import filler_job
+        scheduler.add_job(
+            filler_job,
+            trigger="interval",
+            minutes=_FILLER_INTERVAL_MINUTES,
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=30),
+            id="filler_job",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
+    if settings.STATIC_EPG_ENABLED:
+        from app.services.static_epg import write_static_epg
+        # Just after the hour, when the EPG window slides (and once at startup)
+        scheduler.add_job(
+            write_static_epg,
+            trigger="cron",
+            minute=0,
+            second=5,
+            next_run_time=datetime.now(timezone.utc) + timedelta(seconds=10),
+            id="static_epg_job",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
     scheduler.start()
     logger.info("start_scheduler: APScheduler started (daily job at 02:00 UTC)")
 
@@ -121,6 +170,10 @@ def stop_scheduler() -> None:
     """
     if scheduler.running:
         scheduler.shutdown(wait=False)
+        from app.services.pretranscode import stop_pretranscode
+        stop_pretranscode()
+        from app.services.filler import stop_filler
+        stop_filler()
         logger.info("stop_scheduler: APScheduler stopped")
     else:
         logger.debug("stop_scheduler: scheduler was not running")
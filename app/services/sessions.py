@@ -0,0 +1,151 @@
+"""Stream session registry — live telemetry for /api/livetv/sessions.
+
+Two kinds of record are kept in process memory:
+
+- EncodeSession — one per running channel encode (MPEG-TS broadcast or
+  HLS): what is on air, the ffmpeg PID, encode speed and position parsed
+  from ffmpeg's `-progress` output, and the last programme-transition gap.
+- ViewerSession — one per connected MPEG-TS viewer: client address, start
+  time and bytes sent.
+
+Records are added and removed by the code that owns the encode or the
+connection; nothing here touches the database.
+"""
+
+import itertools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# EncodeSession.output values
+OUTPUT_MPEGTS = "mpegts"
+OUTPUT_HLS = "hls"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@dataclass
+class EncodeSession:
+    """Telemetry for one channel encode."""
+
+    channel_id: int
+    output: str                                 # OUTPUT_MPEGTS | OUTPUT_HLS
+    started_at: datetime = field(default_factory=_utcnow)
+    pid: Optional[int] = None
+    entry_id: Optional[int] = None
+    entry_title: Optional[str] = None
+    offset_seconds: Optional[int] = None
+    mode: Optional[str] = None                  # "copy", "transcode", …
+    speed: Optional[float] = None               # 1.0 = keeping up with real time
+    fps: Optional[float] = None
+    bitrate_kbps: Optional[float] = None
+    out_time_seconds: Optional[float] = None    # position within the current process
+    progress_at: Optional[float] = None         # monotonic time of last update
+    last_transition_gap_ms: Optional[float] = None
+    last_error: Optional[str] = None            # FfmpegError.kind of the last failure
+
+    def set_entry(
+        self, entry, offset_seconds: int, mode: Optional[str], pid: Optional[int]
+    ) -> None:
+        """Record the schedule entry now on air and the ffmpeg playing it."""
+        self.entry_id = entry.id
+        self.entry_title = entry.title
+        self.offset_seconds = offset_seconds
+        self.mode = mode
+        if pid is not None and pid != self.pid:
+            self.pid = pid
+            self.speed = None
+            self.fps = None
+            self.bitrate_kbps = None
+            self.out_time_seconds = None
+
+    def as_dict(self) -> dict:
+        return {
+            "channel_id": self.channel_id,
+            "output": self.output,
+            "started_at": self.started_at.isoformat(),
+            "ffmpeg_pid": self.pid,
+            "entry": {
+                "id": self.entry_id,
+                "title": self.entry_title,
+                "offset_seconds": self.offset_seconds,
+                "mode": self.mode,
+            } if self.entry_id is not None else None,
+            "speed": self.speed,
+            "fps": self.fps,
+            "bitrate_kbps": self.bitrate_kbps,
+            "out_time_seconds": (
+                round(self.out_time_seconds, 1)
+                if self.out_time_seconds is not None else None
+            ),
+            "progress_age_seconds": (
+                round(time.monotonic() - self.progress_at, 1)
+                if self.progress_at is not None else None
+            ),
+            "last_transition_gap_ms": self.last_transition_gap_ms,
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class ViewerSession:
+    """One connected MPEG-TS viewer."""
+
+    id: int
+    channel_id: int
+    client: Optional[str]
+    started_at: datetime = field(default_factory=_utcnow)
+    bytes_sent: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "client": self.client,
+            "started_at": self.started_at.isoformat(),
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+# Process-wide registries.  Encodes are keyed by (channel_id, output) — a
+# channel can be streamed as MPEG-TS and HLS at the same time.
+_encodes: Dict[tuple, EncodeSession] = {}
+_viewers: Dict[int, ViewerSession] = {}
+_viewer_ids = itertools.count(1)
+
+
+def open_encode(channel_id: int, output: str) -> EncodeSession:
+    session = EncodeSession(channel_id=channel_id, output=output)
+    _encodes[(channel_id, output)] = session
+    return session
+
+
+def close_encode(session: EncodeSession) -> None:
+    key = (session.channel_id, session.output)
+    if _encodes.get(key) is session:
+        del _encodes[key]
+
+
+def open_viewer(channel_id: int, client: Optional[str]) -> ViewerSession:
+    session = ViewerSession(id=next(_viewer_ids), channel_id=channel_id, client=client)
+    _viewers[session.id] = session
+    return session
+
+
+def close_viewer(session: ViewerSession) -> None:
+    _viewers.pop(session.id, None)
+
+
+def session_snapshot() -> List[dict]:
+    """Every running encode with the viewers attached to it."""
+    snapshot = []
+    for (channel_id, output), encode in sorted(_encodes.items()):
+        item = encode.as_dict()
+        item["viewers"] = (
+            [v.as_dict() for v in _viewers.values() if v.channel_id == channel_id]
+            if output == OUTPUT_MPEGTS else None
+        )
+        snapshot.append(item)
+    return snapshot
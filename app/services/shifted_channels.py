@@ -0,0 +1,118 @@
+"""Time-shifted sibling channels ("Movies +1").
+
+A channel with schedule_type "shifted" has no ScheduleEntry rows of its own.
+It names a parent channel and a delay, and everything that needs "its"
+schedule — the EPG, now-playing, the streaming path — reads the parent's
+rows and moves them by that delay.  The moved entries are transient copies
+that are never added to a session, so nothing is written and schedule
+generation never runs for the shifted channel.
+
+When the parent is being broadcast and its time-shift buffer
+(TIMESHIFT_MINUTES) reaches back far enough, stream_channel serves the
+shifted channel straight from that buffer instead of starting an encode.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.channel import Channel
+from app.models.schedule_entry import ScheduleEntry
+
+SCHEDULE_TYPE_SHIFTED = "shifted"
+
+
+def copy_entry(entry: ScheduleEntry, **changes) -> ScheduleEntry:
+    """
+    A transient copy of the entry's columns (with `changes` applied), not
+    bound to any session, so it can outlive the one it was loaded in.
+    """
+    values = {
+        attr.key: getattr(entry, attr.key)
+        for attr in inspect(ScheduleEntry).column_attrs
+    }
+    values.update(changes)
+    return ScheduleEntry(**values)
+
+
+@dataclass(frozen=True)
+class ScheduleSource:
+    """Whose schedule rows a channel plays, and how far behind it runs."""
+
+    channel_id: int                 # the channel being played
+    schedule_channel_id: int        # the channel whose rows are read
+    offset: timedelta = timedelta(0)
+
+    @classmethod
+    def for_channel(cls, channel: Channel) -> "ScheduleSource":
+        if channel.schedule_type == SCHEDULE_TYPE_SHIFTED and channel.parent_channel_id:
+            return cls(
+                channel.id,
+                channel.parent_channel_id,
+                timedelta(minutes=channel.time_offset_minutes or 0),
+            )
+        return cls(channel.id, channel.id)
+
+    @property
+    def shifted(self) -> bool:
+        return self.schedule_channel_id != self.channel_id
+
+    def shift(self, entry: ScheduleEntry) -> ScheduleEntry:
+        """
+        The parent's entry as it airs on this channel.
+
+        The copy keeps the parent's id, so thumbnails and failure tracking
+        refer to the real row; it must not be added to a session.
+        """
+        if not self.shifted:
+            return entry
+        return copy_entry(
+            entry,
+            channel_id=self.channel_id,
+            start_time=entry.start_time + self.offset,
+            end_time=entry.end_time + self.offset,
+        )
+
+
+async def schedule_source(channel_id: int, db: AsyncSession) -> ScheduleSource:
+    """Resolve a channel id to the schedule it plays (itself for normal channels)."""
+    result = await db.execute(
+        select(
+            Channel.schedule_type, Channel.parent_channel_id, Channel.time_offset_minutes
+        ).where(Channel.id == channel_id)
+    )
+    row = result.one_or_none()
+    if row is None or row.schedule_type != SCHEDULE_TYPE_SHIFTED or not row.parent_channel_id:
+        return ScheduleSource(channel_id, channel_id)
+    return ScheduleSource(
+        channel_id, row.parent_channel_id, timedelta(minutes=row.time_offset_minutes or 0)
+    )
+
+
+async def shifted_entries(
+    source: ScheduleSource,
+    window_start,
+    window_end,
+    db: AsyncSession,
+    limit: Optional[int] = None,
+):
+    """
+    Entries airing on `source.channel_id` that overlap [window_start, window_end),
+    ordered by start time.
+    """
+    query = (
+        select(ScheduleEntry)
+        .where(
+            ScheduleEntry.channel_id == source.schedule_channel_id,
+            ScheduleEntry.end_time > window_start - source.offset,
+            ScheduleEntry.start_time < window_end - source.offset,
+        )
+        .order_by(ScheduleEntry.start_time)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return [source.shift(entry) for entry in result.scalars().all()]
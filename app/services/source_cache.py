@@ -0,0 +1,364 @@
+"""Read-through disk cache for Jellyfin HTTP sources.
+
+When an entry has no local file, ffmpeg would read the item from Jellyfin
+over HTTP every time it airs — a film on three channels is pulled three
+times, and every tune-in seek is another remote Range request.  With
+SOURCE_CACHE_MAX_GB set, _resolve_source points ffmpeg at
+/api/livetv/source/{item_id} on this server instead.  That endpoint serves
+Range requests out of fixed-size chunks under SOURCE_CACHE_DIR, keyed by
+item id and chunk number:
+
+- a missing chunk is fetched from Jellyfin with one Range request, written
+  to disk and served; concurrent readers of the same chunk share the fetch;
+- the next _READ_AHEAD_CHUNKS chunks are fetched in the background, so a
+  sequential reader rarely waits on the network;
+- the cache is bounded by SOURCE_CACHE_MAX_GB; least recently used chunks
+  are evicted first.  The chunks on disk are scanned once (oldest mtime
+  first) into an in-memory index that every hit, store and eviction keeps
+  up to date, so nothing rescans the directory;
+- file reads, writes and evictions run in a worker thread, and all fetches
+  share one aiohttp session.
+
+The loopback URL carries a per-process token, so the endpoint cannot be
+used to read the library from outside.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+from urllib.parse import quote
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_CHUNK_SIZE = 4 * 1024 * 1024
+_READ_AHEAD_CHUNKS = 2
+_UPSTREAM_TIMEOUT = aiohttp.ClientTimeout(total=60)
+_CHUNK_SUFFIX = ".bin"
+_SIZE_FILE = "size"
+
+# Guards the loopback endpoint; new on every start
+_TOKEN = secrets.token_urlsafe(16)
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+# item id → total size in bytes
+_sizes: Dict[str, int] = {}
+# (item id, chunk) → fetch in progress, shared by concurrent readers
+_inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+_read_ahead_tasks: Set[asyncio.Task] = set()
+# chunk path → size in bytes, least recently used first; None until the
+# first scan.  Touched from worker threads, hence the lock.
+_index: Optional["OrderedDict[str, int]"] = None
+_used = 0
+_index_lock = threading.Lock()
+_session: Optional[aiohttp.ClientSession] = None
+# misses: fetched for a reader; prefetches: fetched by read-ahead
+_stats = {"hits": 0, "misses": 0, "prefetches": 0}
+
+
+class UpstreamError(Exception):
+    """Jellyfin could not supply a chunk; `status` is the HTTP status to relay."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def enabled() -> bool:
+    return settings.SOURCE_CACHE_MAX_GB > 0
+
+
+def _loopback_host() -> str:
+    """This server's address as seen from the same machine."""
+    host = settings.HOST.strip("[]")
+    if host in ("", "0.0.0.0"):
+        return "127.0.0.1"
+    if host == "::":
+        return "[::1]"
+    return f"[{host}]" if ":" in host else host
+
+
+def loopback_url(media_item_id: str) -> str:
+    """URL ffmpeg reads a Jellyfin item through the cache from."""
+    return (
+        f"http://{_loopback_host()}:{settings.PORT}/api/livetv/source/"
+        f"{quote(media_item_id, safe='')}?token={_TOKEN}"
+    )
+
+
+def check_token(token: str) -> bool:
+    return hmac.compare_digest(token, _TOKEN)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single-range Range header, None for the whole
+    file.  Raises ValueError for ranges that cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        raise ValueError(f"unsupported Range {header!r}")
+    first, last = match.groups()
+    if not first:                                   # suffix: last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range {header!r} outside {size} bytes")
+    return start, end
+
+
+# ── disk layout ──────────────────────────────────────────────────────────────
+
+def _item_dir(media_item_id: str) -> str:
+    digest = hashlib.sha1(media_item_id.encode("utf-8")).hexdigest()
+    return os.path.join(settings.SOURCE_CACHE_DIR, digest)
+
+
+def _chunk_path(media_item_id: str, index: int) -> str:
+    return os.path.join(_item_dir(media_item_id), f"{index:06d}{_CHUNK_SUFFIX}")
+
+
+def _load_index() -> "OrderedDict[str, int]":
+    """The chunk index, scanning SOURCE_CACHE_DIR the first time."""
+    global _index, _used
+    with _index_lock:
+        if _index is not None:
+            return _index
+        try:
+            dirs = [d for d in os.scandir(settings.SOURCE_CACHE_DIR) if d.is_dir()]
+        except FileNotFoundError:
+            dirs = []
+        files = [
+            (entry.stat(), entry.path)
+            for d in dirs
+            for entry in os.scandir(d.path)
+            if entry.is_file() and entry.name.endswith(_CHUNK_SUFFIX)
+        ]
+        files.sort(key=lambda f: f[0].st_mtime)
+        _index = OrderedDict((path, st.st_size) for st, path in files)
+        _used = sum(_index.values())
+        return _index
+
+
+def _budget_bytes() -> int:
+    return int(settings.SOURCE_CACHE_MAX_GB * 1024 ** 3)
+
+
+def _evict(needed: int) -> None:
+    """Delete least recently used chunks until `needed` more bytes fit."""
+    global _used
+    index = _load_index()
+    budget = _budget_bytes()
+    with _index_lock:
+        while index and _used + needed > budget:
+            path, size = index.popitem(last=False)
+            _used -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    logger.debug(f"_evict: cache at {_used // 2**20} MiB")
+
+
+def _store(media_item_id: str, index: int, data: bytes) -> None:
+    """Write a chunk, evicting first if it would not fit (worker thread)."""
+    global _used
+    _evict(len(data))
+    path = _chunk_path(media_item_id, index)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".part"
+    with open(partial, "wb") as f:
+        f.write(data)
+    os.replace(partial, path)
+    with _index_lock:
+        _used += len(data) - _index.pop(path, 0)
+        _index[path] = len(data)
+
+
+def _read_cached(path: str) -> Optional[bytes]:
+    """A stored chunk, marked as recently used; None if not cached (worker thread)."""
+    index = _load_index()
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    # Refresh the mtime too, so the order survives a restart's rescan
+    os.utime(path)
+    with _index_lock:
+        if path in index:
+            index.move_to_end(path)
+    return data
+
+
+def _write_size(media_item_id: str, size: int) -> None:
+    directory = _item_dir(media_item_id)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, _SIZE_FILE), "w") as f:
+        f.write(str(size))
+
+
+def _read_size(media_item_id: str) -> Optional[int]:
+    try:
+        with open(os.path.join(_item_dir(media_item_id), _SIZE_FILE)) as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# ── upstream ─────────────────────────────────────────────────────────────────
+
+def _get_session() -> aiohttp.ClientSession:
+    """The session every chunk fetch shares (keeps connections to Jellyfin alive)."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=_UPSTREAM_TIMEOUT)
+    return _session
+
+
+async def close() -> None:
+    """Close the shared session (called on shutdown)."""
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def _fetch(media_item_id: str, index: int) -> bytes:
+    """One chunk from Jellyfin; records the item's total size on the way."""
+    from app.services.stream_proxy import _get_client
+
+    url = await _get_client().get_stream_url(media_item_id)
+    start = index * _CHUNK_SIZE
+    headers = {"Range": f"bytes={start}-{start + _CHUNK_SIZE - 1}"}
+    try:
+        async with _get_session().get(url, headers=headers) as resp:
+            if resp.status >= 400:
+                raise UpstreamError(resp.status, f"Jellyfin returned {resp.status}")
+            if resp.status == 206:
+                match = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+                if not match:
+                    raise UpstreamError(502, "Jellyfin sent no Content-Range")
+                total = int(match.group(3))
+            elif (
+                start == 0
+                and resp.content_length is not None
+                and resp.content_length <= _CHUNK_SIZE
+            ):
+                total = resp.content_length          # small file, Range ignored
+            else:
+                raise UpstreamError(502, "Jellyfin ignored the Range request")
+            data = await resp.read()
+    except aiohttp.ClientError as exc:
+        raise UpstreamError(502, f"Jellyfin unreachable: {exc}") from exc
+    except asyncio.TimeoutError as exc:
+        raise UpstreamError(504, "Jellyfin timed out") from exc
+    if _sizes.get(media_item_id) != total:
+        _sizes[media_item_id] = total
+        await asyncio.to_thread(_write_size, media_item_id, total)
+    return data
+
+
+async def get_chunk(media_item_id: str, index: int, prefetch: bool = False) -> bytes:
+    """A chunk of the item, from disk or fetched through to it."""
+    data = await asyncio.to_thread(_read_cached, _chunk_path(media_item_id, index))
+    if data is not None:
+        _stats["hits"] += 1
+        return data
+
+    # The fetch runs as its own task so a reader that disconnects does not
+    # cancel it for the others waiting on the same chunk
+    key = (media_item_id, index)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_store(media_item_id, index, prefetch))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _fetch_done(key, t))
+    return await asyncio.shield(task)
+
+
+async def _fetch_and_store(media_item_id: str, index: int, prefetch: bool) -> bytes:
+    data = await _fetch(media_item_id, index)
+    await asyncio.to_thread(_store, media_item_id, index, data)
+    _stats["prefetches" if prefetch else "misses"] += 1
+    return data
+
+
+def _fetch_done(key: Tuple[str, int], task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()                # retrieved even if every reader left
+
+
+async def item_size(media_item_id: str) -> int:
+    """Total size of the item, fetching its first chunk if it is unknown."""
+    size = _sizes.get(media_item_id)
+    if size is not None:
+        return size
+    size = await asyncio.to_thread(_read_size, media_item_id)
+    if size is not None:
+        _sizes[media_item_id] = size
+        return size
+    await get_chunk(media_item_id, 0)
+    return _sizes[media_item_id]
+
+
+def _read_ahead(media_item_id: str, index: int) -> None:
+    size = _sizes.get(media_item_id, 0)
+    for ahead in range(index + 1, index + 1 + _READ_AHEAD_CHUNKS):
+        if ahead * _CHUNK_SIZE >= size:
+            break
+        if (media_item_id, ahead) in _inflight or (
+            _index is not None and _chunk_path(media_item_id, ahead) in _index
+        ):
+            continue
+        task = asyncio.create_task(_prefetch(media_item_id, ahead))
+        _read_ahead_tasks.add(task)
+        task.add_done_callback(_read_ahead_tasks.discard)
+
+
+async def _prefetch(media_item_id: str, index: int) -> None:
+    try:
+        await get_chunk(media_item_id, index, prefetch=True)
+    except UpstreamError as exc:
+        logger.debug(f"_prefetch: item={media_item_id} chunk={index}: {exc}")
+
+
+async def read_range(media_item_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes start..end (inclusive) of the item, chunk by chunk."""
+    for index in range(start // _CHUNK_SIZE, end // _CHUNK_SIZE + 1):
+        data = await get_chunk(media_item_id, index)
+        _read_ahead(media_item_id, index)
+        base = index * _CHUNK_SIZE
+        yield data[max(start - base, 0): end - base + 1]
+
+
+async def cache_status() -> dict:
+    """Cache usage for /api/livetv/source-cache."""
+    index = await asyncio.to_thread(_load_index)
+    with _index_lock:
+        paths = list(index)
+    return {
+        "enabled": enabled(),
+        "items": len({os.path.dirname(path) for path in paths}),
+        "chunks": len(paths),
+        "used_bytes": _used,
+        "max_bytes": _budget_bytes(),
+        **_stats,
+    }
@@ -0,0 +1,118 @@
+"""Static EPG and playlist files.
+
+When STATIC_EPG_ENABLED is set, the guide and playlist are also written to
+STATIC_EPG_DIR as xmltv.xml, xmltv.xml.gz and channels.m3u, so lighttpd, nginx
+or any static file server can answer Jellyfin's polls without the API:
+
+- every timeline.invalidate() (any change to channels or schedule entries)
+  calls request_write(); writes are debounced, so a burst of edits or a
+  schedule regeneration produces one write once things settle for
+  STATIC_EPG_DEBOUNCE_SECONDS (but never more than _MAX_DELAY_FACTOR times
+  that after the first edit);
+- the scheduler also rewrites them hourly, as the EPG window slides;
+- the content is the cached documents from epg_cache, so the files match
+  /api/livetv/xmltv/all and /m3u/all byte for byte;
+- each file is written to a temporary name and renamed into place, so a
+  reader never sees a half-written file.
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services import epg_cache
+
+logger = get_logger(__name__)
+
+XMLTV_FILE = "xmltv.xml"
+XMLTV_GZ_FILE = "xmltv.xml.gz"
+M3U_FILE = "channels.m3u"
+
+# Under a steady stream of edits, write anyway after this many debounce periods
+_MAX_DELAY_FACTOR = 6
+
+# Bumped by request_write(); the writer loops until it has caught up
+_requests = 0
+_task: Optional[asyncio.Task] = None
+
+# file name → ETag of the document last written to it
+_written: Dict[str, str] = {}
+
+
+def _write_atomic(path: str, chunks: Iterable[bytes]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+def _write_files(xml: epg_cache.Document, m3u: epg_cache.Document) -> List[str]:
+    """Write whichever files are out of date; the names written."""
+    written = []
+    for name, doc, compressed in (
+        (XMLTV_FILE, xml, False),
+        (XMLTV_GZ_FILE, xml, True),
+        (M3U_FILE, m3u, False),
+    ):
+        path = os.path.join(settings.STATIC_EPG_DIR, name)
+        if doc.complete and _written.get(name) == doc.etag and os.path.isfile(path):
+            continue
+        # Streams the document; a first pass also works out its ETag
+        _write_atomic(path, doc.stream(compressed))
+        _written[name] = doc.etag
+        written.append(name)
+    return written
+
+
+async def write_static_epg() -> None:
+    """Write the static files now (only those whose content changed)."""
+    if not settings.STATIC_EPG_ENABLED:
+        return
+    xml = await epg_cache.xmltv_all()
+    m3u = await epg_cache.m3u_all()
+    os.makedirs(settings.STATIC_EPG_DIR, exist_ok=True)
+    # Encoding, hashing and compressing a large guide stays off the event loop
+    written = await asyncio.to_thread(_write_files, xml, m3u)
+    if written:
+        logger.info(
+            f"write_static_epg: wrote {', '.join(written)} to {settings.STATIC_EPG_DIR}"
+        )
+
+
+async def _debounced_write() -> None:
+    delay = settings.STATIC_EPG_DEBOUNCE_SECONDS
+    while True:
+        # Wait until no new request arrives for `delay` seconds
+        deadline = time.monotonic() + delay * _MAX_DELAY_FACTOR
+        seen = -1
+        while seen != _requests and time.monotonic() < deadline:
+            seen = _requests
+            await asyncio.sleep(delay)
+
+        requests = _requests
+        try:
+            await write_static_epg()
+        except Exception as exc:
+            logger.error(f"_debounced_write: writing static EPG failed: {exc}", exc_info=True)
+        # Changes made while writing need another pass
+        if _requests == requests:
+            return
+
+
+def request_write() -> None:
+    """Rewrite the static files once edits settle (no-op when disabled)."""
+    global _requests, _task
+    if not settings.STATIC_EPG_ENABLED:
+        return
+    _requests += 1
+    if _task is not None and not _task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return      # no event loop (scripts): the hourly job catches up
+    _task = loop.create_task(_debounced_write())
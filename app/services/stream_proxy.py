@@ -7,24 +7,66 @@ This makes the channel behave like real TV — viewers always join mid-show.
 When one entry ends the generator automatically transitions to the next
 scheduled entry so the stream runs continuously without the client
 needing to reconnect.
+
+The generator runs once per channel, not once per viewer: stream_channel
+attaches each client to the channel's ChannelBroadcaster, which fans the
+single encode out to everyone watching.
+
+Programme changes are made gapless by a look-ahead: a few seconds before the
+current entry ends the next entry's source is resolved, probed and its ffmpeg
+started, and its output is buffered up to the first video keyframe.  When the
+current encode finishes the generator simply switches to that buffer.
 """
 
 import asyncio
-import json
 import os
+import time
 from asyncio.subprocess import PIPE
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.core.logging_config import get_logger
 from app.integrations.jellyfin import JellyfinClient
+from app.models.channel import Channel
 from app.models.schedule_entry import ScheduleEntry
+from app.models.transcode_profile import TranscodeProfile
+from app.services.broadcaster import (
+    BroadcastResponse,
+    ChannelBroadcaster,
+    active_broadcasters,
+    get_broadcaster,
+)
+from app.services.ffmpeg_monitor import FfmpegError, FfmpegMonitor, watch_ffmpeg
+from app.services.media_info import (
+    KeyframeIndex,
+    bitrate_kbps,
+    byte_seekable,
+    get_keyframe_index,
+    get_media_probe,
+)
+from app.services import source_cache
+from app.services.sessions import (
+    OUTPUT_MPEGTS,
+    EncodeSession,
+    close_encode,
+    open_encode,
+    open_viewer,
+)
+from app.services import timeline
+from app.services.timeshift import (
+    TimeshiftBuffer,
+    close_timeshift,
+    get_timeshift,
+    open_timeshift,
+)
+from app.services.transcode_slots import admit_encode, load_per_cpu
 
 logger = get_logger(__name__)
 
@@ -32,10 +74,103 @@ logger = get_logger(__name__)
 _OUTPUT_FORMAT = "mpegts"
 _MEDIA_TYPE = "video/mp2t"
 
+# Default output profile, used by channels without a TranscodeProfile.
+# Sources that already fit the channel's profile are stream-copied (see
+# _stream_copy_plan) instead of re-encoded.
+_MAX_HEIGHT = 1080
+_MAX_VIDEO_KBPS = 8000
+_COPY_VIDEO_CODECS = {"h264"}
+_COPY_PIX_FMTS = {"yuv420p", "yuvj420p"}   # 8-bit 4:2:0 only — no High 10
+_COPY_AUDIO_CODECS = {"aac"}
+
+# Channel.transcode_policy values
+TRANSCODE_POLICY_AUTO = "auto"             # copy when the source is compatible
+TRANSCODE_POLICY_ALWAYS = "transcode"      # always re-encode
+
+# Channel.transcode_offload / TRANSCODE_OFFLOAD values
+TRANSCODE_OFFLOAD_LOCAL = "local"          # libx264 on this machine
+TRANSCODE_OFFLOAD_JELLYFIN = "jellyfin"    # Jellyfin transcodes, we remux
+TRANSCODE_OFFLOAD_AUTO = "auto"            # Jellyfin while the local load is high
+
+# Channel.channel_type values
+CHANNEL_TYPE_VIDEO = "video"               # movies and episodes
+CHANNEL_TYPE_MUSIC = "music"               # audio tracks (see _build_music_cmd)
+
+# Music channels: audio codecs that can be copied into MPEG-TS as they are,
+# and the still-picture track added for clients that need video
+_MUSIC_COPY_AUDIO_CODECS = {"aac", "mp3"}
+_MUSIC_MAX_HEIGHT = 720
+_MUSIC_FPS = 1
+_MUSIC_VIDEO_KBPS = 300
+
+# Channel.playout_mode values
+PLAYOUT_MODE_PER_ENTRY = "per_entry"       # one ffmpeg per programme
+PLAYOUT_MODE_CONCAT = "concat"             # one ffmpeg across programmes
+
+# HLS output layout inside each channel's HLS directory
+HLS_PLAYLIST_NAME = "index.m3u8"
+_HLS_SEGMENT_PATTERN = "seg_%06d.ts"
+# Adaptive-bitrate layout (HLS_ABR_LADDER): a master playlist pointing at one
+# media playlist per rendition; %v is the rendition number.
+HLS_MASTER_PLAYLIST_NAME = "master.m3u8"
+_HLS_VARIANT_PLAYLIST_PATTERN = "stream_%v.m3u8"
+_HLS_VARIANT_SEGMENT_PATTERN = "seg_%v_%06d.ts"
+
 # How long (seconds) to wait when there is a gap in the schedule before
 # re-checking whether a new entry has become available.
 _GAP_POLL_INTERVAL = 5
 
+# Bad sources.  A transient failure (network, HTTP 5xx, unclassified) is
+# retried after _FAST_RETRY_DELAY, doubling each time, up to
+# _FAST_RETRY_LIMIT attempts; a permanent one (missing file, invalid data,
+# HTTP 4xx) or running out of retries skips the entry for the rest of its slot.
+_FAST_RETRY_DELAY = 0.5
+_FAST_RETRY_LIMIT = 3
+
+# HTTP sources: give up on a read/connect after this long (microseconds)
+# instead of ffmpeg's much longer default, so a dead server fails fast.
+_HTTP_RW_TIMEOUT_US = 10_000_000
+
+# MPEG-TS packet layout, used to find the first keyframe of a pre-started encode
+_TS_PACKET_SIZE = 188
+_TS_SYNC_BYTE = 0x47
+
+# A pre-started encode stops being read once its first keyframe is buffered;
+# this caps the buffer if no keyframe can be recognised.
+_PRESTART_MAX_BUFFER = 4 * 1024 * 1024
+
+# Extra time (seconds) on top of STREAM_PRESTART_SECONDS that a pre-started
+# encode gets to produce its first keyframe before it is abandoned.
+_PRESTART_KEYFRAME_GRACE = 10
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    """Encoder settings for one channel — a TranscodeProfile row, or the default."""
+
+    max_height: int = _MAX_HEIGHT
+    video_preset: str = "veryfast"
+    video_crf: Optional[int] = 20              # None → constant bitrate encode
+    video_bitrate_kbps: int = _MAX_VIDEO_KBPS  # maxrate with CRF, target without
+    audio_bitrate_kbps: int = 192
+    audio_channels: int = 2
+    threads: int = 0                           # 0 → ffmpeg's default
+
+    @classmethod
+    def from_model(cls, profile: TranscodeProfile) -> "EncodeProfile":
+        return cls(
+            max_height=profile.max_height,
+            video_preset=profile.video_preset,
+            video_crf=profile.video_crf,
+            video_bitrate_kbps=profile.video_bitrate_kbps,
+            audio_bitrate_kbps=profile.audio_bitrate_kbps,
+            audio_channels=profile.audio_channels,
+            threads=profile.threads,
+        )
+
+
+DEFAULT_PROFILE = EncodeProfile()
+
 
 def _get_client() -> JellyfinClient:
     return JellyfinClient(
@@ -54,24 +189,17 @@ async def get_current_entry(
     """
     Return the ScheduleEntry that spans the current UTC time for a channel.
 
-    Returns None if nothing is scheduled right now.
+    For a time-shifted channel this is the parent's entry that was on
+    `offset` ago, moved to this channel's clock (see shifted_channels).
+    Answered from the in-memory timeline (see timeline), so it normally
+    costs no query.  Returns None if nothing is scheduled right now.
     """
     now = datetime.now(timezone.utc).replace(tzinfo=None)
     logger.debug(
         f"get_current_entry: channel_id={channel_id}, now={now.isoformat()}"
     )
 
-    result = await db.execute(
-        select(ScheduleEntry)
-        .where(
-            ScheduleEntry.channel_id == channel_id,
-            ScheduleEntry.start_time <= now,
-            ScheduleEntry.end_time > now,
-        )
-        .order_by(ScheduleEntry.start_time)
-        .limit(1)
-    )
-    entry = result.scalar_one_or_none()
+    entry = await timeline.entry_at(channel_id, now, db)
 
     if entry:
         offset = (now - entry.start_time).total_seconds()
@@ -85,10 +213,10 @@ async def get_current_entry(
     return entry
 
 
-async def _detect_preferred_audio_index(source: str) -> Optional[int]:
+def _select_audio_index(probe: Optional[dict]) -> Optional[int]:
     """
-    Run ffprobe to find the absolute stream index of the first audio track
-    matching settings.PREFERRED_AUDIO_LANGUAGE.
+    Find the absolute stream index of the first audio track matching
+    settings.PREFERRED_AUDIO_LANGUAGE.
 
     Compares against both 2-letter (en) and 3-letter (eng) ISO 639 codes so
     that files tagged either way are handled correctly.
@@ -97,97 +225,477 @@ async def _detect_preferred_audio_index(source: str) -> Optional[int]:
     first audio track.
     """
     want = settings.PREFERRED_AUDIO_LANGUAGE.lower().strip()
-    if not want:
+    if not want or not probe:
         return None
 
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            "ffprobe",
-            "-v", "quiet",
-            "-print_format", "json",
-            "-show_streams",
-            "-select_streams", "a",
-            source,
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        try:
-            stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=10.0)
-        except asyncio.TimeoutError:
-            try:
-                proc.kill()
-            except ProcessLookupError:
-                pass
-            await proc.wait()
-            logger.warning(
-                f"_detect_preferred_audio_index: ffprobe timed out for {source!r}"
+    for stream in probe.get("streams", []):
+        if stream.get("codec_type") != "audio":
+            continue
+        tags = stream.get("tags") or {}
+        lang = (
+            tags.get("language") or tags.get("LANGUAGE") or ""
+        ).lower().strip()
+        if lang and (lang == want or lang[:2] == want[:2]):
+            idx = stream.get("index")
+            logger.debug(
+                f"_select_audio_index: "
+                f"preferred language '{want}' found at stream index {idx}"
             )
-            return None
+            return idx
 
-        data = json.loads(stdout)
-        for stream in data.get("streams", []):
-            tags = stream.get("tags") or {}
-            lang = (
-                tags.get("language") or tags.get("LANGUAGE") or ""
-            ).lower().strip()
-            if lang and (lang == want or lang[:2] == want[:2]):
-                idx = stream.get("index")
-                logger.debug(
-                    f"_detect_preferred_audio_index: "
-                    f"preferred language '{want}' found at stream index {idx}"
-                )
-                return idx
+    logger.debug(f"_select_audio_index: no '{want}' audio track found, using default")
+    return None
 
-        logger.debug(
-            f"_detect_preferred_audio_index: "
-            f"no '{want}' audio track found, using default"
+
+def _select_audio_stream(
+    probe: Optional[dict], audio_stream_index: Optional[int]
+) -> Optional[dict]:
+    """The probed audio stream ffmpeg will map: the chosen index, else the first."""
+    audio_streams = [
+        st for st in (probe or {}).get("streams", []) if st.get("codec_type") == "audio"
+    ]
+    if audio_stream_index is not None:
+        return next(
+            (st for st in audio_streams if st.get("index") == audio_stream_index), None
         )
+    return audio_streams[0] if audio_streams else None
 
-    except Exception as exc:
-        logger.warning(f"_detect_preferred_audio_index: ffprobe failed: {exc}")
 
-    return None
+def _stream_copy_plan(
+    probe: Optional[dict],
+    audio_stream_index: Optional[int],
+    profile: EncodeProfile = DEFAULT_PROFILE,
+) -> Tuple[bool, bool]:
+    """
+    Decide which streams can be passed through untouched.
 
+    Returns (copy_video, copy_audio).  Video is copied only when the first
+    video stream already fits the output profile — 8-bit H.264, at most
+    profile.max_height lines, and (when known) no more than
+    profile.video_bitrate_kbps.  Audio is copied when the selected track is
+    AAC with no more than profile.audio_channels channels.
+    Audio is only copied alongside copied video; re-encoding video while
+    copying audio gains little and risks A/V drift across the seek point.
+    """
+    if not probe:
+        return False, False
+    streams = probe.get("streams", [])
 
-def _build_ffmpeg_cmd(
-    source: str, offset_seconds: int, audio_stream_index: Optional[int] = None
+    video = next(
+        (
+            st for st in streams
+            if st.get("codec_type") == "video"
+            and not (st.get("disposition") or {}).get("attached_pic")
+        ),
+        None,
+    )
+    if video is None:
+        return False, False
+
+    bitrate = bitrate_kbps(video.get("bit_rate")) or bitrate_kbps(
+        (probe.get("format") or {}).get("bit_rate")
+    )
+    copy_video = (
+        video.get("codec_name") in _COPY_VIDEO_CODECS
+        and video.get("pix_fmt") in _COPY_PIX_FMTS
+        and 0 < int(video.get("height") or 0) <= profile.max_height
+        and (bitrate is None or bitrate <= profile.video_bitrate_kbps)
+    )
+    if not copy_video:
+        return False, False
+
+    audio = _select_audio_stream(probe, audio_stream_index)
+    copy_audio = (
+        audio is not None
+        and audio.get("codec_name") in _COPY_AUDIO_CODECS
+        and int(audio.get("channels") or 0) <= profile.audio_channels
+    )
+    return True, copy_audio
+
+
+def _build_output_args(
+    hls_dir: Optional[str],
+    copy_video: bool = False,
+    renditions: Optional[List["Rendition"]] = None,
+) -> list:
+    """
+    Output half of the ffmpeg command line.
+
+    Without hls_dir the encode is muxed as MPEG-TS to stdout for the channel
+    broadcast.  With hls_dir ffmpeg writes a rolling window of .ts segments
+    plus index.m3u8 into that directory instead.  append_list/discont_start
+    let the ffmpeg started for the next programme continue the same playlist
+    (with a discontinuity tag) rather than starting a new one.
+
+    With renditions (HLS only) each rendition gets its own media playlist and
+    segments, tied together by master.m3u8; the streams must already be
+    mapped in rendition order, video then audio (see _abr_stream_args).
+    """
+    if not hls_dir:
+        return [
+            "-f", _OUTPUT_FORMAT,      # MPEG-TS container
+            "-loglevel", "warning",
+            "pipe:1",
+        ]
+    segment_seconds = settings.HLS_SEGMENT_SECONDS
+    # Keyframe on every segment boundary so each segment starts cleanly.
+    # Copied video keeps the source's GOPs, so segments cut where they fall.
+    keyframes = (
+        [] if copy_video
+        else ["-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})"]
+    )
+    if renditions:
+        variants = " ".join(f"v:{i},a:{i}" for i in range(len(renditions)))
+        return [
+            *keyframes,
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_list_size", str(settings.HLS_LIST_SIZE),
+            "-hls_flags",
+            "delete_segments+append_list+discont_start+omit_endlist+independent_segments",
+            "-var_stream_map", variants,
+            "-master_pl_name", HLS_MASTER_PLAYLIST_NAME,
+            "-hls_segment_filename", os.path.join(hls_dir, _HLS_VARIANT_SEGMENT_PATTERN),
+            "-loglevel", "warning",
+            os.path.join(hls_dir, _HLS_VARIANT_PLAYLIST_PATTERN),
+        ]
+    return [
+        *keyframes,
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_list_size", str(settings.HLS_LIST_SIZE),
+        "-hls_flags",
+        "delete_segments+append_list+discont_start+omit_endlist+independent_segments",
+        "-hls_segment_filename", os.path.join(hls_dir, _HLS_SEGMENT_PATTERN),
+        "-loglevel", "warning",
+        os.path.join(hls_dir, HLS_PLAYLIST_NAME),
+    ]
+
+
+def _video_codec_args(
+    copy_video: bool = False, profile: EncodeProfile = DEFAULT_PROFILE
 ) -> list:
-    # When any -map is present ffmpeg disables automatic stream selection, so
-    # we must map both video and audio explicitly.  If ffprobe identified a
-    # preferred-language track use its absolute index; otherwise fall back to
-    # the first audio stream in the file.
-    audio_map = (
-        ["-map", f"0:{audio_stream_index}"]
-        if audio_stream_index is not None
-        else ["-map", "0:a:0"]
+    if copy_video:
+        # Source already fits the output profile — pass it through untouched
+        return ["-c:v", "copy"]
+    kbps = profile.video_bitrate_kbps
+    # CRF with a bitrate ceiling, or a plain bitrate target when crf is unset
+    rate = (
+        ["-crf", str(profile.video_crf), "-maxrate", f"{kbps}k"]
+        if profile.video_crf is not None
+        else ["-b:v", f"{kbps}k", "-maxrate", f"{kbps}k"]
     )
+    threads = ["-threads", str(profile.threads)] if profile.threads > 0 else []
     return [
+        "-vf", f"scale=-2:min({profile.max_height}\\,ih)",  # cap height, keep AR
+        "-c:v", "libx264",
+        "-preset", profile.video_preset,  # default veryfast — low CPU for live use
+        "-tune", "zerolatency",    # minimize encoder buffering for live use
+        *rate,
+        "-bufsize", f"{kbps // 2}k",
+        *threads,
+    ]
+
+
+def _audio_codec_args(
+    copy_audio: bool = False, profile: EncodeProfile = DEFAULT_PROFILE
+) -> list:
+    if copy_audio:
+        return ["-c:a", "copy"]
+    return [
+        "-c:a", "aac",
+        "-b:a", f"{profile.audio_bitrate_kbps}k",
+        "-ac", str(profile.audio_channels),  # downmix (stereo by default)
+    ]
+
+
+@dataclass(frozen=True)
+class Rendition:
+    """One rung of the adaptive-bitrate ladder."""
+
+    height: int
+    video_kbps: int
+
+
+def parse_abr_ladder(spec: str) -> List[Rendition]:
+    """
+    Parse HLS_ABR_LADDER ("1080:6000,720:3000,480:1200") into renditions,
+    tallest first.  Malformed rungs are logged and skipped.
+    """
+    renditions = []
+    for rung in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            height, kbps = (int(value) for value in rung.split(":"))
+        except ValueError:
+            logger.warning(f"parse_abr_ladder: ignoring malformed rung '{rung}'")
+            continue
+        if height > 0 and kbps > 0:
+            renditions.append(Rendition(height, kbps))
+    return sorted(set(renditions), key=lambda r: r.height, reverse=True)
+
+
+def _abr_renditions(profile: EncodeProfile) -> List[Rendition]:
+    """
+    The configured ladder limited to the channel profile: rungs taller than
+    profile.max_height are dropped (the lowest rung is always kept) and
+    bitrates are capped at profile.video_bitrate_kbps.
+    """
+    ladder = parse_abr_ladder(settings.HLS_ABR_LADDER)
+    if not ladder:
+        return []
+    fitting = [r for r in ladder if r.height <= profile.max_height] or ladder[-1:]
+    return [
+        Rendition(min(r.height, profile.max_height),
+                  min(r.video_kbps, profile.video_bitrate_kbps))
+        for r in fitting
+    ]
+
+
+def _abr_stream_args(
+    audio_map: str,
+    renditions: List[Rendition],
+    copy_audio: bool = False,
+    profile: EncodeProfile = DEFAULT_PROFILE,
+) -> list:
+    """
+    Mapping and codec arguments for an adaptive-bitrate encode.
+
+    The source is decoded once; `split` fans the frames out to one scaler
+    and x264 instance per rendition.  Each rendition carries its own copy of
+    the audio so every media playlist is self-contained.
+    """
+    count = len(renditions)
+    graph = [f"[0:v:0]split={count}" + "".join(f"[s{i}]" for i in range(count))]
+    graph += [
+        f"[s{i}]scale=-2:min({r.height}\\,ih)[v{i}]"
+        for i, r in enumerate(renditions)
+    ]
+    maps, rates = [], []
+    for i, r in enumerate(renditions):
+        maps += ["-map", f"[v{i}]", "-map", audio_map]
+        rate = (
+            [f"-maxrate:v:{i}", f"{r.video_kbps}k"]
+            if profile.video_crf is not None
+            else [f"-b:v:{i}", f"{r.video_kbps}k", f"-maxrate:v:{i}", f"{r.video_kbps}k"]
+        )
+        rates += [*rate, f"-bufsize:v:{i}", f"{r.video_kbps // 2}k"]
+    crf = ["-crf", str(profile.video_crf)] if profile.video_crf is not None else []
+    threads = ["-threads", str(profile.threads)] if profile.threads > 0 else []
+    return [
+        "-filter_complex", ";".join(graph),
+        *maps,
+        "-c:v", "libx264",
+        "-preset", profile.video_preset,
+        "-tune", "zerolatency",
+        "-sc_threshold", "0",          # no scene-cut keyframes — keep the
+                                       # renditions' segment boundaries aligned
+        *crf,
+        *rates,
+        *threads,
+        *_audio_codec_args(copy_audio, profile),
+    ]
+
+
+@dataclass(frozen=True)
+class SeekPlan:
+    """How ffmpeg reaches the join offset within a source."""
+
+    input_args: Tuple[str, ...]           # before -i
+    output_args: Tuple[str, ...] = ()     # after -i — frame-accurate trim
+    start_seconds: float = 0.0            # where playback really starts
+
+
+def _plan_seek(
+    offset_seconds: float,
+    keyframes: Optional[KeyframeIndex] = None,
+    copy_video: bool = False,
+    byte_seek: bool = False,
+) -> SeekPlan:
+    """
+    Turn a join offset into ffmpeg seek arguments using the keyframe index.
+
+    Without an index this is the plain `-ss offset` input seek.  With one:
+
+    - byte_seek (MPEG-TS/PS, which have no seek index of their own): start
+      reading at the keyframe's byte offset — one HTTP Range request instead
+      of ffmpeg bisecting the file — and, when transcoding, trim the rest of
+      the GOP on the output side so playback starts exactly at the offset;
+    - copied video can only start on a keyframe, so seek to the nearest one
+      rather than wherever the demuxer lands;
+    - transcoded video in other containers keeps `-ss offset`, which their
+      own index already makes fast and ffmpeg makes frame-accurate.
+    """
+    plain = SeekPlan(("-ss", str(offset_seconds)), start_seconds=offset_seconds)
+    if keyframes is None or not keyframes.times or offset_seconds <= 0:
+        return plain
+
+    i = (
+        keyframes.nearest(offset_seconds) if copy_video
+        else keyframes.at_or_before(offset_seconds)
+    )
+    time_s, pos = keyframes.times[i], keyframes.positions[i]
+    if byte_seek and pos >= 0:
+        trim = round(offset_seconds - time_s, 3)
+        if copy_video or trim <= 0:
+            return SeekPlan(("-skip_initial_bytes", str(pos)), start_seconds=time_s)
+        return SeekPlan(
+            ("-skip_initial_bytes", str(pos)), ("-ss", str(trim)), offset_seconds
+        )
+    if copy_video:
+        return SeekPlan(("-ss", f"{time_s:.3f}"), start_seconds=time_s)
+    return plain
+
+
+def _audio_map(audio_stream_index: Optional[int]) -> str:
+    """
+    -map target for the audio.  When any -map is present ffmpeg disables
+    automatic stream selection, so audio is always mapped explicitly: the
+    preferred-language track ffprobe identified by absolute index, or else
+    the first audio stream in the file.
+    """
+    return f"0:{audio_stream_index}" if audio_stream_index is not None else "0:a:0"
+
+
+def _http_input_args(source: str) -> list:
+    """Input options that make ffmpeg fail fast on a dead Jellyfin stream."""
+    if source.startswith(("http://", "https://")):
+        return ["-rw_timeout", str(_HTTP_RW_TIMEOUT_US)]
+    return []
+
+
+def _build_ffmpeg_cmd(
+    source: str,
+    offset_seconds: int,
+    audio_stream_index: Optional[int] = None,
+    hls_dir: Optional[str] = None,
+    copy_video: bool = False,
+    copy_audio: bool = False,
+    profile: EncodeProfile = DEFAULT_PROFILE,
+    renditions: Optional[List[Rendition]] = None,
+    seek: Optional[SeekPlan] = None,
+) -> list:
+    seek = seek or _plan_seek(offset_seconds)
+    audio_map = _audio_map(audio_stream_index)
+    input_args = [
         "ffmpeg",
+        "-nostats", "-progress", "pipe:2",  # key=value progress on stderr
         # ── Input / seek ─────────────────────────────────────────────────────
-        "-ss", str(offset_seconds),    # fast seek in local file / HTTP Range
+        "-re",                         # read at native rate — one encode feeds
+                                       # many viewers, so pace it to wall clock
+        *seek.input_args,              # fast seek in local file / HTTP Range
         "-probesize", "262144",        # 256 KB probe instead of default 5 MB
         "-analyzeduration", "1000000", # 1 s analysis instead of default 5 s
         "-fflags", "nobuffer",         # pass frames through without extra buffering
+        *_http_input_args(source),     # fail fast on a dead Jellyfin stream
         "-i", source,
+        *seek.output_args,             # exact join point within the GOP
+    ]
+    if renditions and hls_dir:
+        # ── ABR ladder — one decode split into every rendition ───────────────
+        return [
+            *input_args,
+            *_abr_stream_args(audio_map, renditions, copy_audio, profile),
+            *_build_output_args(hls_dir, renditions=renditions),
+        ]
+    return [
+        *input_args,
         # ── Stream mapping ────────────────────────────────────────────────────
         "-map", "0:v:0",               # first video stream
-        *audio_map,                    # preferred language track or first audio
-        # ── Video — H.264 1080p ───────────────────────────────────────────────
-        "-vf", "scale=-2:min(1080\\,ih)",  # scale down to 1080p max, keep AR
+        "-map", audio_map,             # preferred language track or first audio
+        # ── Video — H.264 per profile (copied when the source already fits) ──
+        *_video_codec_args(copy_video, profile),
+        # ── Audio — AAC per profile (copied when the source already fits) ────
+        *_audio_codec_args(copy_audio, profile),
+        # ── Output ───────────────────────────────────────────────────────────
+        *_build_output_args(hls_dir, copy_video),  # MPEG-TS pipe or HLS window
+    ]
+
+
+def _music_copy_audio(
+    probe: Optional[dict],
+    audio_stream_index: Optional[int],
+    profile: EncodeProfile = DEFAULT_PROFILE,
+) -> bool:
+    """True when a music track is AAC or MP3 within profile.audio_channels."""
+    audio = _select_audio_stream(probe, audio_stream_index)
+    return (
+        audio is not None
+        and audio.get("codec_name") in _MUSIC_COPY_AUDIO_CODECS
+        and int(audio.get("channels") or 0) <= profile.audio_channels
+    )
+
+
+def _build_music_cmd(
+    source: str,
+    offset_seconds: int,
+    audio_stream_index: Optional[int] = None,
+    hls_dir: Optional[str] = None,
+    copy_audio: bool = False,
+    profile: EncodeProfile = DEFAULT_PROFILE,
+    artwork: Optional[str] = None,
+    abr: bool = False,
+) -> list:
+    """
+    ffmpeg command line for one track on a music channel.
+
+    The audio is copied when it is already AAC or MP3 (see
+    _music_copy_audio) and encoded to AAC per profile otherwise.  With
+    MUSIC_STILL_VIDEO a still picture — the track's artwork, or a black
+    frame without one — is added as a 1 fps H.264 stream for clients that
+    will not play audio-only MPEG-TS; a still at 1 fps costs next to
+    nothing to encode.  An ABR HLS writer expects a master playlist, so
+    with abr the picture is always added and written as a single variant.
+    """
+    abr = abr and bool(hls_dir)
+    still = settings.MUSIC_STILL_VIDEO or abr
+    height = min(profile.max_height, _MUSIC_MAX_HEIGHT)
+    width = height * 16 // 9 // 2 * 2
+    if not still:
+        picture_input = []
+    elif artwork:
+        picture_input = ["-re", "-loop", "1", "-framerate", str(_MUSIC_FPS), "-i", artwork]
+    else:
+        picture_input = [
+            "-re", "-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={_MUSIC_FPS}",
+        ]
+    video_args = [
+        "-map", "1:v:0",
+        # Letterbox the artwork into a 16:9 frame
+        "-vf", (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p"
+        ),
         "-c:v", "libx264",
-        "-preset", "veryfast",         # fast encode, lower CPU than slow/medium
-        "-tune", "zerolatency",        # minimize encoder buffering for live use
-        "-crf", "20",                  # visually lossless at typical bitrates
-        "-maxrate", "8000k",
-        "-bufsize", "4000k",
-        # ── Audio — AAC stereo ────────────────────────────────────────────────
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-ac", "2",                    # downmix to stereo
+        "-preset", profile.video_preset,
+        "-tune", "stillimage",
+        "-crf", "28",
+        "-maxrate", f"{_MUSIC_VIDEO_KBPS}k",
+        "-bufsize", f"{_MUSIC_VIDEO_KBPS}k",
+        "-g", str(_MUSIC_FPS * 2),     # keyframe every 2 s for quick tune-in
+        "-shortest",                   # the looped picture ends with the track
+    ] if still else []
+    output_args = (
+        _build_output_args(
+            hls_dir, renditions=[Rendition(height, _MUSIC_VIDEO_KBPS)]
+        ) if abr
+        else _build_output_args(hls_dir, copy_video=not still)
+    )
+    return [
+        "ffmpeg",
+        "-nostats", "-progress", "pipe:2",
+        # ── Input / seek ─────────────────────────────────────────────────────
+        "-re",
+        "-ss", str(offset_seconds),
+        *_http_input_args(source),
+        "-i", source,
+        *picture_input,
+        # ── Picture — still artwork as H.264 (MUSIC_STILL_VIDEO) ─────────────
+        *video_args,
+        # ── Audio — copied AAC/MP3 or AAC per profile ────────────────────────
+        "-map", _audio_map(audio_stream_index),
+        *_audio_codec_args(copy_audio, profile),
         # ── Output ───────────────────────────────────────────────────────────
-        "-f", _OUTPUT_FORMAT,          # MPEG-TS container
-        "-loglevel", "warning",
-        "pipe:1",
+        *output_args,
     ]
 
 
@@ -199,8 +707,11 @@ async def _resolve_source(entry: ScheduleEntry, channel_id: int) -> str:
         )
         return entry.file_path
 
-    client = _get_client()
-    source = await client.get_stream_url(entry.media_item_id)
+    if source_cache.enabled():
+        # Read through the local chunk cache (see source_cache)
+        source = source_cache.loopback_url(entry.media_item_id)
+    else:
+        source = await _get_client().get_stream_url(entry.media_item_id)
     if entry.file_path:
         logger.warning(
             f"_resolve_source: '{entry.file_path}' not accessible, "
@@ -213,96 +724,867 @@ async def _resolve_source(entry: ScheduleEntry, channel_id: int) -> str:
     return source
 
 
-async def _continuous_stream_generator(
-    channel_id: int, db: AsyncSession, chunk_size: int = 65536
-):
+@dataclass
+class Playout:
+    """Everything needed to start ffmpeg for one schedule entry."""
+
+    entry: ScheduleEntry
+    source: str
+    offset_seconds: int
+    audio_stream_index: Optional[int] = None
+    copy_video: bool = False
+    copy_audio: bool = False
+    profile: EncodeProfile = DEFAULT_PROFILE
+    keyframes: Optional[KeyframeIndex] = None
+    byte_seek: bool = False                # source can be entered at a byte offset
+    offload_url: Optional[str] = None      # Jellyfin transcode from the join point
+    music: bool = False                    # audio track on a music channel
+    artwork: Optional[str] = None          # still picture for a music track
+
+    def ffmpeg_cmd(self, hls_dir: Optional[str] = None, abr: bool = False) -> list:
+        """
+        ffmpeg command line for this playout.  abr (HLS only) encodes the
+        HLS_ABR_LADDER renditions instead of a single stream, which is
+        always a full re-encode.
+        """
+        if self.music:
+            return _build_music_cmd(
+                self.source,
+                self.offset_seconds,
+                self.audio_stream_index,
+                hls_dir=hls_dir,
+                copy_audio=self.copy_audio,
+                profile=self.profile,
+                artwork=self.artwork,
+                abr=abr,
+            )
+        renditions = _abr_renditions(self.profile) if abr and hls_dir else None
+        if self.offload_url and not renditions:
+            # Jellyfin already encodes to the profile from the join point;
+            # ffmpeg only remuxes (and segments, for HLS)
+            return _build_ffmpeg_cmd(
+                self.offload_url, 0, hls_dir=hls_dir,
+                copy_video=True, copy_audio=True, profile=self.profile,
+            )
+        copy_video = self.copy_video and not renditions
+        return _build_ffmpeg_cmd(
+            self.source,
+            self.offset_seconds,
+            self.audio_stream_index,
+            hls_dir=hls_dir,
+            copy_video=copy_video,
+            copy_audio=self.copy_audio and not renditions,
+            profile=self.profile,
+            renditions=renditions,
+            seek=_plan_seek(
+                self.offset_seconds, self.keyframes, copy_video, self.byte_seek
+            ),
+        )
+
+    @property
+    def mode(self) -> str:
+        return (
+            "jellyfin transcode" if self.offload_url
+            else "music copy" if self.music and self.copy_audio
+            else "music transcode" if self.music
+            else "copy" if self.copy_video and self.copy_audio
+            else "video copy + audio transcode" if self.copy_video
+            else "transcode"
+        )
+
+    def describe(self) -> str:
+        audio = (
+            self.audio_stream_index if self.audio_stream_index is not None else "default"
+        )
+        seek = (
+            f"{len(self.keyframes.times)} keyframes"
+            f"{' (byte seek)' if self.byte_seek else ''}"
+            if self.keyframes is not None else "no index"
+        )
+        return (
+            f"'{self.entry.title}' (id={self.entry.id}), "
+            f"offset={self.offset_seconds}s, audio_stream={audio}, mode={self.mode}, "
+            f"seek={seek}"
+        )
+
+
+@dataclass
+class _ChannelSettings:
+    """The channel columns that decide how its entries are played."""
+    channel_type: str
+    transcode_policy: str
+    transcode_offload: str
+    profile: EncodeProfile
+
+
+async def _get_channel_settings(channel_id: int, db: AsyncSession) -> _ChannelSettings:
     """
-    Yield MPEG-TS chunks indefinitely, transitioning between schedule entries
-    as each one ends.
+    Load the channel and its transcode profile in one query, with defaults
+    applied: FORCE_TRANSCODE overrides the policy, a NULL offload falls back
+    to TRANSCODE_OFFLOAD and a missing profile to DEFAULT_PROFILE.
+    """
+    result = await db.execute(
+        select(Channel, TranscodeProfile)
+        .outerjoin(TranscodeProfile, Channel.transcode_profile_id == TranscodeProfile.id)
+        .where(Channel.id == channel_id)
+    )
+    channel, profile = result.one_or_none() or (Channel(), None)
+    policy = channel.transcode_policy or TRANSCODE_POLICY_AUTO
+    return _ChannelSettings(
+        channel_type=channel.channel_type or CHANNEL_TYPE_VIDEO,
+        transcode_policy=TRANSCODE_POLICY_ALWAYS if settings.FORCE_TRANSCODE else policy,
+        transcode_offload=channel.transcode_offload or settings.TRANSCODE_OFFLOAD,
+        profile=EncodeProfile.from_model(profile) if profile else DEFAULT_PROFILE,
+    )
+
+
+def _should_offload(offload: str) -> bool:
+    if offload == TRANSCODE_OFFLOAD_JELLYFIN:
+        return True
+    if offload == TRANSCODE_OFFLOAD_AUTO:
+        load = load_per_cpu()
+        return load is not None and load >= settings.TRANSCODE_OFFLOAD_LOAD
+    return False
+
+
+async def _get_encode_profile(channel_id: int, db: AsyncSession) -> EncodeProfile:
+    """Return the channel's transcode profile, or DEFAULT_PROFILE if it has none."""
+    return (await _get_channel_settings(channel_id, db)).profile
+
+
+async def _plan_playout(
+    entry: ScheduleEntry,
+    channel_id: int,
+    db: AsyncSession,
+    offset_seconds: int,
+    use_cache: bool = True,
+    allow_offload: bool = True,
+) -> Playout:
+    """
+    Resolve and probe an entry's source and decide how ffmpeg should play it.
+
+    Probes the source once to pick the preferred audio track and, when the
+    channel's transcode policy allows it, whether the source can be
+    stream-copied instead of re-encoded under the channel's transcode
+    profile.  A stored keyframe index, if any, sharpens the join seek (see
+    _plan_seek).  A pre-transcoded copy of the programme (see pretranscode)
+    replaces a live transcode when use_cache is set.  Music channels get an
+    audio playout with a still picture instead (see _build_music_cmd).
+    Otherwise, when the video needs transcoding and the channel's
+    transcode_offload says so (see _should_offload), Jellyfin is asked to do
+    the transcode and ffmpeg only remuxes its output; allow_offload=False
+    keeps it local.  Raises if the source cannot be resolved.
+    """
+    source = await _resolve_source(entry, channel_id)
+    channel = await _get_channel_settings(channel_id, db)
+    policy, profile = channel.transcode_policy, channel.profile
+    probe = await get_media_probe(source, entry.media_item_id)
+    audio_idx = _select_audio_index(probe)
+    if channel.channel_type == CHANNEL_TYPE_MUSIC:
+        # Audio-only source: no video to copy, cache or offload
+        artwork = entry.thumbnail_path
+        return Playout(
+            entry=entry,
+            source=source,
+            offset_seconds=offset_seconds,
+            audio_stream_index=audio_idx,
+            copy_audio=(
+                policy == TRANSCODE_POLICY_AUTO
+                and _music_copy_audio(probe, audio_idx, profile)
+            ),
+            profile=profile,
+            music=True,
+            artwork=artwork if artwork and os.path.isfile(artwork) else None,
+        )
+    # Only needed to join mid-programme; entries started from 0 need no seek
+    keyframes = (
+        await get_keyframe_index(source, entry.media_item_id)
+        if offset_seconds > 0 else None
+    )
+    copy_video, copy_audio = (
+        _stream_copy_plan(probe, audio_idx, profile)
+        if policy == TRANSCODE_POLICY_AUTO
+        else (False, False)
+    )
+    if use_cache and not (copy_video and copy_audio):
+        from app.services.pretranscode import cached_copy
+
+        cached = await cached_copy(entry.media_item_id, source, profile, audio_idx)
+        if cached is not None:
+            logger.info(
+                f"_plan_playout: channel={channel_id} '{entry.title}' "
+                f"playing from pre-transcode cache"
+            )
+            # Already in the channel's output profile with one audio track
+            return Playout(
+                entry=entry,
+                source=cached,
+                offset_seconds=offset_seconds,
+                copy_video=True,
+                copy_audio=True,
+                profile=profile,
+                keyframes=(
+                    await get_keyframe_index(cached) if offset_seconds > 0 else None
+                ),
+                byte_seek=True,
+            )
+    offload_url = None
+    if (
+        allow_offload
+        and not copy_video
+        and _should_offload(channel.transcode_offload)
+    ):
+        offload_url = await _get_client().get_stream_url(
+            entry.media_item_id,
+            start_seconds=offset_seconds,
+            max_height=profile.max_height,
+            video_bitrate_kbps=profile.video_bitrate_kbps,
+            audio_bitrate_kbps=profile.audio_bitrate_kbps,
+            audio_channels=profile.audio_channels,
+            audio_stream_index=audio_idx,
+            transcode=True,
+        )
+        logger.info(
+            f"_plan_playout: channel={channel_id} '{entry.title}' "
+            f"transcoding on Jellyfin"
+        )
+    return Playout(
+        entry=entry,
+        source=source,
+        offset_seconds=offset_seconds,
+        audio_stream_index=audio_idx,
+        copy_video=copy_video,
+        copy_audio=copy_audio,
+        profile=profile,
+        keyframes=keyframes,
+        byte_seek=byte_seekable(probe),
+        offload_url=offload_url,
+    )
+
+
+# Entries whose source failed permanently: entry id → end_time (skip until then)
+_failed_entries: Dict[int, datetime] = {}
+# Consecutive transient failures per entry id
+_retry_counts: Dict[int, int] = {}
+
+
+def record_source_failure(
+    channel_id: int, entry: ScheduleEntry, error: Optional[FfmpegError], caller: str
+) -> float:
+    """
+    Note that ffmpeg failed on an entry's source before producing output.
+
+    Returns how long to wait before the caller goes back to
+    _wait_for_playable.  Permanent failures (and transient ones that keep
+    recurring) mark the entry as failed, so _wait_for_playable skips it
+    instead of respawning ffmpeg on it in a loop.
+    """
+    kind = error.kind if error is not None else "unknown"
+    attempts = _retry_counts.get(entry.id, 0) + 1
+    if (error is not None and not error.transient) or attempts > _FAST_RETRY_LIMIT:
+        _retry_counts.pop(entry.id, None)
+        _failed_entries[entry.id] = entry.end_time
+        logger.error(
+            f"{caller}: channel={channel_id} '{entry.title}' (id={entry.id}) "
+            f"is unplayable ({kind}), skipping it"
+        )
+        return 0.2
+    _retry_counts[entry.id] = attempts
+    delay = _FAST_RETRY_DELAY * 2 ** (attempts - 1)
+    logger.warning(
+        f"{caller}: channel={channel_id} '{entry.title}' failed ({kind}), "
+        f"retry {attempts}/{_FAST_RETRY_LIMIT} in {delay:.1f}s"
+    )
+    return delay
+
+
+def record_source_success(entry: ScheduleEntry) -> None:
+    _retry_counts.pop(entry.id, None)
+
+
+def _prune_failed(now: datetime) -> None:
+    for entry_id, until in list(_failed_entries.items()):
+        if until <= now:
+            del _failed_entries[entry_id]
+
+
+def _is_failed(entry: ScheduleEntry, now: datetime) -> bool:
+    _prune_failed(now)
+    return entry.id in _failed_entries
+
+
+async def _plan_filler(channel_id: int, db: AsyncSession) -> Optional[Playout]:
+    """A filler clip for a schedule gap, sized to the next entry; None if none."""
+    if not settings.FILLER_ENABLED:
+        return None
+    channel = await _get_channel_settings(channel_id, db)
+    if channel.channel_type == CHANNEL_TYPE_MUSIC:
+        return None                     # filler clips are video
+    from app.services.filler import filler_clip_id, filler_entry, pick_filler
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    next_start = await timeline.next_start(channel_id, now, db)
+    gap = (
+        (next_start - now).total_seconds()
+        if next_start is not None else float("inf")
+    )
+    profile = channel.profile
+    _prune_failed(now)
+    failed = {filler_clip_id(entry_id) for entry_id in _failed_entries} - {None}
+    clip = pick_filler(profile, gap, exclude=failed)
+    if clip is None:
+        return None
+    # Encoded to the channel's profile ahead of time, so it is only copied
+    return Playout(
+        entry=filler_entry(channel_id, clip, now),
+        source=clip.path,
+        offset_seconds=0,
+        copy_video=True,
+        copy_audio=True,
+        profile=profile,
+    )
+
+
+async def get_airing_entry(
+    channel_id: int, db: AsyncSession
+) -> Optional[ScheduleEntry]:
+    """
+    What the channel airs right now: the scheduled entry or, in a schedule
+    gap, the filler clip that would fill it; None if there is neither.
+    """
+    entry = await get_current_entry(channel_id, db)
+    if entry is None:
+        filler = await _plan_filler(channel_id, db)
+        entry = filler.entry if filler is not None else None
+    return entry
+
+
+async def _wait_for_playable(
+    channel_id: int, caller: str, use_cache: bool = True, allow_offload: bool = True
+) -> Playout:
+    """
+    Block until the channel has something playable right now.
 
-    When the current entry's ffmpeg process exits the generator re-queries
-    the database for the next entry (time has advanced so the query naturally
-    returns the following programme) and starts a new ffmpeg process.
+    If there is a gap in the schedule this plays a filler clip that fits it
+    (see filler) or, without one, waits _GAP_POLL_INTERVAL seconds between
+    retries; if an entry's source cannot be resolved, or ffmpeg has
+    already failed on it permanently (see record_source_failure), it sleeps
+    until (at most 30 s towards) the entry's end and tries again.  Shared by the
+    MPEG-TS generator and the HLS writer so both follow the schedule the
+    same way.
 
-    If there is a gap in the schedule the generator waits _GAP_POLL_INTERVAL
-    seconds between retries instead of killing the connection.
+    Every attempt runs in its own short-lived session, so a stream holds no
+    database connection while it waits or while the playout runs.
+    use_cache and allow_offload are passed on to _plan_playout.
     """
     while True:
-        entry = await get_current_entry(channel_id, db)
+        async with AsyncSessionLocal() as db:
+            playout, wait = await _try_playable(
+                channel_id, db, caller, use_cache, allow_offload
+            )
+        if playout is not None:
+            return playout
+        await asyncio.sleep(wait)
+
+
+async def _try_playable(
+    channel_id: int,
+    db: AsyncSession,
+    caller: str,
+    use_cache: bool = True,
+    allow_offload: bool = True,
+) -> Tuple[Optional[Playout], float]:
+    """One attempt of _wait_for_playable: the playout, or how long to wait."""
+    entry = await get_current_entry(channel_id, db)
 
-        if not entry:
+    if not entry:
+        filler = await _plan_filler(channel_id, db)
+        if filler is not None:
             logger.debug(
-                f"_continuous_stream_generator: gap on channel {channel_id}, "
-                f"waiting {_GAP_POLL_INTERVAL}s"
+                f"{caller}: gap on channel {channel_id}, "
+                f"filling with '{filler.entry.title}'"
             )
-            await asyncio.sleep(_GAP_POLL_INTERVAL)
-            continue
+            return filler, 0
+        logger.debug(
+            f"{caller}: gap on channel {channel_id}, "
+            f"waiting {_GAP_POLL_INTERVAL}s"
+        )
+        return None, _GAP_POLL_INTERVAL
 
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        offset_seconds = max(0, int((now - entry.start_time).total_seconds()))
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    offset_seconds = max(0, int((now - entry.start_time).total_seconds()))
+    remaining = max(1, int((entry.end_time - now).total_seconds()))
 
-        try:
-            source = await _resolve_source(entry, channel_id)
-        except Exception as exc:
-            logger.error(
-                f"_continuous_stream_generator: could not resolve source for "
-                f"entry {entry.id} '{entry.title}': {exc}",
-                exc_info=True,
-            )
-            # Skip to next entry by sleeping until this entry should have ended
-            remaining = max(1, int((entry.end_time - now).total_seconds()))
-            await asyncio.sleep(min(remaining, 30))
+    if _is_failed(entry, now):
+        logger.debug(
+            f"{caller}: entry {entry.id} '{entry.title}' failed earlier, "
+            f"waiting for the next entry"
+        )
+        return None, min(remaining, 30)
+
+    try:
+        playout = await _plan_playout(
+            entry, channel_id, db, offset_seconds,
+            use_cache=use_cache, allow_offload=allow_offload,
+        )
+        return playout, 0
+    except Exception as exc:
+        logger.error(
+            f"{caller}: could not resolve source for "
+            f"entry {entry.id} '{entry.title}': {exc}",
+            exc_info=True,
+        )
+        # Skip to next entry by sleeping until this entry should have ended
+        return None, min(remaining, 30)
+
+
+async def _get_next_entry(
+    channel_id: int, current: ScheduleEntry, db: AsyncSession
+) -> Optional[ScheduleEntry]:
+    """
+    Return the entry that follows `current` back-to-back, or None if the
+    schedule has a gap there (gaps are left to _wait_for_playable).
+    """
+    slack = timedelta(seconds=max(1, settings.STREAM_PRESTART_SECONDS))
+    return await timeline.entry_starting_between(
+        channel_id,
+        current.end_time - slack,
+        current.end_time + slack,
+        db,
+        exclude_id=current.id,
+    )
+
+
+# ── gapless transitions ──────────────────────────────────────────────────────
+
+def _ts_keyframe_offset(data, start: int = 0) -> Optional[int]:
+    """
+    Return the offset of the first MPEG-TS packet that starts a video
+    keyframe, scanning whole packets from `start`, or None if there is none.
+
+    ffmpeg's mpegts muxer flags keyframes with the adaptation field's
+    random_access_indicator; requiring a video PES start (stream_id
+    0xE0–0xEF) in the same packet skips audio, which is flagged too.
+    """
+    end = len(data) - _TS_PACKET_SIZE
+    for pos in range(start, end + 1, _TS_PACKET_SIZE):
+        if data[pos] != _TS_SYNC_BYTE:
+            return None                         # lost packet alignment
+        if not data[pos + 1] & 0x40:            # payload_unit_start_indicator
             continue
+        adaptation = (data[pos + 3] >> 4) & 0x3
+        if not adaptation & 0x2:
+            continue
+        af_length = data[pos + 4]
+        if af_length == 0 or not data[pos + 5] & 0x40:
+            continue                            # no random_access_indicator
+        payload = pos + 5 + af_length
+        if (
+            adaptation & 0x1
+            and payload + 4 <= pos + _TS_PACKET_SIZE
+            and data[payload:payload + 3] == b"\x00\x00\x01"
+            and 0xE0 <= data[payload + 3] <= 0xEF
+        ):
+            return pos
+    return None
+
+
+async def _read_first_keyframe(stdout: asyncio.StreamReader, chunk_size: int) -> bytes:
+    """
+    Read a fresh encode's output until its first video keyframe is buffered.
+
+    Reading stops there: ffmpeg then blocks on the full pipe, holding the
+    rest of its first GOP until the generator switches over.
+    """
+    buffer = bytearray()
+    scanned = 0
+    while len(buffer) < _PRESTART_MAX_BUFFER:
+        chunk = await stdout.read(chunk_size)
+        if not chunk:
+            raise EOFError("ffmpeg exited before producing a keyframe")
+        buffer += chunk
+        if _ts_keyframe_offset(buffer, scanned) is not None:
+            break
+        scanned = (len(buffer) // _TS_PACKET_SIZE - 1) * _TS_PACKET_SIZE
+        scanned = max(0, scanned)
+    return bytes(buffer)
+
+
+async def _kill(process) -> None:
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+    await process.wait()
+
+
+@dataclass
+class _Prestarted:
+    """The next entry's encode, already running with its first GOP buffered."""
+
+    playout: Playout
+    process: asyncio.subprocess.Process
+    monitor: FfmpegMonitor
+    head: bytes
+    spawned_at: float
+
+
+class _Lookahead:
+    """
+    Pre-starts the next entry's ffmpeg shortly before the current one ends.
+
+    The timer runs from when the current ffmpeg was started, since that is
+    what its `-re` output is paced against.  take() hands over the result
+    once the current encode has finished; discard() cleans up if it is not
+    needed.
+    """
+
+    def __init__(
+        self,
+        channel_id: int,
+        current: Playout,
+        started_at: float,
+        chunk_size: int,
+        encode: Optional[EncodeSession] = None,
+    ):
+        self.channel_id = channel_id
+        self.current = current
+        self.encode = encode
+        self.started_at = started_at
+        self.chunk_size = chunk_size
+        self.preparing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> Optional[_Prestarted]:
+        entry = self.current.entry
+        remaining = (
+            (entry.end_time - entry.start_time).total_seconds()
+            - self.current.offset_seconds
+        )
+        fire_at = self.started_at + remaining - settings.STREAM_PRESTART_SECONDS
+        await asyncio.sleep(max(0.0, fire_at - time.monotonic()))
+
+        self.preparing = True
+        async with AsyncSessionLocal() as db:
+            next_entry = await _get_next_entry(self.channel_id, entry, db)
+            if next_entry is None:
+                logger.debug(
+                    f"_Lookahead: channel={self.channel_id} nothing follows "
+                    f"'{entry.title}' back-to-back, not pre-starting"
+                )
+                return None
+            playout = await _plan_playout(next_entry, self.channel_id, db, 0)
 
-        audio_idx = await _detect_preferred_audio_index(source)
-        cmd = _build_ffmpeg_cmd(source, offset_seconds, audio_idx)
         logger.debug(
-            f"_continuous_stream_generator: starting ffmpeg for "
-            f"'{entry.title}' (id={entry.id}), offset={offset_seconds}s, "
-            f"audio_stream={audio_idx if audio_idx is not None else 'default'}"
+            f"_Lookahead: channel={self.channel_id} pre-starting {playout.describe()}"
         )
+        process = await asyncio.create_subprocess_exec(
+            *playout.ffmpeg_cmd(), stdout=PIPE, stderr=PIPE
+        )
+        monitor = watch_ffmpeg(
+            process, f"channel={self.channel_id} (pre-start)", self.encode
+        )
+        spawned_at = time.monotonic()
+        try:
+            head = await asyncio.wait_for(
+                _read_first_keyframe(process.stdout, self.chunk_size),
+                timeout=settings.STREAM_PRESTART_SECONDS + _PRESTART_KEYFRAME_GRACE,
+            )
+        except BaseException:
+            await _kill(process)
+            raise
+        return _Prestarted(
+            playout=playout,
+            process=process,
+            monitor=monitor,
+            head=head,
+            spawned_at=spawned_at,
+        )
+
+    async def take(self) -> Optional[_Prestarted]:
+        """
+        Return the pre-started encode, or None if there is none to use.
 
+        If the current encode ended before the look-ahead fired (a short or
+        failed source) there is nothing prepared and the caller falls back
+        to a normal start.
+        """
+        if not self.preparing:
+            await self.discard()
+            return None
         try:
-            process = await asyncio.create_subprocess_exec(
-                *cmd, stdout=PIPE, stderr=PIPE
+            prestarted = await self._task
+        except Exception as exc:
+            logger.warning(
+                f"_Lookahead: channel={self.channel_id} pre-start failed: {exc}"
+            )
+            return None
+        if prestarted is None:
+            return None
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if prestarted.playout.entry.end_time <= now:
+            # The current encode overran so far the next entry is already over
+            await _kill(prestarted.process)
+            return None
+        return prestarted
+
+    async def discard(self) -> None:
+        if not self._task.done():
+            self._task.cancel()
+        try:
+            prestarted = await self._task
+        except BaseException:
+            return
+        if prestarted is not None:
+            await _kill(prestarted.process)
+
+
+@dataclass
+class TransitionStats:
+    """Per-channel record of the output gap at programme changes."""
+
+    transitions: int = 0
+    prestarted: int = 0
+    last_gap_ms: float = 0.0
+    max_gap_ms: float = 0.0
+    total_gap_ms: float = 0.0
+
+    def record(self, gap_seconds: float, prestarted: bool) -> None:
+        gap_ms = gap_seconds * 1000
+        self.transitions += 1
+        self.prestarted += int(prestarted)
+        self.last_gap_ms = gap_ms
+        self.max_gap_ms = max(self.max_gap_ms, gap_ms)
+        self.total_gap_ms += gap_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "transitions": self.transitions,
+            "prestarted": self.prestarted,
+            "last_gap_ms": round(self.last_gap_ms, 1),
+            "max_gap_ms": round(self.max_gap_ms, 1),
+            "avg_gap_ms": (
+                round(self.total_gap_ms / self.transitions, 1)
+                if self.transitions else 0.0
+            ),
+        }
+
+
+# Process-wide transition metrics, keyed by channel id.
+_transition_stats: Dict[int, TransitionStats] = {}
+
+
+def transition_stats() -> Dict[int, dict]:
+    """Snapshot of the transition-gap metrics for every channel streamed so far."""
+    return {cid: stats.as_dict() for cid, stats in _transition_stats.items()}
+
+
+async def _continuous_stream_generator(
+    channel_id: int,
+    chunk_size: int = 65536,
+    encode: Optional[EncodeSession] = None,
+):
+    """
+    Yield MPEG-TS chunks indefinitely, transitioning between schedule entries
+    as each one ends.
+
+    While an entry plays, a _Lookahead pre-starts the following entry's
+    ffmpeg STREAM_PRESTART_SECONDS before the end, so the switch is a buffer
+    handoff.  When there is nothing to hand off (schedule gap, failed
+    pre-start, prestart disabled) the generator looks up the current entry
+    again and starts ffmpeg the slow way.  The time between the
+    last chunk of one entry and the first chunk of the next is recorded in
+    transition_stats(), and on the encode's session telemetry when given.
+
+    Gaps in the schedule are handled by _wait_for_playable, which keeps
+    polling instead of killing the connection.
+    """
+    stats = _transition_stats.setdefault(channel_id, TransitionStats())
+    prestarted: Optional[_Prestarted] = None
+    last_chunk_at: Optional[float] = None
+
+    while True:
+        if prestarted is not None:
+            playout, process, monitor, head = (
+                prestarted.playout,
+                prestarted.process,
+                prestarted.monitor,
+                prestarted.head,
+            )
+            # Its -re clock has been running since it was spawned
+            started_at = prestarted.spawned_at
+            logger.debug(
+                f"_continuous_stream_generator: switching to pre-started "
+                f"{playout.describe()}"
+            )
+        else:
+            playout = await _wait_for_playable(
+                channel_id, "_continuous_stream_generator"
             )
-        except FileNotFoundError:
-            logger.error("_continuous_stream_generator: ffmpeg not found")
-            return  # Cannot recover — end the stream
+            cmd = playout.ffmpeg_cmd()
+            logger.debug(
+                f"_continuous_stream_generator: starting ffmpeg for {playout.describe()}"
+            )
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=PIPE, stderr=PIPE
+                )
+            except FileNotFoundError:
+                logger.error("_continuous_stream_generator: ffmpeg not found")
+                return  # Cannot recover — end the stream
+            monitor = watch_ffmpeg(process, f"channel={channel_id}", encode)
+            head = b""
+            started_at = time.monotonic()
+        entry = playout.entry
+        if encode is not None:
+            encode.set_entry(entry, playout.offset_seconds, playout.mode, process.pid)
+        lookahead = (
+            _Lookahead(channel_id, playout, started_at, chunk_size, encode)
+            if settings.STREAM_PRESTART_SECONDS > 0
+            else None
+        )
+        was_prestarted = prestarted is not None
+        prestarted = None
 
         try:
+            first = True
             while True:
-                chunk = await process.stdout.read(chunk_size)
+                chunk = head or await process.stdout.read(chunk_size)
+                head = b""
                 if not chunk:
                     break
+                if first:
+                    record_source_success(entry)
+                if first and last_chunk_at is not None:
+                    stats.record(time.monotonic() - last_chunk_at, was_prestarted)
+                    if encode is not None:
+                        encode.last_transition_gap_ms = round(stats.last_gap_ms, 1)
+                    logger.debug(
+                        f"_continuous_stream_generator: channel={channel_id} "
+                        f"transition gap {stats.last_gap_ms:.0f} ms"
+                        f"{' (pre-started)' if was_prestarted else ''}"
+                    )
+                first = False
                 yield chunk
+                last_chunk_at = time.monotonic()
+            if lookahead is not None:
+                prestarted = await lookahead.take()
+                lookahead = None
         finally:
-            try:
-                process.kill()
-            except ProcessLookupError:
-                pass
-            await process.wait()
+            if lookahead is not None:
+                await lookahead.discard()
+            await _kill(process)
             logger.info(
                 f"_continuous_stream_generator: channel={channel_id} "
                 f"'{entry.title}' finished, advancing to next entry"
             )
 
-        # Tiny pause to avoid a tight spin if ffmpeg exits instantly (bad source)
-        await asyncio.sleep(0.2)
+        if first:
+            # ffmpeg produced nothing — classify why and back off accordingly
+            error = await monitor.wait()
+            await asyncio.sleep(record_source_failure(
+                channel_id, entry, error, "_continuous_stream_generator"
+            ))
+        elif prestarted is None:
+            # Tiny pause to avoid a tight spin if ffmpeg exits instantly (bad source)
+            await asyncio.sleep(0.2)
 
 
-async def stream_channel(channel_id: int, db: AsyncSession) -> StreamingResponse:
+async def _broadcast_source(channel_id: int):
     """
-    Start a continuous ffmpeg proxy stream for a channel.
+    Producer side of a channel broadcast.
 
-    Verifies that something is scheduled right now (returns 404 otherwise),
-    then returns a StreamingResponse backed by _continuous_stream_generator
-    which automatically transitions to the next entry when the current one ends.
+    Outlives the request that started it — the first viewer may leave while
+    others keep watching — so it only opens short-lived sessions of its own
+    (see _wait_for_playable) and holds none while streaming.  Channels with
+    playout_mode "concat" are fed by one continuous ffmpeg instead of one
+    per programme (see concat_playout); music channels always play per
+    entry.  Every chunk is also appended to the channel's time-shift buffer
+    when TIMESHIFT_MINUTES is set.
+    """
+    encode = open_encode(channel_id, OUTPUT_MPEGTS)
+    buffer = open_timeshift(channel_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Channel.playout_mode, Channel.channel_type)
+                .where(Channel.id == channel_id)
+            )
+            row = result.one_or_none()
+        if (
+            row is not None
+            and row.playout_mode == PLAYOUT_MODE_CONCAT
+            and row.channel_type != CHANNEL_TYPE_MUSIC
+        ):
+            from app.services.concat_playout import concat_stream_generator
+            generator = concat_stream_generator(channel_id, encode=encode)
+        else:
+            generator = _continuous_stream_generator(channel_id, encode=encode)
+        async for chunk in generator:
+            if buffer is not None:
+                buffer.write(chunk)
+            yield chunk
+    finally:
+        if buffer is not None:
+            close_timeshift(buffer)
+        close_encode(encode)
+
+
+async def _timeshift_client(
+    broadcaster: ChannelBroadcaster, buffer: TimeshiftBuffer, at: float
+):
+    """
+    Body of a time-shifted response; keeps the encode alive while it runs.
+
+    The hold is taken inside the try: a body that never starts (the client
+    left before the first chunk) is closed without running its finally, so
+    a hold taken outside it would never be released.
+    """
+    try:
+        broadcaster.hold()
+        async for chunk in buffer.read_from(at):
+            yield chunk
+    finally:
+        broadcaster.release()
+
+
+async def stream_channel(
+    channel_id: int,
+    client: Optional[str] = None,
+    rewind_seconds: Optional[int] = None,
+    restart: bool = False,
+) -> BroadcastResponse:
+    """
+    Attach a viewer to the channel's shared ffmpeg broadcast.
+
+    Verifies that something is scheduled right now, or that a filler clip
+    can cover the gap (returns 404 otherwise), then subscribes the client to
+    the channel's ChannelBroadcaster.  The first viewer starts the encode
+    (_continuous_stream_generator, which transitions between entries
+    automatically); later viewers share it, and the encode stops when the
+    last viewer disconnects.  Starting a new encode is subject to the
+    transcode budget (503 + Retry-After when it is exhausted).
+
+    `client` ("host:port") is recorded on the viewer's session for
+    /api/livetv/sessions.
+
+    `rewind_seconds` (or `restart`, which rewinds to the start of the current
+    programme) serves the viewer from the channel's time-shift buffer instead,
+    clamped to what the buffer still holds.  Without a running buffer the
+    request falls back to the live stream.
+
+    A time-shifted channel is served from its parent's buffer when the parent
+    is being broadcast and the buffer reaches back by the channel's offset;
+    otherwise it runs its own encode of the shifted schedule.
     """
     logger.info(f"stream_channel: channel_id={channel_id}")
 
-    # Initial check — return 404 if nothing is playing so clients don't hang
-    entry = await get_current_entry(channel_id, db)
+    # Initial check — return 404 if nothing is playing (not even filler) so
+    # clients don't hang.  The session is closed before streaming starts; the
+    # encode opens its own.
+    async with AsyncSessionLocal() as db:
+        entry = await get_airing_entry(channel_id, db)
+        source = await timeline.source_for(channel_id, db)
     if not entry:
         logger.warning(f"stream_channel: nothing playing on channel {channel_id}")
         raise HTTPException(
@@ -311,14 +1593,58 @@ async def stream_channel(channel_id: int, db: AsyncSession) -> StreamingResponse
 
     now = datetime.now(timezone.utc).replace(tzinfo=None)
     offset_seconds = max(0, int((now - entry.start_time).total_seconds()))
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Channel-Id": str(channel_id),
+        "X-Entry-Title": entry.title.encode("ascii", errors="replace").decode("ascii"),
+        "X-Offset-Seconds": str(offset_seconds),
+    }
+
+    # Whose buffer could serve this viewer, and how far behind its live edge
+    owner, delay = source.schedule_channel_id, source.offset.total_seconds()
+    if source.shifted and channel_id in active_broadcasters():
+        owner, delay = channel_id, 0        # already running its own encode
+    rewind = offset_seconds if restart else (rewind_seconds or 0)
+    buffer = get_timeshift(owner)
+    broadcaster = active_broadcasters().get(owner)
+    wall_now = time.time()
+    if (
+        delay + rewind > 0
+        and buffer is not None
+        and broadcaster is not None
+        and buffer.oldest is not None
+        and buffer.oldest <= wall_now - delay
+    ):
+        at = max(wall_now - delay - rewind, buffer.oldest)
+        logger.info(
+            f"stream_channel: channel_id={channel_id} served from channel "
+            f"{owner}'s time-shift buffer, {int(wall_now - at)}s behind"
+        )
+        if rewind:
+            headers["X-Rewind-Seconds"] = str(int(wall_now - delay - at))
+        return BroadcastResponse(
+            _timeshift_client(broadcaster, buffer, at),
+            viewer=open_viewer(channel_id, client),
+            media_type=_MEDIA_TYPE,
+            headers=headers,
+        )
+    if rewind:
+        logger.info(
+            f"stream_channel: channel_id={channel_id} has no time-shift buffer, "
+            f"serving live"
+        )
+
+    # No await between the budget check and registering the broadcaster
+    if channel_id not in active_broadcasters():
+        admit_encode(channel_id, OUTPUT_MPEGTS)
+    broadcaster = get_broadcaster(
+        channel_id, lambda: _broadcast_source(channel_id)
+    )
+    queue = broadcaster.subscribe()
 
-    return StreamingResponse(
-        _continuous_stream_generator(channel_id, db),
+    return BroadcastResponse(
+        broadcaster.iter_client(queue),
+        viewer=open_viewer(channel_id, client),
         media_type=_MEDIA_TYPE,
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Channel-Id": str(channel_id),
-            "X-Entry-Title": entry.title.encode("ascii", errors="replace").decode("ascii"),
-            "X-Offset-Seconds": str(offset_seconds),
-        },
+        headers=headers,
     )
@@ -0,0 +1,209 @@
+"""In-memory schedule timeline per channel.
+
+The streaming path, now-playing and the HEAD probe all ask the same two
+questions — what is on a channel at time t, and what comes next — many
+times a minute.  Answering them from SQLite means a query (and a pooled
+connection) each time.  Instead each channel's upcoming entries are kept in
+memory as a sorted array of start times next to the entries themselves, and
+looked up with bisect:
+
+- a channel's timeline is loaded on first use, covering every entry that
+  ends after _HISTORY before now (so time-shifted siblings can look back);
+- the API and the schedule generator call invalidate() whenever they add,
+  change or delete entries or channels, so the next lookup reloads;
+- a timeline older than _MAX_AGE is reloaded anyway, in case the database
+  was changed behind the app's back.
+
+The same invalidate() calls drive version(), which other caches of
+schedule-derived data (the rendered EPG) use as their key, and trigger a
+rewrite of the static EPG files.
+
+The cached entries are transient copies that are never attached to a
+session, so callers can read them freely but must not modify them.
+Lookups take a session only for the (rare) reload.
+"""
+
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging_config import get_logger
+from app.models.schedule_entry import ScheduleEntry
+from app.services.shifted_channels import ScheduleSource, copy_entry, schedule_source
+
+logger = get_logger(__name__)
+
+# How far back a timeline reaches when loaded (shifted channels look back by
+# their offset; older lookups trigger a reload that reaches further)
+_HISTORY = timedelta(days=1)
+
+# Reload a timeline at least this often (seconds) even without invalidation
+_MAX_AGE = 300.0
+
+
+class ChannelTimeline:
+    """One channel's schedule rows, sorted by start time."""
+
+    def __init__(self, entries: List[ScheduleEntry], loaded_from: datetime):
+        self.entries = entries
+        self.starts = [e.start_time for e in entries]
+        self.loaded_from = loaded_from
+        self.loaded_at = time.monotonic()
+        # Nothing starting earlier than this before `when` can still be airing
+        self.longest = max(
+            (e.end_time - e.start_time for e in entries), default=timedelta(0)
+        )
+
+    def at(self, when: datetime) -> Optional[ScheduleEntry]:
+        """The entry airing at `when` (the earliest-starting one if they overlap)."""
+        found = None
+        for i in range(bisect_right(self.starts, when) - 1, -1, -1):
+            entry = self.entries[i]
+            if entry.start_time < when - self.longest:
+                break
+            if entry.end_time > when:
+                found = entry
+        return found
+
+    def starting_between(
+        self, lo: datetime, hi: datetime, exclude_id: Optional[int] = None
+    ) -> Optional[ScheduleEntry]:
+        """The first entry starting within [lo, hi], skipping `exclude_id`."""
+        for entry in self.entries[bisect_left(self.starts, lo):bisect_right(self.starts, hi)]:
+            if exclude_id is None or entry.id != exclude_id:
+                return entry
+        return None
+
+    def next_start(self, after: datetime) -> Optional[datetime]:
+        """Start time of the first entry starting strictly after `after`."""
+        i = bisect_right(self.starts, after)
+        return self.starts[i] if i < len(self.starts) else None
+
+
+# schedule channel id → timeline
+_timelines: Dict[int, ChannelTimeline] = {}
+# channel id → ScheduleSource (whose rows it plays)
+_sources: Dict[int, ScheduleSource] = {}
+# Bumped by invalidate(); a load that raced an invalidation is not kept
+_generation = 0
+# Generation of the last invalidate() of every channel, and of each channel's
+# own last invalidate() — together they version the schedule (see version())
+_epoch = 0
+_versions: Dict[int, int] = {}
+
+
+def invalidate(channel_id: Optional[int] = None) -> None:
+    """
+    Drop cached schedule data for one channel (its own rows and its
+    ScheduleSource), or for every channel when channel_id is None.
+    """
+    global _generation, _epoch
+    _generation += 1
+    if channel_id is None:
+        _epoch = _generation
+        _timelines.clear()
+        _sources.clear()
+        _versions.clear()
+    else:
+        _versions[channel_id] = _generation
+        _timelines.pop(channel_id, None)
+        _sources.pop(channel_id, None)
+    logger.debug(f"invalidate: channel={channel_id if channel_id is not None else 'all'}")
+
+    from app.services.static_epg import request_write
+    request_write()
+
+
+def version(channel_id: Optional[int] = None) -> int:
+    """
+    Schedule version counter: changes whenever the channel's rows or settings
+    may have changed, or — with channel_id None — whenever any channel's did.
+    """
+    if channel_id is None:
+        return _generation
+    return max(_epoch, _versions.get(channel_id, 0))
+
+
+async def _timeline(
+    schedule_channel_id: int, when: datetime, db: AsyncSession
+) -> ChannelTimeline:
+    """The channel's timeline, (re)loaded if missing, stale or too short."""
+    timeline = _timelines.get(schedule_channel_id)
+    if (
+        timeline is not None
+        and timeline.loaded_from <= when
+        and time.monotonic() - timeline.loaded_at < _MAX_AGE
+    ):
+        return timeline
+
+    generation = _generation
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    loaded_from = min(when, now) - _HISTORY
+    result = await db.execute(
+        select(ScheduleEntry)
+        .where(
+            ScheduleEntry.channel_id == schedule_channel_id,
+            ScheduleEntry.end_time > loaded_from,
+        )
+        .order_by(ScheduleEntry.start_time)
+    )
+    timeline = ChannelTimeline(
+        [copy_entry(e) for e in result.scalars().all()], loaded_from
+    )
+    if generation == _generation:
+        _timelines[schedule_channel_id] = timeline
+    logger.debug(
+        f"_timeline: channel={schedule_channel_id} loaded "
+        f"{len(timeline.entries)} entries"
+    )
+    return timeline
+
+
+async def source_for(channel_id: int, db: AsyncSession) -> ScheduleSource:
+    """Cached schedule_source()."""
+    source = _sources.get(channel_id)
+    if source is None:
+        generation = _generation
+        source = await schedule_source(channel_id, db)
+        if generation == _generation:
+            _sources[channel_id] = source
+    return source
+
+
+async def entry_at(
+    channel_id: int, when: datetime, db: AsyncSession
+) -> Optional[ScheduleEntry]:
+    """The entry airing on the channel at `when`, moved to its clock if shifted."""
+    source = await source_for(channel_id, db)
+    parent_when = when - source.offset
+    entry = (await _timeline(source.schedule_channel_id, parent_when, db)).at(parent_when)
+    return source.shift(entry) if entry else None
+
+
+async def entry_starting_between(
+    channel_id: int,
+    lo: datetime,
+    hi: datetime,
+    db: AsyncSession,
+    exclude_id: Optional[int] = None,
+) -> Optional[ScheduleEntry]:
+    """The first entry starting within [lo, hi] on the channel's clock."""
+    source = await source_for(channel_id, db)
+    timeline = await _timeline(source.schedule_channel_id, lo - source.offset, db)
+    entry = timeline.starting_between(lo - source.offset, hi - source.offset, exclude_id)
+    return source.shift(entry) if entry else None
+
+
+async def next_start(
+    channel_id: int, after: datetime, db: AsyncSession
+) -> Optional[datetime]:
+    """When the next entry after `after` starts, on the channel's clock."""
+    source = await source_for(channel_id, db)
+    timeline = await _timeline(source.schedule_channel_id, after - source.offset, db)
+    start = timeline.next_start(after - source.offset)
+    return start + source.offset if start is not None else None
+
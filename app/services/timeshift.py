@@ -0,0 +1,364 @@
+"""Time-shift buffer — the last TIMESHIFT_MINUTES of each broadcast on disk.
+
+While a channel's MPEG-TS broadcast runs, every chunk it produces is also
+appended to a ring of short segment files under TIMESHIFT_DIR/<channel_id>/.
+Segments older than the window are deleted as new ones are started.
+
+A viewer who asks for `?rewind=N` (or `?restart=true`) is served from that
+ring instead of the live queue: playback starts at the first video keyframe
+after the requested point and then follows the files, paced to the
+checkpoint times they were recorded at so the viewer stays N behind.
+That is a plain file read — no second seek-and-transcode — and the viewer
+keeps the channel's encode alive like any other.
+
+The buffer only exists while the channel is being broadcast; it is removed
+when the encode stops.
+
+A slow disk must not stall the broadcast, so write() only queues the chunk:
+a writer task per buffer does the file writes, segment rotation and the
+final removal in a worker thread, and readers open and read the files
+there too.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+_SEGMENT_NAME = "seg_{:06d}.ts"
+
+# Length of one ring segment (seconds); the window is trimmed segment-wise
+_SEGMENT_SECONDS = 10
+
+# Spacing of the time → byte offset checkpoints within a segment (seconds)
+_CHECKPOINT_SECONDS = 1.0
+
+_READ_SIZE = 65536
+
+# Chunks queued for the writer; beyond this the disk cannot keep up and new
+# chunks are dropped from the buffer (the live broadcast is unaffected)
+_MAX_PENDING_CHUNKS = 256
+
+# Keep references so writer tasks outlive the buffers that started them
+_writers: Set[asyncio.Task] = set()
+
+# Give up looking for a keyframe after this much data and start at a packet
+_KEYFRAME_SEARCH_LIMIT = 8 * 1024 * 1024
+_TS_PACKET_SIZE = 188
+_TS_SYNC_BYTE = 0x47
+
+
+@dataclass
+class _Segment:
+    number: int
+    path: str
+    started_at: float                       # wall-clock time of its first byte
+    size: int = 0
+    checkpoints: List[Tuple[float, int]] = field(default_factory=list)
+
+    def written_at(self, offset: int) -> float:
+        """When the byte at `offset` was written (to checkpoint precision)."""
+        when = self.started_at
+        for t, pos in self.checkpoints:
+            if pos > offset:
+                break
+            when = t
+        return when
+
+    def next_checkpoint(self, offset: int) -> Optional[int]:
+        """Byte offset of the first checkpoint after `offset`, if any yet."""
+        for _, pos in self.checkpoints:
+            if pos > offset:
+                return pos
+        return None
+
+
+def _resync(data, start: int = 0) -> Optional[int]:
+    """Offset of the first position from `start` where TS packets line up."""
+    for pos in range(start, len(data) - 2 * _TS_PACKET_SIZE):
+        if (
+            data[pos] == _TS_SYNC_BYTE
+            and data[pos + _TS_PACKET_SIZE] == _TS_SYNC_BYTE
+            and data[pos + 2 * _TS_PACKET_SIZE] == _TS_SYNC_BYTE
+        ):
+            return pos
+    return None
+
+
+def _open_at(path: str, offset: int):
+    f = open(path, "rb")
+    f.seek(offset)
+    return f
+
+
+def _find_keyframe(data) -> Optional[int]:
+    """
+    Offset of the first video keyframe packet in arbitrary TS bytes.
+
+    Chunk boundaries in the ring are not packet-aligned and programme changes
+    restart the packet grid, so alignment is re-established whenever the scan
+    loses it.
+    """
+    from app.services.stream_proxy import _ts_keyframe_offset
+
+    pos = _resync(data)
+    while pos is not None:
+        found = _ts_keyframe_offset(data, pos)
+        if found is not None:
+            return found
+        # Either no keyframe in this aligned run or alignment was lost —
+        # find where the run broke and resync inside its last packet, which
+        # may have been cut short.
+        end = pos
+        while end + _TS_PACKET_SIZE <= len(data) and data[end] == _TS_SYNC_BYTE:
+            end += _TS_PACKET_SIZE
+        if end + _TS_PACKET_SIZE > len(data):
+            return None
+        pos = _resync(data, end - _TS_PACKET_SIZE + 1)
+    return None
+
+
+class TimeshiftBuffer:
+    """The on-disk ring for one channel broadcast."""
+
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.directory = os.path.join(settings.TIMESHIFT_DIR, str(channel_id))
+        self.window = settings.TIMESHIFT_MINUTES * 60
+        self.closed = False
+        self._segments: Deque[_Segment] = deque()
+        self._file = None               # only touched by the writer's thread
+        self._next_number = 0
+        self._written = asyncio.Event()
+        # (wall-clock time, chunk); None asks the writer to finish
+        self._queue: "asyncio.Queue[Optional[Tuple[float, bytes]]]" = asyncio.Queue()
+        self._dropping = False
+        self._writer = asyncio.create_task(self._run_writer())
+        _writers.add(self._writer)
+        self._writer.add_done_callback(_writers.discard)
+
+    @property
+    def oldest(self) -> Optional[float]:
+        """Wall-clock time of the oldest buffered byte."""
+        return self._segments[0].started_at if self._segments else None
+
+    def write(self, chunk: bytes) -> None:
+        """Queue a broadcast chunk for the writer; never blocks."""
+        if self.closed:
+            return
+        if self._queue.qsize() >= _MAX_PENDING_CHUNKS:
+            if not self._dropping:
+                logger.warning(
+                    f"TimeshiftBuffer: channel={self.channel_id} disk is falling "
+                    f"behind, dropping chunks from the buffer"
+                )
+            self._dropping = True
+            return
+        self._dropping = False
+        self._queue.put_nowait((time.time(), chunk))
+
+    def close(self) -> None:
+        """Stop buffering; the writer removes the files once it has finished."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put_nowait(None)
+        self._written.set()
+
+    async def drain(self) -> None:
+        """Wait until every queued chunk (and a pending close) has been handled."""
+        await self._queue.join()
+
+    async def _run_writer(self) -> None:
+        await asyncio.to_thread(self._reset_directory)
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None:
+                    await asyncio.to_thread(self._remove_files)
+                    logger.info(
+                        f"TimeshiftBuffer: channel={self.channel_id} buffer removed"
+                    )
+                    return
+                if not self.closed:
+                    await self._append(*item)
+            except OSError as exc:
+                logger.error(
+                    f"TimeshiftBuffer: channel={self.channel_id} write failed: {exc}"
+                )
+            finally:
+                self._queue.task_done()
+
+    async def _append(self, now: float, chunk: bytes) -> None:
+        current = self._segments[-1] if self._segments else None
+        expired: List[str] = []
+        new_path = None
+        if current is None or now - current.started_at >= _SEGMENT_SECONDS:
+            number = self._next_number
+            self._next_number += 1
+            new_path = os.path.join(self.directory, _SEGMENT_NAME.format(number))
+            current = _Segment(number, new_path, now)
+            # Keep whole segments covering the window; drop anything older.
+            # They leave the list before their files go, so no reader
+            # starts on a file that is about to be removed.
+            while (
+                len(self._segments) > 1
+                and self._segments[1].started_at <= now - self.window
+            ):
+                expired.append(self._segments.popleft().path)
+        await asyncio.to_thread(self._write_file, new_path, expired, chunk)
+        if new_path is not None:
+            # Listed only once its file exists
+            self._segments.append(current)
+        if not current.checkpoints or now - current.checkpoints[-1][0] >= _CHECKPOINT_SECONDS:
+            current.checkpoints.append((now, current.size))
+        current.size += len(chunk)
+        # Wake readers waiting at the live edge
+        self._written.set()
+        self._written = asyncio.Event()
+
+    # ── worker thread ────────────────────────────────────────────────────────
+
+    def _reset_directory(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _write_file(self, new_path: Optional[str], expired: List[str], chunk: bytes) -> None:
+        if new_path is not None:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(new_path, "wb")
+        for path in expired:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._file.write(chunk)
+        self._file.flush()
+
+    def _remove_files(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ── readers ──────────────────────────────────────────────────────────────
+
+    def _locate(self, at: float) -> Tuple[int, int]:
+        """(segment number, byte offset) of the checkpoint at or before `at`."""
+        for segment in reversed(self._segments):
+            if segment.started_at <= at:
+                offset = 0
+                for when, pos in segment.checkpoints:
+                    if when > at:
+                        break
+                    offset = pos
+                return segment.number, offset
+        first = self._segments[0]
+        return first.number, 0
+
+    def _segment(self, number: int) -> Optional[_Segment]:
+        for segment in self._segments:
+            if segment.number == number:
+                return segment
+        return None
+
+    async def read_from(self, at: float) -> AsyncIterator[bytes]:
+        """
+        Yield the broadcast from wall-clock time `at` onwards, starting at a
+        keyframe, then follow the live edge until the buffer is closed.
+
+        Data is released at the pace it was recorded, so the viewer stays as
+        far behind the broadcast as they started instead of catching up to
+        the live edge as fast as they can read.
+        """
+        while not self._segments:
+            # Nothing written yet
+            if self.closed:
+                return
+            await self._written.wait()
+        delay = max(0.0, time.time() - max(at, self.oldest or at))
+        number, offset = self._locate(at)
+        head = bytearray()              # bytes before the first keyframe is found
+        while not self.closed:
+            segment = self._segment(number)
+            if segment is None:
+                if not self._segments or number > self._segments[-1].number:
+                    return
+                # The reader fell out of the window — skip to the oldest segment
+                number, offset = self._segments[0].number, 0
+                continue
+            try:
+                f = await asyncio.to_thread(_open_at, segment.path, offset)
+            except FileNotFoundError:
+                number, offset = number + 1, 0
+                continue
+            with f:
+                while True:
+                    # Hold each checkpoint's data back until `delay` after it
+                    # was written; reads stop at the next checkpoint
+                    due = segment.written_at(offset) + delay
+                    while (wait := due - time.time()) > 0:
+                        if self.closed:
+                            return
+                        await asyncio.sleep(min(wait, 0.5))
+                    # Only bytes the writer has accounted for (the file may
+                    # already hold part of a chunk still being written)
+                    limit = segment.next_checkpoint(offset) or segment.size
+                    size = min(_READ_SIZE, limit - offset)
+                    data = await asyncio.to_thread(f.read, size) if size > 0 else b""
+                    if data:
+                        offset += len(data)
+                        if head is not None:
+                            head += data
+                            start = _find_keyframe(head)
+                            if start is None and len(head) > _KEYFRAME_SEARCH_LIMIT:
+                                start = _resync(head) or 0
+                            if start is None:
+                                continue
+                            data, head = bytes(head[start:]), None
+                        yield data
+                        continue
+                    if segment is not self._segments[-1] or self.closed:
+                        break           # segment complete — move to the next
+                    try:
+                        await asyncio.wait_for(self._written.wait(), timeout=5)
+                    except asyncio.TimeoutError:
+                        pass
+            number, offset = number + 1, 0
+
+
+# Process-wide registry: one buffer per channel being broadcast
+_buffers: Dict[int, TimeshiftBuffer] = {}
+
+
+def open_timeshift(channel_id: int) -> Optional[TimeshiftBuffer]:
+    """Start a channel's buffer; None when TIMESHIFT_MINUTES is 0."""
+    if settings.TIMESHIFT_MINUTES <= 0:
+        return None
+    buffer = TimeshiftBuffer(channel_id)
+    _buffers[channel_id] = buffer
+    logger.info(
+        f"open_timeshift: channel={channel_id} buffering last "
+        f"{settings.TIMESHIFT_MINUTES} min"
+    )
+    return buffer
+
+
+def close_timeshift(buffer: TimeshiftBuffer) -> None:
+    if _buffers.get(buffer.channel_id) is buffer:
+        del _buffers[buffer.channel_id]
+    buffer.close()
+
+
+def get_timeshift(channel_id: int) -> Optional[TimeshiftBuffer]:
+    """The channel's buffer, or None if it is not being broadcast (or buffered)."""
+    return _buffers.get(channel_id)
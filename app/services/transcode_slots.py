@@ -0,0 +1,101 @@
+"""Transcode admission control — a process-wide budget for channel encodes.
+
+Every channel being streamed holds one encode slot for as long as its
+MPEG-TS broadcast or HLS encode runs, however many viewers share it.  A
+tune-in that would start a new encode is refused with 503 + Retry-After
+when either limit is reached:
+
+- MAX_CONCURRENT_ENCODES — number of encodes running at once
+- MAX_LOAD_PER_CPU       — 1-minute load average divided by the CPU count
+
+Viewers joining a channel that is already encoding are always admitted;
+they cost no extra ffmpeg.  The slots are derived from the broadcaster and
+HLS registries rather than counted separately, so they can never leak.
+"""
+
+import os
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+from app.services.broadcaster import active_broadcasters
+from app.services.sessions import OUTPUT_HLS, OUTPUT_MPEGTS
+
+logger = get_logger(__name__)
+
+
+def encode_sessions() -> List[dict]:
+    """Every running channel encode, MPEG-TS broadcasts first."""
+    from app.services.hls import active_hls_channels
+
+    now = time.monotonic()
+    sessions = [
+        {
+            "channel_id": channel_id,
+            "output": OUTPUT_MPEGTS,
+            "viewers": broadcaster.viewer_count,
+            "uptime_seconds": int(now - broadcaster.started_at),
+        }
+        for channel_id, broadcaster in active_broadcasters().items()
+    ]
+    sessions += [
+        {
+            "channel_id": channel_id,
+            "output": OUTPUT_HLS,
+            "viewers": None,            # HLS clients are not tracked individually
+            "uptime_seconds": int(now - hls.started_at),
+        }
+        for channel_id, hls in active_hls_channels().items()
+    ]
+    return sessions
+
+
+def load_per_cpu() -> Optional[float]:
+    """1-minute load average divided by the CPU count; None where unavailable."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None                     # not available on this platform
+
+
+def slot_status() -> dict:
+    """Live view of the encode budget for /api/livetv/slots."""
+    sessions = encode_sessions()
+    load = load_per_cpu()
+    return {
+        "max_encodes": settings.MAX_CONCURRENT_ENCODES or None,
+        "in_use": len(sessions),
+        "max_load_per_cpu": settings.MAX_LOAD_PER_CPU or None,
+        "load_per_cpu": round(load, 2) if load is not None else None,
+        "sessions": sessions,
+    }
+
+
+def admit_encode(channel_id: int, output: str) -> None:
+    """
+    Raise 503 (with Retry-After) if starting a new encode would exceed the
+    budget.  Call synchronously right before the encode is registered, so
+    no other tune-in can slip in between the check and the start.
+    """
+    in_use = len(encode_sessions())
+    reason = None
+    if settings.MAX_CONCURRENT_ENCODES and in_use >= settings.MAX_CONCURRENT_ENCODES:
+        reason = f"all {settings.MAX_CONCURRENT_ENCODES} encode slots in use"
+    elif settings.MAX_LOAD_PER_CPU:
+        load = load_per_cpu()
+        if load is not None and load >= settings.MAX_LOAD_PER_CPU:
+            reason = f"CPU load {load:.2f}/core over budget"
+
+    if reason is None:
+        return
+    logger.warning(
+        f"admit_encode: refusing {output} encode for channel {channel_id}: {reason}"
+    )
+    raise HTTPException(
+        status_code=503,
+        detail=f"Transcoder busy: {reason}",
+        headers={"Retry-After": str(settings.ENCODE_RETRY_AFTER)},
+    )
@@ -0,0 +1,172 @@
+"""XMLTV formatting.
+
+Renders the <channel> and <programme> elements of the EPG (epg_cache puts
+them together into documents):
+
+- all programmes come from one query over the window, ordered by
+  (channel, start) and read in batches of _FETCH_BATCH rows;
+- time-shifted channels have no rows of their own, so each row of a parent
+  channel is also written, moved by the offset, for every shifted sibling
+  being listed (see shifted_channels);
+- back-to-back programmes share their boundary timestamps, so formatted
+  times are cached.
+"""
+
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.channel import Channel
+from app.models.schedule_entry import ScheduleEntry
+from app.services.shifted_channels import ScheduleSource
+
+_FETCH_BATCH = 500
+
+
+def xml_escape(text: str) -> str:
+    """Minimal XML character escaping."""
+    return (
+        text
+        .replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+    )
+
+
+@lru_cache(maxsize=4096)
+def _xmltv_time(dt: datetime) -> str:
+    return dt.strftime("%Y%m%d%H%M%S +0000")
+
+
+def xmltv_header() -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE tv SYSTEM "xmltv.dtd">\n'
+        '<tv generator-info-name="JellyStream">\n'
+    )
+
+
+def xmltv_channel(channel: Channel) -> str:
+    return (
+        f'  <channel id="{channel.id}">\n'
+        f'    <display-name>{channel.name}</display-name>\n'
+        f'  </channel>\n'
+    )
+
+
+def xmltv_programme(
+    entry: ScheduleEntry,
+    base_url: str,
+    channel_id: Optional[int] = None,
+    offset: timedelta = timedelta(0),
+) -> str:
+    """
+    One <programme> element.  channel_id and offset list a parent's entry on
+    a time-shifted sibling without copying the row.
+    """
+    start = _xmltv_time(entry.start_time + offset)
+    stop = _xmltv_time(entry.end_time + offset)
+
+    if entry.series_name:
+        # Episode: show series name as title, episode title as sub-title
+        main_title = xml_escape(entry.series_name)
+        sub_title = xml_escape(entry.title)
+    else:
+        # Movie: just use the title, no sub-title
+        main_title = xml_escape(entry.title)
+        sub_title = None
+
+    parts = [
+        f'  <programme channel="{channel_id or entry.channel_id}" '
+        f'start="{start}" stop="{stop}">\n'
+        f'    <title>{main_title}</title>\n'
+    ]
+
+    if sub_title:
+        parts.append(f'    <sub-title>{sub_title}</sub-title>\n')
+
+    if entry.description:
+        parts.append(f'    <desc lang="en">{xml_escape(entry.description)}</desc>\n')
+
+    # Thumbnail icon served via JellyStream's thumbnail endpoint
+    if entry.thumbnail_path:
+        parts.append(f'    <icon src="{base_url}/api/livetv/thumbnail/{entry.id}"/>\n')
+
+    if entry.air_date:
+        # XMLTV <date> wants YYYYMMDD; strip any "-" separators
+        parts.append(f'    <date>{entry.air_date.replace("-", "")}</date>\n')
+
+    if entry.season_number and entry.episode_number:
+        # XMLTV uses 0-based season/episode numbers
+        parts.append(
+            f'    <episode-num system="xmltv_ns">'
+            f'{entry.season_number - 1}.{entry.episode_number - 1}.'
+            f'</episode-num>\n'
+        )
+
+    # item_type as primary category, then genres
+    parts.append(f'    <category>{xml_escape(entry.item_type)}</category>\n')
+    if entry.genres:
+        try:
+            for g in json.loads(entry.genres):
+                parts.append(f'    <category>{xml_escape(g)}</category>\n')
+        except (json.JSONDecodeError, TypeError):
+            pass
+
+    if entry.content_rating:
+        parts.append(
+            f'    <rating system="MPAA">'
+            f'<value>{xml_escape(entry.content_rating)}</value>'
+            f'</rating>\n'
+        )
+
+    parts.append('  </programme>\n')
+    return "".join(parts)
+
+
+async def iter_programmes(
+    channels: Sequence[Channel],
+    window_start: datetime,
+    window_end: datetime,
+    db: AsyncSession,
+    base_url: str,
+) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Yield (channel id, <programme> element) for every programme overlapping
+    [window_start, window_end) on each of `channels`, on its own clock.
+    Programmes come grouped by the channel that owns the schedule rows.
+    """
+    # schedule channel id → the listed channels that play its rows
+    listeners: Dict[int, List[ScheduleSource]] = {}
+    for ch in channels:
+        source = ScheduleSource.for_channel(ch)
+        listeners.setdefault(source.schedule_channel_id, []).append(source)
+    if not listeners:
+        return
+    max_offset = max(s.offset for group in listeners.values() for s in group)
+
+    # Shifted siblings show rows up to max_offset older than the window
+    result = await db.stream_scalars(
+        select(ScheduleEntry)
+        .where(
+            ScheduleEntry.channel_id.in_(listeners),
+            ScheduleEntry.end_time > window_start - max_offset,
+            ScheduleEntry.start_time < window_end,
+        )
+        .order_by(ScheduleEntry.channel_id, ScheduleEntry.start_time)
+        .execution_options(yield_per=_FETCH_BATCH)
+    )
+    async for entry in result:
+        for source in listeners[entry.channel_id]:
+            if (
+                entry.end_time + source.offset > window_start
+                and entry.start_time + source.offset < window_end
+            ):
+                yield source.channel_id, xmltv_programme(
+                    entry, base_url, source.channel_id, source.offset
+                )
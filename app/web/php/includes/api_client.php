@@ -310,4 +310,22 @@ class ApiClient {
     public function importBoxset($boxset_id) {
         return $this->post("/collections/import/{$boxset_id}");
     }
+
+    // ── Transcode profiles ─────────────────────────────────────────────────
+
+    public function getTranscodeProfiles() {
+        return $this->get('/transcode-profiles/');
+    }
+
+    public function createTranscodeProfile($data) {
+        return $this->post('/transcode-profiles/', $data);
+    }
+
+    public function updateTranscodeProfile($id, $data) {
+        return $this->put("/transcode-profiles/{$id}", $data);
+    }
+
+    public function deleteTranscodeProfile($id) {
+        return $this->delete("/transcode-profiles/{$id}");
+    }
 }
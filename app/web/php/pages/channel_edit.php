@@ -24,6 +24,19 @@ $jf_libraries = ($lib_resp['success'] && isset($lib_resp['data']['libraries']))
     ? $lib_resp['data']['libraries']
     : [];
 
+// Load transcode profiles for the profile picker
+$tp_resp = $api->getTranscodeProfiles();
+$transcode_profiles = ($tp_resp['success'] && is_array($tp_resp['data'])) ? $tp_resp['data'] : [];
+$current_profile_id = $channel['transcode_profile_id'] ?? null;
+
+// Other non-shifted channels, for the parent picker of a time-shifted channel
+$ch_resp = $api->getChannels();
+$parent_channels = array_filter(
+    ($ch_resp['success'] && is_array($ch_resp['data'])) ? $ch_resp['data'] : [],
+    fn($c) => $c['id'] !== $channel_id && $c['schedule_type'] !== 'shifted'
+);
+$current_parent_id = $channel['parent_channel_id'] ?? null;
+
 // Pre-fill JellyStream public URL from health endpoint (JELLYSTREAM_PUBLIC_URL setting)
 // Falls back to the browser hostname if not configured.
 $health_resp = $api->healthCheck();
@@ -103,6 +116,7 @@ $public_url_is_local = in_array(
         .status-err { background: #7f0000; color: #ef9a9a; }
         .hint { font-size: 12px; color: #666; margin-top: 4px; }
         #genre-section { display: none; }
+        #shift-section { display: none; }
 
         @media(max-width:640px) {
             /* Collapse the 2-col tuner/bitrate grid */
@@ -162,11 +176,11 @@ $public_url_is_local = in_array(
                 <option value="video" <?php echo (!$is_edit || ($channel['channel_type'] ?? 'video') === 'video') ? 'selected' : ''; ?>>
                     Video (Movies &amp; TV Shows)
                 </option>
-                <option value="music" disabled <?php echo ($is_edit && ($channel['channel_type'] ?? '') === 'music') ? 'selected' : ''; ?>>
-                    Music (coming soon)
+                <option value="music" <?php echo ($is_edit && ($channel['channel_type'] ?? '') === 'music') ? 'selected' : ''; ?>>
+                    Music
                 </option>
             </select>
-            <div class="hint">Video channels pull from Movies and TV Shows libraries.</div>
+            <div class="hint">Video channels pull from Movies and TV Shows libraries; music channels play tracks from Music libraries over their album art.</div>
         </div>
 
         <!-- Schedule Type -->
@@ -180,9 +194,97 @@ $public_url_is_local = in_array(
                 <option value="manual" <?php echo ($is_edit && ($channel['schedule_type'] ?? '') === 'manual') ? 'selected' : ''; ?>>
                     Manual (schedule entries via API)
                 </option>
+                <option value="shifted" <?php echo ($is_edit && ($channel['schedule_type'] ?? '') === 'shifted') ? 'selected' : ''; ?>>
+                    Time-shifted (another channel, later)
+                </option>
             </select>
             <div class="hint">Auto mode generates a 7-day schedule from genre-matching items and keeps it topped up daily.</div>
         </div>
+        <div id="shift-section">
+            <div class="form-group">
+                <label>Parent channel</label>
+                <select id="ch-parent">
+                    <?php foreach ($parent_channels as $pc): ?>
+                    <option value="<?php echo (int)$pc['id']; ?>" <?php echo ((int)$current_parent_id === (int)$pc['id']) ? 'selected' : ''; ?>>
+                        <?php echo htmlspecialchars($pc['name']); ?>
+                    </option>
+                    <?php endforeach; ?>
+                </select>
+            </div>
+            <div class="form-group">
+                <label>Delay (minutes)</label>
+                <input type="number" id="ch-time-offset" min="1" value="<?php echo (int)($channel['time_offset_minutes'] ?? 60) ?: 60; ?>">
+                <div class="hint">Plays the parent's schedule this much later, e.g. 60 for a "+1" channel. No schedule is stored for this channel, and it is served from the parent's time-shift buffer when that covers the delay.</div>
+            </div>
+        </div>
+
+        <!-- Transcoding -->
+        <h2 style="margin-top:24px;">Transcoding</h2>
+        <div class="form-group">
+            <label>Policy</label>
+            <select id="ch-transcode-policy">
+                <option value="auto" <?php echo (!$is_edit || ($channel['transcode_policy'] ?? 'auto') === 'auto') ? 'selected' : ''; ?>>
+                    Auto (pass through compatible H.264/AAC files)
+                </option>
+                <option value="transcode" <?php echo ($is_edit && ($channel['transcode_policy'] ?? '') === 'transcode') ? 'selected' : ''; ?>>
+                    Always transcode
+                </option>
+            </select>
+            <div class="hint">Auto stream-copies files that are already H.264 (1080p or below) with AAC audio, which uses a fraction of the CPU.</div>
+        </div>
+        <div class="form-group">
+            <label>Profile</label>
+            <select id="ch-transcode-profile">
+                <option value="" <?php echo $current_profile_id === null ? 'selected' : ''; ?>>
+                    Default (1080p, CRF 20, veryfast, 192k stereo)
+                </option>
+                <?php foreach ($transcode_profiles as $tp): ?>
+                <option value="<?php echo (int)$tp['id']; ?>" <?php echo ((int)$current_profile_id === (int)$tp['id']) ? 'selected' : ''; ?>>
+                    <?php echo htmlspecialchars($tp['name']); ?> (<?php echo (int)$tp['max_height']; ?>p, <?php echo htmlspecialchars($tp['video_preset']); ?>)
+                </option>
+                <?php endforeach; ?>
+            </select>
+            <div class="hint">Encoder settings used when this channel transcodes. Stream copy only applies to files that fit the profile's resolution and bitrate.</div>
+        </div>
+        <div class="form-group">
+            <label>Transcode on</label>
+            <?php $current_offload = $channel['transcode_offload'] ?? ''; ?>
+            <select id="ch-transcode-offload">
+                <option value="" <?php echo $current_offload === '' ? 'selected' : ''; ?>>
+                    Server default (TRANSCODE_OFFLOAD)
+                </option>
+                <option value="local" <?php echo $current_offload === 'local' ? 'selected' : ''; ?>>
+                    This machine
+                </option>
+                <option value="jellyfin" <?php echo $current_offload === 'jellyfin' ? 'selected' : ''; ?>>
+                    Jellyfin
+                </option>
+                <option value="auto" <?php echo $current_offload === 'auto' ? 'selected' : ''; ?>>
+                    Jellyfin when this machine is busy
+                </option>
+            </select>
+            <div class="hint">With Jellyfin, the Jellyfin server encodes to this channel's profile and JellyStream only repackages the stream.</div>
+        </div>
+        <div class="form-group">
+            <label>Playout</label>
+            <select id="ch-playout-mode">
+                <option value="per_entry" <?php echo (!$is_edit || ($channel['playout_mode'] ?? 'per_entry') === 'per_entry') ? 'selected' : ''; ?>>
+                    One encode per programme
+                </option>
+                <option value="concat" <?php echo ($is_edit && ($channel['playout_mode'] ?? '') === 'concat') ? 'selected' : ''; ?>>
+                    Continuous (single encode across programmes)
+                </option>
+            </select>
+            <div class="hint">Continuous keeps one ffmpeg running through programme changes so timestamps never reset. It always transcodes and uses each file's first audio track.</div>
+        </div>
+        <div class="form-group toggle-row">
+            <label class="switch">
+                <input type="checkbox" id="ch-pretranscode" <?php echo ($is_edit && ($channel['pretranscode'] ?? false)) ? 'checked' : ''; ?>>
+                <span class="slider"></span>
+            </label>
+            <label for="ch-pretranscode">Pre-transcode upcoming programmes</label>
+        </div>
+        <div class="hint" style="margin-top:-8px;">Encodes the next few hours ahead of time during idle periods so programmes air as a stream copy (needs PRETRANSCODE_HOURS).</div>
 
         <!-- Libraries -->
         <h2 style="margin-top:24px;">Libraries</h2>
@@ -441,6 +543,8 @@ const API_BASE   = '<?php echo getClientApiBaseUrl(); ?>';
 // ── Channel type ──────────────────────────────────────────────────────────────
 // CollectionTypes valid for Video channels
 const VIDEO_TYPES = new Set(['movies', 'tvshows']);
+// CollectionTypes valid for Music channels
+const MUSIC_TYPES = new Set(['music']);
 
 function onTypeChange() {
     filterLibraryPicker();
@@ -454,6 +558,8 @@ function filterLibraryPicker() {
         const ct = opt.dataset.type || '';
         if (type === 'video') {
             opt.hidden = !VIDEO_TYPES.has(ct);
+        } else if (type === 'music') {
+            opt.hidden = !MUSIC_TYPES.has(ct);
         } else {
             opt.hidden = false;
         }
@@ -528,6 +634,7 @@ function refreshGenreDropdown() {
 function toggleGenreSection() {
     const mode = document.getElementById('ch-schedule-type').value;
     document.getElementById('genre-section').style.display = mode === 'genre_auto' ? 'block' : 'none';
+    document.getElementById('shift-section').style.display = mode === 'shifted' ? 'block' : 'none';
 }
 toggleGenreSection();
 
@@ -716,7 +823,8 @@ async function saveChannel() {
 
     const libs = getLibraries();
     const colSrcs = getCollectionSources();
-    if (!libs.length && !colSrcs.length) {
+    const shifted = document.getElementById('ch-schedule-type').value === 'shifted';
+    if (!shifted && !libs.length && !colSrcs.length) {
         showStatus('Add at least one library or collection source.', false);
         return;
     }
@@ -728,6 +836,13 @@ async function saveChannel() {
         enabled:            document.getElementById('ch-enabled').checked,
         channel_type:       document.getElementById('ch-type').value,
         schedule_type:      document.getElementById('ch-schedule-type').value,
+        parent_channel_id:  shifted ? parseInt(document.getElementById('ch-parent').value, 10) || null : null,
+        time_offset_minutes: shifted ? parseInt(document.getElementById('ch-time-offset').value, 10) || 0 : 0,
+        transcode_policy:   document.getElementById('ch-transcode-policy').value,
+        transcode_offload:  document.getElementById('ch-transcode-offload').value || null,
+        playout_mode:       document.getElementById('ch-playout-mode').value,
+        pretranscode:       document.getElementById('ch-pretranscode').checked,
+        transcode_profile_id: parseInt(document.getElementById('ch-transcode-profile').value, 10) || null,
         libraries:          libs,
         genre_filters:      getGenreFilters(),
         collection_sources: colSrcs,
@@ -0,0 +1,131 @@
+"""ChannelBroadcaster fan-out tests."""
+
+import asyncio
+
+import pytest
+
+from app.services.broadcaster import active_broadcasters, get_broadcaster
+
+
+def _source(chunks, started):
+    async def gen():
+        started.append(True)
+        try:
+            for chunk in chunks:
+                yield chunk
+                await asyncio.sleep(0)
+            # Hold the "encode" open until cancelled, like a live channel
+            await asyncio.Event().wait()
+        finally:
+            started.append(False)
+    return gen
+
+
+@pytest.mark.asyncio
+async def test_viewers_share_one_source():
+    """Two viewers on one channel receive the same bytes from one producer."""
+    started = []
+    factory = _source([b"a", b"b", b"c"], started)
+
+    bc = get_broadcaster(9001, factory)
+    q1 = bc.subscribe()
+    q2 = get_broadcaster(9001, factory).subscribe()
+    assert get_broadcaster(9001, factory) is bc
+    assert bc.viewer_count == 2
+
+    got1 = [await q1.get() for _ in range(3)]
+    got2 = [await q2.get() for _ in range(3)]
+    assert got1 == got2 == [b"a", b"b", b"c"]
+    assert started == [True]
+
+    bc.unsubscribe(q1)
+    bc.unsubscribe(q2)
+    await asyncio.sleep(0.01)
+    assert started == [True, False]
+    assert 9001 not in active_broadcasters()
+
+
+@pytest.mark.asyncio
+async def test_lagging_viewer_is_dropped(monkeypatch):
+    """A viewer whose queue overflows is ended without stopping the others."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "BROADCAST_CLIENT_BUFFER_CHUNKS", 2)
+
+    started = []
+    bc = get_broadcaster(9002, _source([b"1", b"2", b"3", b"4"], started))
+    slow = bc.subscribe()
+    fast = bc.subscribe()
+
+    fast_iter = bc.iter_client(fast)
+    received = [await fast_iter.__anext__() for _ in range(4)]
+    assert received == [b"1", b"2", b"3", b"4"]
+    assert [chunk async for chunk in bc.iter_client(slow)] == []
+
+    await fast_iter.aclose()
+    await asyncio.sleep(0.01)
+    assert started == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_encode_budget_refuses_new_channels_only(monkeypatch):
+    """Over budget, a new channel gets 503 + Retry-After; viewers still share."""
+    from fastapi import HTTPException
+
+    from app.core.config import settings
+    from app.services.transcode_slots import OUTPUT_MPEGTS, admit_encode, slot_status
+
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_ENCODES", 1)
+    monkeypatch.setattr(settings, "MAX_LOAD_PER_CPU", 0.0)
+
+    started = []
+    bc = get_broadcaster(9003, _source([], started))
+    queue = bc.subscribe()
+    assert slot_status()["in_use"] == 1
+
+    with pytest.raises(HTTPException) as exc:
+        admit_encode(9004, OUTPUT_MPEGTS)
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == str(settings.ENCODE_RETRY_AFTER)
+
+    bc.unsubscribe(queue)
+    await asyncio.sleep(0.01)
+    admit_encode(9004, OUTPUT_MPEGTS)
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_is_reaped_and_encode_stopped(monkeypatch):
+    """A viewer that stops reading is evicted and the orphaned encode killed."""
+    from app.core.config import settings
+    from app.services import broadcaster as broadcaster_module
+
+    monkeypatch.setattr(settings, "STREAM_WRITE_TIMEOUT", 0)
+    monkeypatch.setattr(broadcaster_module, "_REAPER_INTERVAL", 0.01)
+
+    started = []
+    bc = get_broadcaster(9005, _source([b"x"], started))
+    bc.subscribe()                      # never read from
+    await asyncio.sleep(0.1)
+    assert started == [True, False]
+    assert 9005 not in active_broadcasters()
+
+
+@pytest.mark.asyncio
+async def test_blocked_write_ends_response(monkeypatch):
+    """A send() that never completes ends the response and unsubscribes."""
+    from app.core.config import settings
+    from app.services.broadcaster import BroadcastResponse
+
+    monkeypatch.setattr(settings, "STREAM_WRITE_TIMEOUT", 0.05)
+
+    started = []
+    bc = get_broadcaster(9006, _source([b"x", b"y"], started))
+    queue = bc.subscribe()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            await asyncio.Event().wait()  # peer never drains
+
+    await BroadcastResponse(bc.iter_client(queue)).stream_response(send)
+    await asyncio.sleep(0.01)
+    assert bc.viewer_count == 0
+    assert started == [True, False]
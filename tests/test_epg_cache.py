@@ -0,0 +1,75 @@
+"""Rendered EPG cache tests."""
+
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.channel import Channel
+from app.services import epg_cache, timeline
+
+_WINDOW = (datetime(2026, 3, 1, 17, 0), datetime(2026, 3, 8, 20, 0))
+
+
+@pytest.mark.asyncio
+async def test_only_changed_channels_are_rendered_again(monkeypatch):
+    rendered = []
+
+    async def fake_programmes(channels, window_start, window_end, db, base_url):
+        rendered.append(sorted(ch.id for ch in channels))
+        for ch in channels:
+            yield ch.id, f"  <programme channel=\"{ch.id}\" v=\"{timeline.version(ch.id)}\"/>\n"
+
+    monkeypatch.setattr(epg_cache.xmltv, "iter_programmes", fake_programmes)
+    monkeypatch.setattr(epg_cache, "_fragments", {})
+    channels = [
+        Channel(id=1, name="One", schedule_type="genre_auto"),
+        Channel(id=2, name="Two", schedule_type="genre_auto"),
+    ]
+
+    async def render():
+        doc = await epg_cache._render_xmltv(channels, _WINDOW, "http://h", None)
+        return "".join(doc.parts)
+
+    first = await render()
+    again = await render()
+    assert rendered == [[1, 2]] and again == first
+
+    timeline.invalidate(2)
+    changed = await render()
+    assert rendered == [[1, 2], [2]] and changed != first
+    assert changed.index('channel="1"') < changed.index('channel="2"')
+
+    timeline.invalidate()
+    await render()
+    assert rendered[-1] == [1, 2]
+
+
+def test_document_is_hashed_and_compressed_while_streamed(monkeypatch):
+    monkeypatch.setattr(epg_cache, "_CHUNK_CHARS", 4)
+    doc = epg_cache.Document(["<tv>\n", "  <channel/>\n", "</tv>\n"])
+    assert doc.etag is None and not doc.matches("*")
+
+    # Cut short: still incomplete
+    stream = doc.stream(compressed=True)
+    next(stream)
+    stream.close()
+    assert not doc.complete
+
+    body = b"".join(doc.stream())
+    assert body == b"<tv>\n  <channel/>\n</tv>\n"
+    assert doc.complete and gzip.decompress(doc.gzipped) == body
+    assert b"".join(doc.stream(compressed=True)) == doc.gzipped
+
+    same = epg_cache.Document(["<tv>\n  <channel/>\n</tv>\n"]).finish()
+    assert (same.etag, same.gzipped) == (doc.etag, doc.gzipped)
+    assert doc.matches(doc.etag)
+    assert doc.matches(f'"other", W/{doc.etag}')
+    assert doc.matches("*")
+    assert not doc.matches('"other"') and not doc.matches(None)
+
+
+def test_window_starts_on_the_hour():
+    start, end = epg_cache.epg_window(datetime(2026, 3, 1, 20, 41, 7))
+    assert start == datetime(2026, 3, 1, 17, 0)
+    assert end - start == timedelta(days=7, hours=3)
@@ -0,0 +1,52 @@
+"""Filler engine tests."""
+
+from dataclasses import replace
+
+from app.models.filler_clip import FillerClip
+from app.services import filler
+from app.services.stream_proxy import DEFAULT_PROFILE
+
+
+def test_pick_filler_fits_gap(monkeypatch):
+    key = filler.profile_key(DEFAULT_PROFILE)
+    assert filler.profile_key(replace(DEFAULT_PROFILE, max_height=720)) != key
+    clips = [
+        FillerClip(path=f"/f/{n}.ts", source_path=f"/c/{n}.mp4", duration=float(n))
+        for n in (15, 30, 60)
+    ]
+    monkeypatch.setattr(filler, "_clips", {key: clips})
+
+    for _ in range(20):
+        assert filler.pick_filler(DEFAULT_PROFILE, 40).duration in (15, 30)
+    # Nothing fits: the shortest clip covers the rest of the gap
+    assert filler.pick_filler(DEFAULT_PROFILE, 10).duration == 15
+    assert filler.pick_filler(DEFAULT_PROFILE, 0.5) is None
+    assert filler.pick_filler(replace(DEFAULT_PROFILE, max_height=720), 40) is None
+
+
+def test_failed_clip_does_not_poison_other_filler(monkeypatch):
+    from datetime import datetime
+
+    from app.services import stream_proxy
+    from app.services.ffmpeg_monitor import FfmpegError
+
+    key = filler.profile_key(DEFAULT_PROFILE)
+    clips = [
+        FillerClip(id=n, path=f"/f/{n}.ts", source_path=f"/c/{n}.mp4", duration=30.0)
+        for n in (1, 2)
+    ]
+    monkeypatch.setattr(filler, "_clips", {key: clips})
+    monkeypatch.setattr(stream_proxy, "_failed_entries", {})
+    now = datetime(2026, 3, 1, 20, 0)
+    broken, fine = (filler.filler_entry(5, clip, now) for clip in clips)
+    assert (broken.id, fine.id) == (-1, -2)
+    assert filler.filler_entry(5, clips[0], now).id == broken.id     # stable
+
+    stream_proxy.record_source_failure(
+        5, broken, FfmpegError("invalid_data", False, "Invalid data"), "test"
+    )
+    assert stream_proxy._is_failed(broken, now)
+    assert not stream_proxy._is_failed(fine, now)
+    assert filler.filler_clip_id(broken.id) == 1
+    for _ in range(10):
+        assert filler.pick_filler(DEFAULT_PROFILE, 40, exclude={1}) is clips[1]
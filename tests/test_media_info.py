@@ -0,0 +1,57 @@
+"""Tests for the media-info catalog row conversion."""
+
+from types import SimpleNamespace
+
+from app.services.media_info import (
+    _parse_keyframes,
+    _probe_from_row,
+    _row_values,
+    decode_keyframes,
+    encode_keyframes,
+)
+from app.services.stream_proxy import _select_audio_index, _stream_copy_plan
+
+
+PROBE = {
+    "streams": [
+        {"index": 0, "codec_type": "video", "codec_name": "h264",
+         "width": 1920, "height": 1080, "pix_fmt": "yuv420p", "bit_rate": "5000000"},
+        {"index": 1, "codec_type": "audio", "codec_name": "aac", "channels": 2,
+         "tags": {"language": "jpn"}},
+        {"index": 2, "codec_type": "audio", "codec_name": "aac", "channels": 2,
+         "tags": {"language": "eng"}},
+        {"index": 3, "codec_type": "subtitle", "codec_name": "subrip",
+         "tags": {"language": "eng"}},
+    ],
+    "format": {"bit_rate": "5200000", "duration": "1320.5"},
+}
+
+
+def test_row_round_trip_preserves_stream_plan():
+    row = SimpleNamespace(**_row_values(PROBE))
+    assert row.video_bitrate == 5000
+    assert row.duration == 1320.5
+
+    rebuilt = _probe_from_row(row)
+    assert _select_audio_index(rebuilt) == _select_audio_index(PROBE)
+    idx = _select_audio_index(PROBE)
+    assert _stream_copy_plan(rebuilt, idx) == _stream_copy_plan(PROBE, idx)
+
+
+def test_keyframe_index_round_trip_and_lookup():
+    output = "\n".join([
+        "packet|pts_time=1.400000|pos=564|flags=K__",
+        "packet|pts_time=1.441711|pos=9024|flags=___",
+        "packet|pts_time=3.400000|pos=188000|flags=K__",
+        "packet|pts_time=N/A|pos=190000|flags=K__",
+        "packet|pts_time=5.400000|pos=N/A|flags=K_",
+        "format|start_time=1.400000",
+    ])
+    index = _parse_keyframes(output)
+    assert index.times == [0.0, 2.0, 4.0]
+    assert index.positions == [564, 188000, -1]
+
+    restored = decode_keyframes(encode_keyframes(index))
+    assert restored == index
+    assert restored.at_or_before(3.9) == 1
+    assert restored.nearest(3.9) == 2
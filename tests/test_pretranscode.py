@@ -0,0 +1,53 @@
+"""Pre-transcode cache tests."""
+
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services import pretranscode
+from app.services.stream_proxy import DEFAULT_PROFILE, EncodeProfile
+
+
+def _file(directory, name, size, mtime):
+    path = directory / name
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_lru_eviction_spares_wanted_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PRETRANSCODE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PRETRANSCODE_MAX_GB", 3000 / 1024 ** 3)
+    oldest = _file(tmp_path, "a.ts", 1000, 100)
+    wanted = _file(tmp_path, "b.ts", 1000, 200)
+    newest = _file(tmp_path, "c.ts", 1000, 300)
+
+    assert pretranscode._evict(1500, keep={wanted})
+    assert not os.path.exists(oldest)
+    assert os.path.exists(wanted) and not os.path.exists(newest)
+    # Nothing left that may be evicted
+    assert not pretranscode._evict(5000, keep={wanted})
+
+
+def test_cache_key_depends_on_profile_and_audio(tmp_path):
+    source = str(tmp_path / "film.mkv")
+    key = pretranscode._cache_key("item1", source, DEFAULT_PROFILE, None)
+    assert key == pretranscode._cache_key("item1", source, DEFAULT_PROFILE, None)
+    assert key != pretranscode._cache_key("item1", source, DEFAULT_PROFILE, 2)
+    assert key != pretranscode._cache_key(
+        "item1", source, EncodeProfile(max_height=720), None
+    )
+
+
+@pytest.mark.asyncio
+async def test_cached_copy_finds_and_touches_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PRETRANSCODE_DIR", str(tmp_path))
+    source = str(tmp_path / "film.mkv")
+    assert await pretranscode.cached_copy("item1", source, DEFAULT_PROFILE, None) is None
+
+    key = pretranscode._cache_key("item1", source, DEFAULT_PROFILE, None)
+    path = _file(tmp_path, os.path.basename(pretranscode._cache_path(key)), 10, 100)
+    assert await pretranscode.cached_copy("item1", source, DEFAULT_PROFILE, None) == path
+    assert os.stat(path).st_mtime > 100         # recently used for the LRU
+    assert (await pretranscode.cache_status())["files"] == 1
@@ -0,0 +1,97 @@
+"""Session registry and ffmpeg progress parsing tests."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ffmpeg_monitor import FfmpegMonitor, classify_error
+from app.services.sessions import (
+    OUTPUT_MPEGTS,
+    close_encode,
+    close_viewer,
+    open_encode,
+    open_viewer,
+    session_snapshot,
+)
+
+
+class _FakeProcess:
+    def __init__(self, pid, stderr):
+        self.pid = pid
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_data(stderr)
+        self.stderr.feed_eof()
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+
+@pytest.mark.asyncio
+async def test_progress_lines_update_the_encode_on_air():
+    encode = open_encode(9101, OUTPUT_MPEGTS)
+    viewer = open_viewer(9101, "10.0.0.5:51234")
+    try:
+        encode.set_entry(SimpleNamespace(id=7, title="Pilot"), 120, "copy", 4242)
+
+        monitor = FfmpegMonitor(_FakeProcess(4242, (
+            b"[mpegts @ 0x1] some warning\n"
+            b"fps=25.00\nbitrate=5012.3kbits/s\n"
+            b"out_time_us=12480000\nspeed=1.01x\nprogress=continue\n"
+        )), "test", encode)
+        assert await monitor.wait() is None
+
+        # Output from a pre-started process is ignored until it is on air
+        monitor = FfmpegMonitor(
+            _FakeProcess(4343, b"speed=9.9x\nprogress=continue\n"), "test", encode
+        )
+        await monitor.wait()
+
+        (item,) = [s for s in session_snapshot() if s["channel_id"] == 9101]
+        assert item["ffmpeg_pid"] == 4242
+        assert item["speed"] == 1.01
+        assert item["fps"] == 25.0
+        assert item["bitrate_kbps"] == 5012.3
+        assert item["out_time_seconds"] == 12.5
+        assert item["entry"]["title"] == "Pilot"
+        assert item["viewers"][0]["client"] == "10.0.0.5:51234"
+    finally:
+        close_viewer(viewer)
+        close_encode(encode)
+    assert not [s for s in session_snapshot() if s["channel_id"] == 9101]
+
+
+@pytest.mark.asyncio
+async def test_fatal_input_error_is_classified_and_kills_ffmpeg():
+    process = _FakeProcess(
+        4444, b"/media/gone.mkv: No such file or directory\n"
+    )
+    error = await FfmpegMonitor(process, "test").wait()
+    assert error.kind == "source_missing" and not error.transient
+    assert process.killed
+
+    assert classify_error("http://jf/x: Server returned 503 Service Unavailable").transient
+    assert classify_error("[h264 @ 0x1] error while decoding MB 3 4") is None
+
+
+@pytest.mark.asyncio
+async def test_corrupt_packet_after_output_does_not_kill_ffmpeg():
+    # At startup the same message means the input cannot be read at all
+    process = _FakeProcess(
+        4545, b"/media/bad.mkv: Invalid data found when processing input\n"
+    )
+    error = await FfmpegMonitor(process, "test").wait()
+    assert error.kind == "source_invalid" and process.killed
+
+    process = _FakeProcess(4646, (
+        b"out_time_us=2000000\nprogress=continue\n"
+        b"Error while decoding stream #0:1: Invalid data found when processing input\n"
+        b"[http @ 0x1] Input/output error\n"
+    ))
+    monitor = FfmpegMonitor(process, "test")
+    assert await monitor.wait() is None
+    assert monitor.output_started and not process.killed
+    assert classify_error(
+        "Error opening input: Invalid data found when processing input", True
+    ).kind == "source_invalid"
@@ -0,0 +1,82 @@
+"""Time-shifted channel tests."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.channels import delete_channel
+from app.core.database import Base
+from app.models.channel import Channel
+from app.models.channel_library import ChannelLibrary
+from app.models.schedule_entry import ScheduleEntry
+from app.services.shifted_channels import ScheduleSource
+
+# Registers every table with Base.metadata
+import app.models.channel_collection_source  # noqa: F401
+import app.models.collection_item  # noqa: F401
+import app.models.genre_filter  # noqa: F401
+import app.models.transcode_profile  # noqa: F401
+
+
+def test_shift_moves_parent_entry_without_touching_it():
+    start = datetime(2026, 3, 1, 20, 0)
+    entry = ScheduleEntry(
+        id=42, channel_id=1, title="Heat", media_item_id="abc", library_id="lib",
+        item_type="Movie", start_time=start, end_time=start + timedelta(hours=2),
+        duration=7200,
+    )
+    sibling = Channel(
+        id=2, schedule_type="shifted", parent_channel_id=1, time_offset_minutes=60
+    )
+    source = ScheduleSource.for_channel(sibling)
+    assert source.shifted and source.schedule_channel_id == 1
+
+    moved = source.shift(entry)
+    assert moved is not entry
+    assert (moved.id, moved.channel_id, moved.title) == (42, 2, "Heat")
+    assert moved.start_time == start + timedelta(hours=1)
+    assert moved.end_time == start + timedelta(hours=3)
+    assert entry.channel_id == 1 and entry.start_time == start
+
+    # Ordinary channels read their own rows unchanged
+    plain = ScheduleSource.for_channel(Channel(id=1, schedule_type="genre_auto"))
+    assert not plain.shifted and plain.shift(entry) is entry
+
+
+async def test_deleting_parent_deletes_shifted_siblings():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        start = datetime(2026, 3, 1, 20, 0)
+        async with Session() as db:
+            db.add_all([
+                Channel(id=1, name="Movies", schedule_type="genre_auto"),
+                Channel(
+                    id=2, name="Movies +1", schedule_type="shifted",
+                    parent_channel_id=1, time_offset_minutes=60,
+                ),
+                Channel(id=3, name="Other", schedule_type="genre_auto"),
+                ChannelLibrary(
+                    channel_id=1, library_id="l", library_name="Films",
+                    collection_type="movies",
+                ),
+                ScheduleEntry(
+                    channel_id=1, title="Heat", media_item_id="m", library_id="l",
+                    item_type="Movie", start_time=start,
+                    end_time=start + timedelta(hours=2), duration=7200,
+                ),
+            ])
+            await db.commit()
+
+            await delete_channel(1, db)
+
+            remaining = (await db.execute(select(Channel.id))).scalars().all()
+            assert remaining == [3]
+            for model in (ScheduleEntry, ChannelLibrary):
+                count = await db.scalar(select(func.count()).select_from(model))
+                assert count == 0
+    finally:
+        await engine.dispose()
@@ -0,0 +1,77 @@
+"""Source cache tests."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import source_cache
+
+
+def test_parse_range():
+    assert source_cache.parse_range(None, 100) is None
+    assert source_cache.parse_range("bytes=10-", 100) == (10, 99)
+    assert source_cache.parse_range("bytes=10-19", 100) == (10, 19)
+    assert source_cache.parse_range("bytes=90-500", 100) == (90, 99)
+    assert source_cache.parse_range("bytes=-30", 100) == (70, 99)
+    with pytest.raises(ValueError):
+        source_cache.parse_range("bytes=100-", 100)
+
+
+@pytest.mark.asyncio
+async def test_reads_through_chunks_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SOURCE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "SOURCE_CACHE_MAX_GB", 1.0)
+    monkeypatch.setattr(source_cache, "_CHUNK_SIZE", 10)
+    monkeypatch.setattr(source_cache, "_sizes", {})
+    monkeypatch.setattr(source_cache, "_index", None)
+    monkeypatch.setattr(source_cache, "_stats", {"hits": 0, "misses": 0, "prefetches": 0})
+    content = bytes(range(35))
+    fetched = []
+
+    async def fake_fetch(item_id, index):
+        fetched.append(index)
+        await asyncio.sleep(0)
+        source_cache._sizes[item_id] = len(content)
+        return content[index * 10:(index + 1) * 10]
+
+    monkeypatch.setattr(source_cache, "_fetch", fake_fetch)
+
+    assert await source_cache.item_size("item") == 35
+    # Two readers of the same range share each fetch
+    first, second = await asyncio.gather(
+        *(_collect(source_cache.read_range("item", 5, 24)) for _ in range(2))
+    )
+    assert first == second == content[5:25]
+    await asyncio.gather(*source_cache._read_ahead_tasks)
+    assert sorted(fetched) == [0, 1, 2, 3]      # chunk 3 read ahead
+    assert await _collect(source_cache.read_range("item", 30, 34)) == content[30:]
+    assert len(fetched) == 4                    # served from disk
+    status = await source_cache.cache_status()
+    # Every fetch is counted once, read-ahead ones (at least chunk 3) apart
+    assert status["misses"] + status["prefetches"] == 4
+    assert status["prefetches"] >= 1
+    assert status["chunks"] == 4 and status["used_bytes"] == 35
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used_from_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SOURCE_CACHE_DIR", str(tmp_path))
+    # Room for two 10-byte chunks
+    monkeypatch.setattr(settings, "SOURCE_CACHE_MAX_GB", 25 / 1024 ** 3)
+    monkeypatch.setattr(source_cache, "_index", None)
+    for index in range(2):
+        source_cache._store("item", index, bytes(10))
+    # Chunk 0 is read again, so chunk 1 is now the least recently used
+    assert await asyncio.to_thread(source_cache._read_cached, source_cache._chunk_path("item", 0))
+    source_cache._store("item", 2, bytes(10))
+
+    assert list(source_cache._index) == [
+        source_cache._chunk_path("item", 0), source_cache._chunk_path("item", 2)
+    ]
+    assert source_cache._used == 20
+    assert not (tmp_path / source_cache._chunk_path("item", 1)).exists()
+
+
+async def _collect(iterator):
+    return b"".join([chunk async for chunk in iterator])
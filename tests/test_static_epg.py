@@ -0,0 +1,40 @@
+"""Static EPG file writer tests."""
+
+import asyncio
+import gzip
+
+import pytest
+
+from app.core.config import settings
+from app.services import epg_cache, static_epg
+
+
+@pytest.mark.asyncio
+async def test_writes_files_atomically_once_per_burst(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "STATIC_EPG_ENABLED", True)
+    monkeypatch.setattr(settings, "STATIC_EPG_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "STATIC_EPG_DEBOUNCE_SECONDS", 0.02)
+    monkeypatch.setattr(static_epg, "_written", {})
+    renders = []
+
+    async def xmltv_all():
+        renders.append("xmltv")
+        return epg_cache.Document(['<tv>\n', '</tv>\n'])
+
+    async def m3u_all():
+        return epg_cache.Document(["#EXTM3U\n"]).finish()
+
+    monkeypatch.setattr(epg_cache, "xmltv_all", xmltv_all)
+    monkeypatch.setattr(epg_cache, "m3u_all", m3u_all)
+
+    for _ in range(5):
+        static_epg.request_write()
+        await asyncio.sleep(0.005)
+    await static_epg._task
+
+    assert renders == ["xmltv"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "channels.m3u", "xmltv.xml", "xmltv.xml.gz",
+    ]
+    assert gzip.decompress((tmp_path / "xmltv.xml.gz").read_bytes()) == b"<tv>\n</tv>\n"
+    assert (tmp_path / "channels.m3u").read_text() == "#EXTM3U\n"
@@ -0,0 +1,423 @@
+"""Stream proxy ffmpeg command tests."""
+
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.integrations.jellyfin import JellyfinClient
+from app.models.schedule_entry import ScheduleEntry
+from app.services.media_info import KeyframeIndex
+from app.services.stream_proxy import (
+    EncodeProfile,
+    Playout,
+    Rendition,
+    _build_ffmpeg_cmd,
+    _build_music_cmd,
+    _music_copy_audio,
+    _plan_seek,
+    _stream_copy_plan,
+    _ts_keyframe_offset,
+)
+
+
+def test_mpegts_output_pipes_to_stdout():
+    cmd = _build_ffmpeg_cmd("/media/film.mkv", 90)
+    assert cmd[cmd.index("-ss") + 1] == "90"
+    assert cmd[cmd.index("-i") + 1] == "/media/film.mkv"
+    assert cmd[cmd.index("-f") + 1] == "mpegts"
+    assert cmd[-1] == "pipe:1"
+
+
+def test_hls_output_writes_rolling_window(tmp_path):
+    cmd = _build_ffmpeg_cmd("/media/film.mkv", 0, 2, hls_dir=str(tmp_path))
+    assert cmd[cmd.index("-f") + 1] == "hls"
+    assert "append_list" in cmd[cmd.index("-hls_flags") + 1]
+    assert cmd[cmd.index("-hls_segment_filename") + 1].startswith(str(tmp_path))
+    assert cmd[-1] == str(tmp_path / "index.m3u8")
+    assert "pipe:1" not in cmd
+
+
+def test_abr_ladder_splits_one_decode_into_renditions(tmp_path):
+    ladder = [Rendition(1080, 6000), Rendition(720, 3000), Rendition(480, 1200)]
+    cmd = _build_ffmpeg_cmd("/m.mkv", 0, hls_dir=str(tmp_path), renditions=ladder)
+    assert cmd.count("-i") == 1
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.startswith("[0:v:0]split=3[s0][s1][s2];")
+    assert "[s1]scale=-2:min(720\\,ih)[v1]" in graph
+    assert cmd[cmd.index("-maxrate:v:2") + 1] == "1200k"
+    assert cmd[cmd.index("-var_stream_map") + 1] == "v:0,a:0 v:1,a:1 v:2,a:2"
+    assert cmd[cmd.index("-master_pl_name") + 1] == "master.m3u8"
+    assert cmd[-1] == str(tmp_path / "stream_%v.m3u8")
+
+
+def test_keyframe_index_drives_join_seek():
+    index = KeyframeIndex(times=[0.0, 2.0, 4.0], positions=[0, 188000, 376000])
+    # No index: plain input seek
+    assert _plan_seek(3, None).input_args == ("-ss", "3")
+    # MPEG-TS transcode: byte seek to the GOP, then trim to the exact offset
+    cmd = _build_ffmpeg_cmd("/m.ts", 3, seek=_plan_seek(3, index, byte_seek=True))
+    assert cmd[cmd.index("-skip_initial_bytes") + 1] == "188000"
+    assert cmd.index("-ss") > cmd.index("-i")
+    assert cmd[cmd.index("-ss") + 1] == "1.0"
+    # Copied video lands on the nearest keyframe
+    plan = _plan_seek(3.6, index, copy_video=True)
+    assert plan.input_args == ("-ss", "4.000") and plan.start_seconds == 4.0
+
+
+def _probe(video=None, audio=None, fmt=None):
+    streams = []
+    if video is not None:
+        streams.append({"index": 0, "codec_type": "video", **video})
+    for i, a in enumerate(audio or [], start=1):
+        streams.append({"index": i, "codec_type": "audio", **a})
+    return {"streams": streams, "format": fmt or {}}
+
+
+_H264_1080 = {"codec_name": "h264", "pix_fmt": "yuv420p", "height": 1080}
+
+
+def test_compatible_source_is_fully_copied():
+    probe = _probe(_H264_1080, [{"codec_name": "aac", "channels": 2}])
+    assert _stream_copy_plan(probe, None) == (True, True)
+    cmd = _build_ffmpeg_cmd("/m.mp4", 0, None, copy_video=True, copy_audio=True)
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert cmd[cmd.index("-c:a") + 1] == "copy"
+    assert "-vf" not in cmd
+
+
+def test_surround_audio_is_transcoded_alongside_copied_video():
+    probe = _probe(_H264_1080, [
+        {"codec_name": "ac3", "channels": 6},
+        {"codec_name": "aac", "channels": 2},
+    ])
+    assert _stream_copy_plan(probe, None) == (True, False)
+    # Preferred-language track selection decides which audio is checked
+    assert _stream_copy_plan(probe, 2) == (True, True)
+
+
+def test_incompatible_video_is_transcoded():
+    aac = [{"codec_name": "aac", "channels": 2}]
+    assert _stream_copy_plan(_probe({**_H264_1080, "codec_name": "hevc"}, aac), None) == (False, False)
+    assert _stream_copy_plan(_probe({**_H264_1080, "height": 2160}, aac), None) == (False, False)
+    assert _stream_copy_plan(_probe({**_H264_1080, "pix_fmt": "yuv420p10le"}, aac), None) == (False, False)
+    too_fast = _probe(_H264_1080, aac, fmt={"bit_rate": "30000000"})
+    assert _stream_copy_plan(too_fast, None) == (False, False)
+    assert _stream_copy_plan(None, None) == (False, False)
+
+
+def test_transcode_profile_shapes_encode_and_copy_plan():
+    profile = EncodeProfile(
+        max_height=720, video_preset="ultrafast", video_crf=None,
+        video_bitrate_kbps=3000, audio_bitrate_kbps=128, audio_channels=2, threads=2,
+    )
+    cmd = _build_ffmpeg_cmd("/m.mkv", 0, profile=profile)
+    assert cmd[cmd.index("-vf") + 1] == "scale=-2:min(720\\,ih)"
+    assert cmd[cmd.index("-preset") + 1] == "ultrafast"
+    assert cmd[cmd.index("-b:v") + 1] == "3000k"
+    assert "-crf" not in cmd
+    assert cmd[cmd.index("-threads") + 1] == "2"
+    assert cmd[cmd.index("-b:a") + 1] == "128k"
+    # A 1080p source no longer fits, so it is transcoded instead of copied
+    probe = _probe(_H264_1080, [{"codec_name": "aac", "channels": 2}])
+    assert _stream_copy_plan(probe, None, profile) == (False, False)
+
+
+def _ts_packet(stream_id=None, random_access=False):
+    """One 188-byte TS packet, optionally starting a PES with an adaptation field."""
+    if stream_id is None:
+        return bytes([0x47, 0x00, 0x00, 0x10]) + b"\xff" * 184
+    flags = 0x40 if random_access else 0x00
+    header = bytes([0x47, 0x40, 0x00, 0x30, 0x01, flags])
+    pes = b"\x00\x00\x01" + bytes([stream_id])
+    return header + pes + b"\xff" * (188 - len(header) - len(pes))
+
+
+def test_ts_keyframe_offset_finds_video_random_access_point():
+    data = (
+        _ts_packet()
+        + _ts_packet(stream_id=0xC0, random_access=True)    # audio, ignored
+        + _ts_packet(stream_id=0xE0, random_access=False)
+        + _ts_packet(stream_id=0xE0, random_access=True)
+    )
+    assert _ts_keyframe_offset(data) == 3 * 188
+    assert _ts_keyframe_offset(data[:3 * 188]) is None
+
+
+def test_concat_chain_link_points_at_next_file():
+    from app.services.concat_playout import _chain_text
+
+    text = _chain_text("/media/it's.mkv", 90, 1800, "/data/playout/1/chain_000001.ffconcat")
+    lines = text.splitlines()
+    assert lines[0] == "ffconcat version 1.0"
+    assert lines[1] == "file '/media/it'\\''s.mkv'"
+    assert "inpoint 90" in lines
+    assert "outpoint 1800.000" in lines
+    assert lines[-2:] == ["file '/data/playout/1/chain_000001.ffconcat'", "option safe 0"]
+
+    last = _chain_text("/media/a.mkv", 0, 60, None)
+    assert "inpoint" not in last and "chain_" not in last
+
+
+async def test_offloaded_playout_remuxes_jellyfin_transcode():
+    client = JellyfinClient("http://jf:8096", "key")
+    url = await client.get_stream_url(
+        "item1", start_seconds=90, max_height=720, video_bitrate_kbps=3000,
+        audio_stream_index=2, transcode=True,
+    )
+    parsed = urlparse(url)
+    params = parse_qs(parsed.query)
+    assert parsed.path == "/Videos/item1/stream.ts"
+    assert params["StartTimeTicks"] == ["900000000"]
+    assert params["MaxHeight"] == ["720"] and params["VideoBitRate"] == ["3000000"]
+    assert params["AudioStreamIndex"] == ["2"]
+
+    playout = Playout(
+        entry=ScheduleEntry(title="Heat"), source="/media/film.mkv",
+        offset_seconds=90, audio_stream_index=2, offload_url=url,
+    )
+    cmd = playout.ffmpeg_cmd()
+    assert cmd[cmd.index("-i") + 1] == url
+    assert cmd[cmd.index("-c:v") + 1] == "copy" and cmd[cmd.index("-c:a") + 1] == "copy"
+    assert cmd[cmd.index("-ss") + 1] == "0"      # Jellyfin already started at 90 s
+    assert playout.mode == "jellyfin transcode"
+
+
+def test_music_track_gets_still_picture_and_copied_audio(tmp_path):
+    probe = {"streams": [
+        {"index": 0, "codec_type": "audio", "codec_name": "mp3", "channels": 2},
+        {"index": 1, "codec_type": "video", "codec_name": "mjpeg",
+         "disposition": {"attached_pic": 1}},
+    ]}
+    assert _music_copy_audio(probe, None)
+    assert not _music_copy_audio({"streams": [
+        {"index": 0, "codec_type": "audio", "codec_name": "flac", "channels": 2},
+    ]}, None)
+
+    cmd = _build_music_cmd("/music/song.flac", 30, artwork="/music/folder.jpg")
+    assert cmd.count("-i") == 2
+    assert cmd[cmd.index("-loop") + 1] == "1"
+    assert cmd[cmd.index("-ss") + 1] == "30"           # seek applies to the track only
+    assert cmd[cmd.index("-tune") + 1] == "stillimage"
+    assert cmd[cmd.index("-c:a") + 1] == "aac"
+    assert cmd[-1] == "pipe:1"
+
+    # No artwork: a black frame; ABR HLS writes a single-variant master playlist
+    cmd = _build_music_cmd(
+        "/music/song.mp3", 0, copy_audio=True, hls_dir=str(tmp_path), abr=True
+    )
+    assert any(arg.startswith("color=c=black") for arg in cmd)
+    assert cmd[cmd.index("-c:a") + 1] == "copy"
+    assert cmd[cmd.index("-var_stream_map") + 1] == "v:0,a:0"
+
+
+@pytest.mark.asyncio
+async def test_wait_for_playable_holds_no_session_between_attempts(monkeypatch):
+    from app.services import stream_proxy
+
+    open_sessions = []
+    attempts = iter([(None, 0), (None, 0), ("playout", 0)])
+
+    class FakeSession:
+        async def __aenter__(self):
+            open_sessions.append(self)
+            return self
+
+        async def __aexit__(self, *exc):
+            open_sessions.remove(self)
+
+    async def fake_try(channel_id, db, caller, use_cache, allow_offload):
+        assert open_sessions == [db]
+        return next(attempts)
+
+    async def fake_sleep(seconds):
+        assert not open_sessions          # nothing held while waiting
+
+    monkeypatch.setattr(stream_proxy, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(stream_proxy, "_try_playable", fake_try)
+    monkeypatch.setattr(stream_proxy.asyncio, "sleep", fake_sleep)
+    assert await stream_proxy._wait_for_playable(1, "test") == "playout"
+    assert not open_sessions
+
+
+@pytest.mark.asyncio
+async def test_concat_backs_off_and_skips_unplayable_source(monkeypatch, tmp_path):
+    from datetime import datetime, timedelta
+
+    from app.core.config import settings
+    from app.services import concat_playout, stream_proxy
+    from app.services.ffmpeg_monitor import FfmpegError
+
+    now = datetime.utcnow()
+    entry = ScheduleEntry(
+        id=991, title="Broken", start_time=now, end_time=now + timedelta(hours=1)
+    )
+    plans = iter([Playout(entry=entry, source="/media/missing.mkv", offset_seconds=0)])
+    sleeps = []
+
+    class Stop(Exception):
+        pass
+
+    async def fake_wait(channel_id, caller, **options):
+        # Concat transcodes playout.source itself
+        assert options == {"use_cache": False, "allow_offload": False}
+        try:
+            return next(plans)
+        except StopIteration:
+            raise Stop
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+    class FakeStdout:
+        async def read(self, size):
+            return b""
+
+    class FakeProcess:
+        pid = 1
+        stdout = FakeStdout()
+
+    class FakeMonitor:
+        async def wait(self):
+            return FfmpegError("source_missing", False, "No such file or directory")
+
+    async def fake_exec(*cmd, **kwargs):
+        return FakeProcess()
+
+    async def noop(*args, **kwargs):
+        return None
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    async def fake_profile(channel_id, db):
+        return stream_proxy.DEFAULT_PROFILE
+
+    monkeypatch.setattr(settings, "PLAYOUT_CHAIN_DIR", str(tmp_path))
+    monkeypatch.setattr(concat_playout, "_wait_for_playable", fake_wait)
+    monkeypatch.setattr(concat_playout, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(concat_playout, "_get_encode_profile", fake_profile)
+    monkeypatch.setattr(concat_playout._Chain, "extend", noop)
+    monkeypatch.setattr(concat_playout, "watch_ffmpeg", lambda *a: FakeMonitor())
+    monkeypatch.setattr(concat_playout, "_kill", noop)
+    monkeypatch.setattr(concat_playout.asyncio, "create_subprocess_exec", fake_exec)
+    monkeypatch.setattr(concat_playout.asyncio, "sleep", fake_sleep)
+
+    with pytest.raises(Stop):
+        async for _ in concat_playout.concat_stream_generator(5):
+            pass
+    # A permanent failure marks the entry so _wait_for_playable skips it
+    assert stream_proxy._is_failed(entry, now)
+    assert sleeps == [0.2]
+    stream_proxy._failed_entries.pop(entry.id, None)
+
+
+@pytest.mark.asyncio
+async def test_channel_settings_load_in_one_query(monkeypatch):
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app.core.config import settings
+    from app.core.database import Base
+    from app.models.channel import Channel
+    from app.models.transcode_profile import TranscodeProfile
+    from app.services.stream_proxy import DEFAULT_PROFILE, _get_channel_settings
+    # Registers every table with Base.metadata
+    import app.models.channel_collection_source  # noqa: F401
+    import app.models.channel_library  # noqa: F401
+    import app.models.collection  # noqa: F401
+    import app.models.collection_item  # noqa: F401
+    import app.models.genre_filter  # noqa: F401
+
+    monkeypatch.setattr(settings, "FORCE_TRANSCODE", False)
+    monkeypatch.setattr(settings, "TRANSCODE_OFFLOAD", "local")
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        async with Session() as db:
+            db.add(TranscodeProfile(id=3, name="720p", max_height=720))
+            db.add_all([
+                Channel(id=1, name="Music", channel_type="music",
+                        transcode_offload="jellyfin", transcode_profile_id=3),
+                Channel(id=2, name="Films"),
+            ])
+            await db.commit()
+
+        queries = []
+        event.listen(
+            engine.sync_engine, "before_cursor_execute",
+            lambda *args: queries.append(args[2]),
+        )
+        async with Session() as db:
+            music = await _get_channel_settings(1, db)
+            films = await _get_channel_settings(2, db)
+        assert len(queries) == 2                # one per channel
+        assert (music.channel_type, music.transcode_offload) == ("music", "jellyfin")
+        assert music.profile.max_height == 720
+        assert (films.channel_type, films.transcode_policy) == ("video", "auto")
+        assert films.transcode_offload == "local"
+        assert films.profile == DEFAULT_PROFILE
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_hls_drop_after_output_does_not_mark_entry_failed(monkeypatch, tmp_path):
+    from datetime import datetime, timedelta
+
+    from app.core.config import settings
+    from app.services import hls, stream_proxy
+    from app.services.ffmpeg_monitor import FfmpegError
+
+    now = datetime.utcnow()
+    entry = ScheduleEntry(
+        id=992, title="Flaky", start_time=now, end_time=now + timedelta(hours=1)
+    )
+
+    class Stop(Exception):
+        pass
+
+    class FakeProcess:
+        pid = 1
+
+        async def wait(self):
+            return 1
+
+    async def fake_exec(*cmd, **kwargs):
+        return FakeProcess()
+
+    async def fake_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(settings, "HLS_DIR", str(tmp_path))
+    monkeypatch.setattr(hls.asyncio, "create_subprocess_exec", fake_exec)
+    monkeypatch.setattr(hls.asyncio, "sleep", fake_sleep)
+
+    for output_started, failed in ((True, False), (False, True)):
+        plans = iter([Playout(entry=entry, source="/media/flaky.mkv", offset_seconds=60)])
+
+        async def fake_wait(channel_id, caller):
+            try:
+                return next(plans)
+            except StopIteration:
+                raise Stop
+
+        class FakeMonitor:
+            async def wait(self):
+                return FfmpegError("source_invalid", False, "Invalid data found")
+
+        monitor = FakeMonitor()
+        monitor.output_started = output_started
+        monkeypatch.setattr(hls, "_wait_for_playable", fake_wait)
+        monkeypatch.setattr(hls, "watch_ffmpeg", lambda *a: monitor)
+
+        with pytest.raises(Stop):
+            await hls.HlsChannel(7)._run()
+        # Segments were already served: a mid-programme drop just resumes
+        assert stream_proxy._is_failed(entry, now) is failed
+        stream_proxy._failed_entries.pop(entry.id, None)
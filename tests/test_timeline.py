@@ -0,0 +1,41 @@
+"""Schedule timeline tests."""
+
+from datetime import datetime, timedelta
+
+from app.models.schedule_entry import ScheduleEntry
+from app.services.timeline import ChannelTimeline
+
+_T0 = datetime(2026, 3, 1, 20, 0)
+
+
+def _entry(id, start_minutes, minutes):
+    start = _T0 + timedelta(minutes=start_minutes)
+    return ScheduleEntry(
+        id=id, channel_id=1, title=f"#{id}", media_item_id=str(id), library_id="lib",
+        item_type="Movie", start_time=start, end_time=start + timedelta(minutes=minutes),
+        duration=minutes * 60,
+    )
+
+
+def test_lookups_by_bisect():
+    # 0–120, 120–150, gap, 180–210
+    timeline = ChannelTimeline(
+        [_entry(1, 0, 120), _entry(2, 120, 30), _entry(3, 180, 30)],
+        _T0 - timedelta(days=1),
+    )
+    at = lambda minutes: timeline.at(_T0 + timedelta(minutes=minutes))
+
+    assert at(-1) is None
+    assert at(0).id == 1 and at(119).id == 1     # long entry found from far in
+    assert at(120).id == 2                       # end is exclusive
+    assert at(160) is None                       # gap
+    assert at(200).id == 3 and at(210) is None
+
+    end = _T0 + timedelta(minutes=150)
+    slack = timedelta(seconds=5)
+    assert timeline.starting_between(end - slack, end + slack) is None
+    end = _T0 + timedelta(minutes=120)
+    assert timeline.starting_between(end - slack, end + slack).id == 2
+    assert timeline.starting_between(end - slack, end + slack, exclude_id=2) is None
+    assert timeline.next_start(_T0 + timedelta(minutes=150)) == _T0 + timedelta(minutes=180)
+    assert timeline.next_start(_T0 + timedelta(minutes=180)) is None
@@ -0,0 +1,148 @@
+"""Time-shift buffer tests."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import timeshift
+
+
+def _ts_packet(stream_id=None, random_access=False):
+    if stream_id is None:
+        return bytes([0x47, 0x00, 0x00, 0x10]) + b"\xff" * 184
+    flags = 0x40 if random_access else 0x00
+    header = bytes([0x47, 0x40, 0x00, 0x30, 0x01, flags])
+    pes = b"\x00\x00\x01" + bytes([stream_id])
+    return header + pes + b"\xff" * (188 - len(header) - len(pes))
+
+
+_KEYFRAME = _ts_packet(stream_id=0xE0, random_access=True)
+
+
+def test_find_keyframe_resyncs_after_unaligned_bytes():
+    # A chunk boundary in the middle of a packet, then a new packet grid
+    data = b"\x00" * 100 + _ts_packet() * 3 + b"\x47\x00" + _ts_packet() * 2 + _KEYFRAME
+    found = timeshift._find_keyframe(data)
+    assert data[found:found + 188] == _KEYFRAME
+    assert timeshift._find_keyframe(_ts_packet() * 5) is None
+
+
+@pytest.mark.asyncio
+async def test_rewind_starts_at_keyframe_and_follows_live(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TIMESHIFT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "TIMESHIFT_MINUTES", 5)
+    buffer = timeshift.open_timeshift(7)
+    assert timeshift.get_timeshift(7) is buffer
+
+    buffer.write(_ts_packet() * 4)
+    buffer.write(_KEYFRAME + _ts_packet() * 2)
+    await buffer.drain()
+    reader = buffer.read_from(0)
+    first = await reader.__anext__()
+    assert first.startswith(_KEYFRAME) and len(first) == 3 * 188
+
+    # The reader waits at the live edge for the next write
+    pending = asyncio.ensure_future(reader.__anext__())
+    await asyncio.sleep(0)
+    assert not pending.done()
+    buffer.write(b"live")
+    assert await pending == b"live"
+
+    timeshift.close_timeshift(buffer)
+    with pytest.raises(StopAsyncIteration):
+        await reader.__anext__()
+    assert timeshift.get_timeshift(7) is None
+    await buffer.drain()
+    assert not (tmp_path / "7").exists()
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_rewound_viewer_is_paced_behind_live(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TIMESHIFT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "TIMESHIFT_MINUTES", 5)
+    clock = _Clock(1000.0)
+    monkeypatch.setattr(timeshift, "time", clock)
+    buffer = timeshift.open_timeshift(8)
+
+    # One checkpoint per second of broadcast
+    first = _KEYFRAME + _ts_packet() * 2
+    buffer.write(first)
+    for second in (1, 2, 3):
+        clock.now = 1000.0 + second
+        buffer.write(_ts_packet())
+    await buffer.drain()
+    clock.now = 1003.9
+
+    # Rewound 3.8 s: the first second is due, the next one 0.1 s from now
+    reader = buffer.read_from(1000.1)
+    assert await reader.__anext__() == first
+    pending = asyncio.ensure_future(reader.__anext__())
+    await asyncio.sleep(0.05)
+    assert not pending.done()
+    clock.now = 1004.9
+    assert await asyncio.wait_for(pending, timeout=2) == _ts_packet()
+    # The third second is not due until 1005.8
+    pending = asyncio.ensure_future(reader.__anext__())
+    await asyncio.sleep(0.05)
+    assert not pending.done()
+
+    timeshift.close_timeshift(buffer)
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(pending, timeout=2)
+
+
+@pytest.mark.asyncio
+async def test_unstarted_timeshift_body_takes_no_hold():
+    from app.services.broadcaster import ChannelBroadcaster
+    from app.services.stream_proxy import _timeshift_client
+
+    class FakeBuffer:
+        async def read_from(self, at):
+            yield b"x"
+
+    broadcaster = ChannelBroadcaster(9301, lambda: None)
+    # Closed before its first iteration, as when the client leaves at once
+    await _timeshift_client(broadcaster, FakeBuffer(), 0).aclose()
+    assert broadcaster.viewer_count == 0
+
+    body = _timeshift_client(broadcaster, FakeBuffer(), 0)
+    assert await body.__anext__() == b"x"
+    assert broadcaster.viewer_count == 1
+    await body.aclose()
+    assert broadcaster.viewer_count == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_disk_does_not_block_the_broadcast(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(settings, "TIMESHIFT_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "TIMESHIFT_MINUTES", 5)
+    monkeypatch.setattr(timeshift, "_MAX_PENDING_CHUNKS", 2)
+    disk = threading.Event()
+    write_file = timeshift.TimeshiftBuffer._write_file
+
+    def stalled_write(self, *args):
+        disk.wait(5)
+        write_file(self, *args)
+
+    monkeypatch.setattr(timeshift.TimeshiftBuffer, "_write_file", stalled_write)
+    buffer = timeshift.open_timeshift(9)
+    await asyncio.sleep(0.05)           # the writer is now stuck on the disk
+
+    for _ in range(6):
+        buffer.write(_ts_packet())      # returns at once; the excess is dropped
+    disk.set()
+    await buffer.drain()
+    assert 0 < buffer._segments[-1].size < 6 * 188
+    timeshift.close_timeshift(buffer)
+    await buffer.drain()
@@ -0,0 +1,61 @@
+"""XMLTV writer tests."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.channel import Channel
+from app.models.schedule_entry import ScheduleEntry
+from app.services import xmltv
+
+_T0 = datetime(2026, 3, 1, 20, 0)
+
+
+class _FakeSession:
+    """Stands in for AsyncSession.stream_scalars over the parent's rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def stream_scalars(self, query):
+        self.queries += 1
+
+        async def rows():
+            for row in self.rows:
+                yield row
+        return rows()
+
+
+@pytest.mark.asyncio
+async def test_lists_parent_rows_for_shifted_sibling():
+    rows = [
+        ScheduleEntry(
+            id=i, channel_id=1, title=f"Film {i}", media_item_id="m", library_id="l",
+            item_type="Movie", start_time=_T0 + timedelta(hours=i),
+            end_time=_T0 + timedelta(hours=i + 1), duration=3600,
+        )
+        for i in range(3)
+    ]
+    channels = [
+        Channel(id=1, name="Movies & More", schedule_type="genre_auto"),
+        Channel(
+            id=2, name="Movies +1", schedule_type="shifted",
+            parent_channel_id=1, time_offset_minutes=60,
+        ),
+    ]
+    db = _FakeSession(rows)
+
+    programmes = [
+        item async for item in xmltv.iter_programmes(
+            channels, _T0 + timedelta(hours=1), _T0 + timedelta(hours=3), db, "http://h"
+        )
+    ]
+    doc = "".join(text for _, text in programmes)
+    assert db.queries == 1
+    assert [channel_id for channel_id, _ in programmes] == [2, 1, 2, 1]
+    # Channel 1 airs films 1 and 2 in the window; channel 2 airs 0 and 1 an hour later
+    assert doc.count('<programme channel="1"') == 2
+    assert doc.count('<programme channel="2"') == 2
+    assert '<programme channel="2" start="20260301210000 +0000"' in doc
+    assert "Film 0" in doc and "Film 2" in doc